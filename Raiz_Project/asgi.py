@@ -3,6 +3,11 @@ ASGI config for Raiz_Project project.
 
 It exposes the ASGI callable as a module-level variable named ``application``.
 
+Serve it with an ASGI server (e.g. ``uvicorn Raiz_Project.asgi:application``)
+so the async SSE view /api/Creditos/eventos/ keeps its connections on the event
+loop instead of one thread per client (see app_Credito/eventos.py). Under
+WSGI that view answers 501.
+
 For more information on this file, see
 https://docs.djangoproject.com/en/5.2/howto/deployment/asgi/
 """
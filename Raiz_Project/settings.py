@@ -145,7 +145,7 @@ DEFAULT_AUTO_FIELD = 'django.db.models.BigAutoField'
 # Django REST Framework configuration
 REST_FRAMEWORK = {
     'DEFAULT_AUTHENTICATION_CLASSES': [
-        'rest_framework.authentication.TokenAuthentication',
+        'app_User.authentication.SignedTokenAuthentication',
     ],
     'DEFAULT_PERMISSION_CLASSES': [
         'rest_framework.permissions.AllowAny',  # Por defecto permitir acceso anónimo, luego restringir en ViewSets
@@ -196,6 +196,7 @@ CORS_ALLOW_HEADERS = [
     'authorization',
     'content-type',
     'dnt',
+    'idempotency-key',
     'origin',
     'user-agent',
     'x-csrftoken',
@@ -223,6 +224,136 @@ AWS_S3_CUSTOM_DOMAIN = os.getenv('AWS_S3_CUSTOM_DOMAIN', None)
 if AWS_S3_CUSTOM_DOMAIN:
     AWS_S3_CUSTOM_DOMAIN = f'{AWS_STORAGE_BUCKET_NAME}.s3.amazonaws.com'
 
+# ==============================================
+# CACHÉ COMPARTIDO (CACHES)
+# ==============================================
+# Lo usan el caché de tenant, el de tokens y la lista de revocación: tiene que
+# ser el mismo para todos los workers. Redis si hay REDIS_URL; si no, un caché
+# en memoria del proceso, que solo sirve con un worker (checks app_User.W001,
+# W002 y E001). Un DatabaseCache no quita las consultas de autenticación y
+# tenant, solo las cambia de tabla (check app_User.W003)
+REDIS_URL = os.getenv('REDIS_URL')
+if REDIS_URL:
+    CACHES = {
+        'default': {
+            'BACKEND': 'django.core.cache.backends.redis.RedisCache',
+            'LOCATION': REDIS_URL,
+        }
+    }
+else:
+    CACHES = {
+        'default': {
+            'BACKEND': 'django.core.cache.backends.locmem.LocMemCache',
+        }
+    }
+
+# ==============================================
+# CACHÉS DE TENANT Y AUTENTICACIÓN
+# ==============================================
+# Con *_USE_DJANGO_CACHE=True (default) las entradas viven solo en CACHES y las
+# invalidaciones llegan a todos los workers; con False quedan en un LRU local
+# por proceso y otro worker puede servir un valor viejo hasta el TIMEOUT
+# Resolución usuario → Perfiluser → Empresa (app_User/tenant.py)
+TENANT_CACHE_MAXSIZE = int(os.getenv('TENANT_CACHE_MAXSIZE', '2048'))
+TENANT_CACHE_TIMEOUT = int(os.getenv('TENANT_CACHE_TIMEOUT', '300'))  # En segundos
+TENANT_CACHE_USE_DJANGO_CACHE = os.getenv('TENANT_CACHE_USE_DJANGO_CACHE', 'True') == 'True'
+
+# Caché de la resolución token → usuario (CachedTokenAuthentication)
+AUTH_TOKEN_CACHE_MAXSIZE = int(os.getenv('AUTH_TOKEN_CACHE_MAXSIZE', '4096'))
+AUTH_TOKEN_CACHE_TIMEOUT = int(os.getenv('AUTH_TOKEN_CACHE_TIMEOUT', '60'))  # En segundos
+AUTH_TOKEN_CACHE_USE_DJANGO_CACHE = os.getenv('AUTH_TOKEN_CACHE_USE_DJANGO_CACHE', 'True') == 'True'
+
+# Tokens firmados sin estado en login/registro (app_User/signed_tokens.py)
+# La lista de revocación del logout se guarda en TokenRevocado y se consulta a
+# través de CACHES, que tiene que ser compartido (check app_User.E001)
+AUTH_SIGNED_TOKENS = os.getenv('AUTH_SIGNED_TOKENS', 'False') == 'True'
+AUTH_SIGNED_TOKEN_MAX_AGE = int(os.getenv('AUTH_SIGNED_TOKEN_MAX_AGE', '28800'))  # En segundos
+
+# ==============================================
+# SIMULACIÓN DE CARTERA (app_Credito/simulacion.py)
+# ==============================================
+# Monte Carlo en el pool de procesos compartido del worker cuando créditos x
+# simulaciones supera el umbral; por encima del máximo la corrida se rechaza
+SIMULACION_MAX_WORKERS = int(os.getenv('SIMULACION_MAX_WORKERS', '4'))
+SIMULACION_UMBRAL_POOL = int(os.getenv('SIMULACION_UMBRAL_POOL', '2000000'))
+SIMULACION_MAX_PRODUCTO = int(os.getenv('SIMULACION_MAX_PRODUCTO', '20000000'))
+# Corridas cacheadas por empresa + parámetros + versión de la cartera
+SIMULACION_CACHE_MAXSIZE = int(os.getenv('SIMULACION_CACHE_MAXSIZE', '256'))
+SIMULACION_CACHE_TIMEOUT = int(os.getenv('SIMULACION_CACHE_TIMEOUT', '900'))  # En segundos
+SIMULACION_CACHE_USE_DJANGO_CACHE = os.getenv('SIMULACION_CACHE_USE_DJANGO_CACHE', 'False') == 'True'
+
+# ==============================================
+# ANALÍTICA DE DURACIÓN DE FASES (app_Credito/analitica.py)
+# ==============================================
+# Resúmenes cacheados por empresa + agrupación + marca de agua
+ANALITICA_CACHE_MAXSIZE = int(os.getenv('ANALITICA_CACHE_MAXSIZE', '512'))
+ANALITICA_CACHE_TIMEOUT = int(os.getenv('ANALITICA_CACHE_TIMEOUT', '300'))  # En segundos
+ANALITICA_CACHE_USE_DJANGO_CACHE = os.getenv('ANALITICA_CACHE_USE_DJANGO_CACHE', 'False') == 'True'
+
+# ==============================================
+# OUTBOX DE EVENTOS DEL WORKFLOW (app_Credito/outbox.py)
+# ==============================================
+# Consumido por el comando procesar_outbox
+OUTBOX_LOTE = int(os.getenv('OUTBOX_LOTE', '100'))
+OUTBOX_MAX_INTENTOS = int(os.getenv('OUTBOX_MAX_INTENTOS', '5'))
+
+# ==============================================
+# PARTICIONES DE HISTORICOCREDITO (app_Credito/particiones.py, solo PostgreSQL)
+# ==============================================
+# La tabla se particiona en migrate (0009 y 0020). particiones_historial tiene
+# que correr a diario (cron): crea las particiones de los próximos meses (si no
+# corre, las filas caen en la partición por defecto hasta la siguiente
+# ejecución) y solo archiva meses cuyos créditos ya pasaron por archivar_creditos.
+HISTORIAL_PARTICIONES_MESES_ADELANTE = int(os.getenv('HISTORIAL_PARTICIONES_MESES_ADELANTE', '3'))
+HISTORIAL_PARTICIONES_RETENCION_MESES = int(os.getenv('HISTORIAL_PARTICIONES_RETENCION_MESES', '0'))  # 0 = no archivar
+HISTORIAL_ARCHIVO_SCHEMA = os.getenv('HISTORIAL_ARCHIVO_SCHEMA', 'archivo')
+
+# ==============================================
+# ARCHIVO DE CRÉDITOS FINALIZADOS (app_Credito/archivo.py)
+# ==============================================
+# Antigüedad mínima (en meses desde la finalización) para el comando archivar_creditos
+ARCHIVO_CREDITOS_MESES = int(os.getenv('ARCHIVO_CREDITOS_MESES', '12'))
+
+# ==============================================
+# RIESGO DE LAS SOLICITUDES (app_Credito/riesgo.py)
+# ==============================================
+# Umbrales de deuda/ingreso: hasta BAJO es riesgo bajo, hasta ALTO riesgo medio,
+# y el puntaje llega a 0 en MAXIMO
+RIESGO_DTI_BAJO = float(os.getenv('RIESGO_DTI_BAJO', '0.30'))
+RIESGO_DTI_ALTO = float(os.getenv('RIESGO_DTI_ALTO', '0.45'))
+RIESGO_DTI_MAXIMO = float(os.getenv('RIESGO_DTI_MAXIMO', '0.60'))
+
+# ==============================================
+# COLA DE REVISIÓN DE ANALISTAS (app_Credito/cola_revision.py)
+# ==============================================
+# Minutos que un crédito queda reservado al analista que lo reclamó
+COLA_REVISION_LEASE_MINUTOS = int(os.getenv('COLA_REVISION_LEASE_MINUTOS', '15'))
+
+# ==============================================
+# IDEMPOTENCY-KEY EN ACCIONES DEL WORKFLOW (app_Credito/idempotencia.py)
+# ==============================================
+# Horas que se guarda la respuesta de cada clave; purgar con purgar_idempotencia
+IDEMPOTENCIA_TTL_HORAS = int(os.getenv('IDEMPOTENCIA_TTL_HORAS', '24'))
+# Segundos sin respuesta tras los que una petición en curso se da por abandonada
+# (worker caído) y la toma el siguiente reintento; mayor que el timeout del worker
+IDEMPOTENCIA_BLOQUEO_SEGUNDOS = int(os.getenv('IDEMPOTENCIA_BLOQUEO_SEGUNDOS', '120'))
+
+# ==============================================
+# STREAM SSE DE CAMBIOS DE FASE (app_Credito/eventos.py)
+# ==============================================
+# Segundos entre lecturas del outbox si no llega un NOTIFY (sqlite, o LISTEN caído)
+SSE_INTERVALO_SONDEO = float(os.getenv('SSE_INTERVALO_SONDEO', '5'))
+# Segundos sin eventos antes de enviar un latido; cada cuánto se revalidan token y perfil
+SSE_LATIDO = float(os.getenv('SSE_LATIDO', '15'))
+# Eventos que se repiten como máximo al reconectar con Last-Event-ID
+SSE_REPLAY_MAX = int(os.getenv('SSE_REPLAY_MAX', '500'))
+# Eventos pendientes por conexión antes de cortarla por lenta
+SSE_COLA_MAX = int(os.getenv('SSE_COLA_MAX', '1000'))
+# Espera (ms) que se le indica al navegador antes de reconectar
+SSE_REINTENTO_MS = int(os.getenv('SSE_REINTENTO_MS', '3000'))
+# Segundos que vale un token de stream (token-eventos) para abrir la conexión
+SSE_TOKEN_MAX_AGE = int(os.getenv('SSE_TOKEN_MAX_AGE', '60'))
+
 # ==============================================
 # CONFIGURACIÓN DE GROQ AI
 # ==============================================
@@ -7,6 +7,7 @@ from rest_framework.response import Response
 from rest_framework.permissions import IsAuthenticated
 from django.db.models import Q
 from app_User.models import Perfiluser
+from app_User.tenant import get_perfil
 from .models import Conversacion, Mensaje
 from .serializers import (
     ConversacionSerializer, ConversacionListSerializer,
@@ -19,10 +20,10 @@ class AssistantViewSet(viewsets.ViewSet):
     """ViewSet para el asistente de IA"""
     permission_classes = [IsAuthenticated]
     
-    def get_perfil_and_empresa(self, user):
-        """Obtiene perfil y empresa del usuario"""
+    def get_perfil_and_empresa(self, request):
+        """Obtiene perfil y empresa del usuario (resueltos una vez por request)"""
         try:
-            perfil = Perfiluser.objects.get(usuario=user)
+            perfil = get_perfil(request)
             return perfil, perfil.empresa
         except Perfiluser.DoesNotExist:
             return None, None
@@ -42,7 +43,7 @@ class AssistantViewSet(viewsets.ViewSet):
         if not serializer.is_valid():
             return Response(serializer.errors, status=status.HTTP_400_BAD_REQUEST)
         
-        perfil, empresa = self.get_perfil_and_empresa(request.user)
+        perfil, empresa = self.get_perfil_and_empresa(request)
         if not perfil or not empresa:
             return Response(
                 {"error": "Usuario no tiene perfil o empresa asociada"},
@@ -125,7 +126,7 @@ class AssistantViewSet(viewsets.ViewSet):
         Lista todas las conversaciones del usuario
         GET /api/assistant/conversaciones/
         """
-        perfil, empresa = self.get_perfil_and_empresa(request.user)
+        perfil, empresa = self.get_perfil_and_empresa(request)
         if not perfil or not empresa:
             return Response(
                 {"error": "Usuario no tiene perfil o empresa asociada"},
@@ -146,7 +147,7 @@ class AssistantViewSet(viewsets.ViewSet):
         Obtiene el historial completo de una conversación
         GET /api/assistant/{conversacion_id}/historial/
         """
-        perfil, empresa = self.get_perfil_and_empresa(request.user)
+        perfil, empresa = self.get_perfil_and_empresa(request)
         if not perfil or not empresa:
             return Response(
                 {"error": "Usuario no tiene perfil o empresa asociada"},
@@ -174,7 +175,7 @@ class AssistantViewSet(viewsets.ViewSet):
         Elimina una conversación
         DELETE /api/assistant/{conversacion_id}/
         """
-        perfil, empresa = self.get_perfil_and_empresa(request.user)
+        perfil, empresa = self.get_perfil_and_empresa(request)
         if not perfil or not empresa:
             return Response(
                 {"error": "Usuario no tiene perfil o empresa asociada"},
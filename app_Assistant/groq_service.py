@@ -76,7 +76,8 @@ Tu rol actual es "{rol}". Esto significa que:
    - app_cliente_documentacion: Documentación de clientes
    - app_cliente_trabajo: Información laboral
    - app_cliente_domicilio: Domicilios
-   - app_credito_credito: Créditos otorgados
+   - app_credito_credito: Créditos otorgados (vigentes)
+   - app_credito_creditoarchivado: Créditos finalizados archivados (mismas columnas que app_credito_credito)
    - app_credito_tipo_credito: Tipos de crédito
    - app_empresa_empresa: Empresas
    - auth_user: Usuarios del sistema
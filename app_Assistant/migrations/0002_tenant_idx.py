@@ -0,0 +1,24 @@
+# Generated by Django 5.2.7 on 2026-10-18 19:10
+
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('app_Assistant', '0001_initial'),
+        ('app_Empresa', '0002_alter_on_premise_fecha_de_compra'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='consultasql',
+            index=models.Index(fields=['empresa', '-fecha_ejecucion'], name='consulta_sql_emp_fecha_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='conversacion',
+            index=models.Index(fields=['empresa', 'usuario', '-fecha_actualizacion'], name='conversacion_emp_usr_idx'),
+        ),
+    ]
@@ -18,6 +18,9 @@ class Conversacion(models.Model):
     class Meta:
         db_table = 'assistant_conversacion'
         ordering = ['-fecha_actualizacion']
+        indexes = [
+            models.Index(fields=['empresa', 'usuario', '-fecha_actualizacion'], name='conversacion_emp_usr_idx'),
+        ]
         verbose_name = 'Conversación'
         verbose_name_plural = 'Conversaciones'
     
@@ -64,6 +67,9 @@ class ConsultaSQL(models.Model):
     class Meta:
         db_table = 'assistant_consulta_sql'
         ordering = ['-fecha_ejecucion']
+        indexes = [
+            models.Index(fields=['empresa', '-fecha_ejecucion'], name='consulta_sql_emp_fecha_idx'),
+        ]
         verbose_name = 'Consulta SQL'
         verbose_name_plural = 'Consultas SQL'
     
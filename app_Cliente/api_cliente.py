@@ -1,6 +1,7 @@
 from .serializers import ClienteSerializer, DomicilioSerializer, TrabajoSerializer, DocumentacionSerializer
 from .models import Cliente, Domicilio, Trabajo, Documentacion
 from app_User.models import Perfiluser
+from app_User.tenant import get_perfil
 from rest_framework import viewsets, permissions, status 
 from rest_framework.response import Response
 from rest_framework.parsers import JSONParser, FormParser, MultiPartParser
@@ -13,14 +14,14 @@ class ClienteViewSet(viewsets.ModelViewSet):
     def get_queryset(self):
         user = self.request.user
         try:
-            perfil = Perfiluser.objects.get(usuario=user)
+            perfil = get_perfil(self.request)
             return Cliente.objects.filter(empresa=perfil.empresa)
         except Perfiluser.DoesNotExist:
             return Cliente.objects.none()
 
     def perform_create(self, serializer):
         try:
-            perfil = Perfiluser.objects.get(usuario=self.request.user)
+            perfil = get_perfil(self.request)
             serializer.save(empresa=perfil.empresa)
         except Perfiluser.DoesNotExist:
             pass
@@ -34,14 +35,14 @@ class DocumentacionViewSet(viewsets.ModelViewSet):
     def get_queryset(self):
         user = self.request.user
         try:
-            perfil = Perfiluser.objects.get(usuario=user)
+            perfil = get_perfil(self.request)
             return Documentacion.objects.filter(empresa=perfil.empresa)
         except Perfiluser.DoesNotExist:
             return Documentacion.objects.none()
 
     def create(self, request, *args, **kwargs):
         try:
-            perfil = Perfiluser.objects.get(usuario=request.user)
+            perfil = get_perfil(request)
             
             # Obtener archivo de documento si viene
             documento_file = request.FILES.get('documento_file', None)
@@ -78,7 +79,7 @@ class DocumentacionViewSet(viewsets.ModelViewSet):
 
     def perform_create(self, serializer):
         try:
-            perfil = Perfiluser.objects.get(usuario=self.request.user)
+            perfil = get_perfil(self.request)
             serializer.save(empresa=perfil.empresa)
         except Perfiluser.DoesNotExist:
             pass
@@ -92,14 +93,14 @@ class TrabajoViewSet(viewsets.ModelViewSet):
     def get_queryset(self):
         user = self.request.user
         try:
-            perfil = Perfiluser.objects.get(usuario=user)
-            return Trabajo.objects.filter(empresa_rel=perfil.empresa)
+            perfil = get_perfil(self.request)
+            return Trabajo.objects.filter(empresa_rel=perfil.empresa).order_by('id')
         except Perfiluser.DoesNotExist:
             return Trabajo.objects.none()
 
     def create(self, request, *args, **kwargs):
         try:
-            perfil = Perfiluser.objects.get(usuario=request.user)
+            perfil = get_perfil(request)
             
             # Obtener archivo de extracto si viene
             extracto_file = request.FILES.get('extracto_file', None)
@@ -136,7 +137,7 @@ class TrabajoViewSet(viewsets.ModelViewSet):
 
     def perform_create(self, serializer):
         try:
-            perfil = Perfiluser.objects.get(usuario=self.request.user)
+            perfil = get_perfil(self.request)
             serializer.save(empresa_rel=perfil.empresa)
         except Perfiluser.DoesNotExist:
             pass
@@ -150,14 +151,14 @@ class DomicilioViewSet(viewsets.ModelViewSet):
     def get_queryset(self):
         user = self.request.user
         try:
-            perfil = Perfiluser.objects.get(usuario=user)
-            return Domicilio.objects.filter(empresa=perfil.empresa)
+            perfil = get_perfil(self.request)
+            return Domicilio.objects.filter(empresa=perfil.empresa).order_by('id')
         except Perfiluser.DoesNotExist:
             return Domicilio.objects.none()
 
     def create(self, request, *args, **kwargs):
         try:
-            perfil = Perfiluser.objects.get(usuario=request.user)
+            perfil = get_perfil(request)
             
             # Obtener archivo de croquis si viene
             croquis_file = request.FILES.get('croquis_file', None)
@@ -194,7 +195,7 @@ class DomicilioViewSet(viewsets.ModelViewSet):
 
     def perform_create(self, serializer):
         try:
-            perfil = Perfiluser.objects.get(usuario=self.request.user)
+            perfil = get_perfil(self.request)
             serializer.save(empresa=perfil.empresa)
         except Perfiluser.DoesNotExist:
             pass
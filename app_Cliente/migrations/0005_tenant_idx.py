@@ -0,0 +1,34 @@
+# Generated by Django 5.2.7 on 2026-10-18 19:10
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('app_Cliente', '0004_alter_documentacion_documento_url_and_more'),
+        ('app_Empresa', '0002_alter_on_premise_fecha_de_compra'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='cliente',
+            index=models.Index(fields=['empresa', '-fecha_registro'], name='cliente_emp_fecha_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='documentacion',
+            index=models.Index(fields=['empresa', '-fecha_registro'], name='documentacion_emp_fecha_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='domicilio',
+            index=models.Index(fields=['empresa', 'id'], name='domicilio_emp_id_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='garante',
+            index=models.Index(fields=['empresa', 'id'], name='garante_emp_id_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='trabajo',
+            index=models.Index(fields=['empresa_rel', 'id'], name='trabajo_emp_id_idx'),
+        ),
+    ]
@@ -11,6 +11,9 @@ class Cliente(models.Model):
 
     class Meta:
         ordering = ['-fecha_registro']
+        indexes = [
+            models.Index(fields=['empresa', '-fecha_registro'], name='cliente_emp_fecha_idx'),
+        ]
 
     def __str__(self):
         return f"{self.nombre} {self.apellido}"
@@ -24,6 +27,9 @@ class Documentacion(models.Model):
 
     class Meta:
         ordering = ['-fecha_registro']
+        indexes = [
+            models.Index(fields=['empresa', '-fecha_registro'], name='documentacion_emp_fecha_idx'),
+        ]
 
     def __str__(self):
         return f"Doc: {self.ci}"
@@ -38,6 +44,11 @@ class Trabajo(models.Model):
     id_cliente = models.OneToOneField('Cliente', on_delete=models.CASCADE, null=True)
     empresa_rel = models.ForeignKey(Empresa, on_delete=models.CASCADE, null=True, blank=True)
 
+    class Meta:
+        indexes = [
+            models.Index(fields=['empresa_rel', 'id'], name='trabajo_emp_id_idx'),
+        ]
+
     def __str__(self):
         return f"{self.cargo} en {self.empresa}"
 
@@ -49,6 +60,11 @@ class Domicilio(models.Model):
     id_cliente = models.OneToOneField('Cliente', on_delete=models.CASCADE, null=True)
     empresa = models.ForeignKey(Empresa, on_delete=models.CASCADE, null=True, blank=True)
 
+    class Meta:
+        indexes = [
+            models.Index(fields=['empresa', 'id'], name='domicilio_emp_id_idx'),
+        ]
+
     def __str__(self):
         return f"Domicilio: {self.numero_ref}"
 
@@ -59,5 +75,10 @@ class Garante(models.Model):
     id_domicilio = models.OneToOneField('Domicilio', on_delete=models.CASCADE, null=True, related_name='garante')
     empresa = models.ForeignKey(Empresa, on_delete=models.CASCADE, related_name='garantess', null=True, blank=True)
 
+    class Meta:
+        indexes = [
+            models.Index(fields=['empresa', 'id'], name='garante_emp_id_idx'),
+        ]
+
     def __str__(self):
         return self.nombrecompleto
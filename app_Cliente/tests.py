@@ -1,3 +1,71 @@
-from django.test import TestCase
+from django.contrib.auth.models import User
+from django.db import connection
+from django.test import TestCase, override_settings
+from django.test.utils import CaptureQueriesContext
+from rest_framework.test import APIClient
 
-# Create your tests here.
+from app_Empresa.models import Empresa
+from app_User.models import Perfiluser
+from .models import Cliente, Documentacion, Domicilio, Trabajo
+
+
+CACHE_EN_MEMORIA = {'default': {'BACKEND': 'django.core.cache.backends.locmem.LocMemCache'}}
+
+
+@override_settings(CACHES=CACHE_EN_MEMORIA)
+class IndicesTenantTests(TestCase):
+    """Los listados por empresa se resuelven con el índice (empresa, ...) del modelo, sin ordenar aparte"""
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.empresa = Empresa.objects.create(razon_social='A', email_contacto='a@a.com')
+        otra = Empresa.objects.create(razon_social='B', email_contacto='b@b.com')
+        cls.usuario = User.objects.create(username='cajero')
+        Perfiluser.objects.create(usuario=cls.usuario, empresa=cls.empresa)
+        for i, empresa in enumerate([cls.empresa, otra] * 5):
+            Cliente.objects.create(nombre=f'N{i}', apellido='A', telefono='1', empresa=empresa)
+            Documentacion.objects.create(ci=f'CI{i}', empresa=empresa)
+            Trabajo.objects.create(cargo='C', empresa='E', salario=1, empresa_rel=empresa)
+            Domicilio.objects.create(descripcion='D', es_propietario=False, numero_ref='1', empresa=empresa)
+
+    def plan_del_listado(self, url, tabla):
+        api = APIClient()
+        api.force_authenticate(self.usuario)
+        with CaptureQueriesContext(connection) as consultas:
+            respuesta = api.get(url)
+        self.assertEqual(respuesta.status_code, 200)
+        self.assertEqual(len(respuesta.json()), 5)
+        sql = next(c['sql'] for c in consultas if f'FROM "{tabla}"' in c['sql'])
+
+        with connection.cursor() as cursor:
+            if connection.vendor == 'postgresql':
+                # Con pocas filas el planificador prefiere recorrer la tabla u ordenar un bitmap
+                cursor.execute('SET LOCAL enable_seqscan = off')
+                cursor.execute('SET LOCAL enable_bitmapscan = off')
+                cursor.execute(f'EXPLAIN {sql}')
+            else:
+                cursor.execute(f'EXPLAIN QUERY PLAN {sql}')
+            return '\n'.join(str(fila) for fila in cursor.fetchall())
+
+    def assertSinOrdenar(self, plan):
+        """El plan lee por índice y no tiene paso de ordenamiento: el índice ya entrega las filas en orden"""
+        self.assertRegex(plan, r'USING (COVERING )?INDEX|Index (Only )?Scan')
+        self.assertNotIn('TEMP B-TREE', plan)
+        self.assertNotRegex(plan, r'\bSort\b')
+
+    def test_clientes(self):
+        plan = self.plan_del_listado('/api/Clientes/clientes/', 'app_Cliente_cliente')
+        self.assertIn('cliente_emp_fecha_idx', plan)
+        self.assertSinOrdenar(plan)
+
+    def test_documentacion(self):
+        plan = self.plan_del_listado('/api/Clientes/documentacion/', 'app_Cliente_documentacion')
+        self.assertIn('documentacion_emp_fecha_idx', plan)
+        self.assertSinOrdenar(plan)
+
+    # Ordenados por id: en SQLite también sirve el índice de la FK, que incluye el rowid
+    def test_trabajo(self):
+        self.assertSinOrdenar(self.plan_del_listado('/api/Clientes/trabajo/', 'app_Cliente_trabajo'))
+
+    def test_domicilios(self):
+        self.assertSinOrdenar(self.plan_del_listado('/api/Clientes/domicilios/', 'app_Cliente_domicilio'))
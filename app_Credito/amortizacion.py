@@ -0,0 +1,230 @@
+"""
+Motor de amortización de créditos (sistemas francés y alemán)
+
+- tabla_amortizacion: tabla de cuotas exacta (Decimal) de un crédito
+- intereses_totales: interés total de muchos créditos a la vez (fórmulas cerradas)
+- columnas_cartera: filas .values() de una cartera a columnas paralelas
+- proyectar_cartera: flujo de caja mensual de toda una cartera, calculado por
+  columnas (todos los créditos a la vez por cada período) sobre filas .values()
+"""
+import calendar
+from collections import defaultdict
+from decimal import Decimal, ROUND_HALF_UP
+
+from rest_framework.exceptions import ValidationError
+
+
+SISTEMAS_AMORTIZACION = ('frances', 'aleman')
+
+CENTAVO = Decimal('0.01')
+
+# Columnas que necesita proyectar_cartera
+CAMPOS_CARTERA = ('id', 'Monto_Solicitado', 'Tasa_Interes', 'Numero_Cuotas', 'Fecha_Desembolso', 'fecha_creacion')
+
+
+def sumar_meses(fecha, meses):
+    """Suma meses a una fecha, ajustando el día al último del mes si hace falta"""
+    mes = fecha.month - 1 + meses
+    anio = fecha.year + mes // 12
+    mes = mes % 12 + 1
+    dia = min(fecha.day, calendar.monthrange(anio, mes)[1])
+    return fecha.replace(year=anio, month=mes, day=dia)
+
+
+def validar_sistema(sistema):
+    if sistema not in SISTEMAS_AMORTIZACION:
+        raise ValidationError(f"Sistema inválido: {sistema}. Opciones: {', '.join(SISTEMAS_AMORTIZACION)}")
+
+
+def cuota_francesa(monto, tasa_mensual, cuotas):
+    """Cuota fija del sistema francés"""
+    if tasa_mensual == 0:
+        return monto / cuotas
+    return monto * tasa_mensual / (1 - (1 + tasa_mensual) ** -cuotas)
+
+
+def intereses_totales(montos, tasas_anuales, plazos, sistema='frances'):
+    """
+    Interés total de varios créditos a la vez, con fórmulas cerradas (sin armar tablas)
+
+    Args:
+        montos, tasas_anuales, plazos: Listas paralelas (Decimal / Decimal / int)
+        sistema: 'frances' o 'aleman'
+
+    Returns:
+        Lista de Decimal redondeados a centavos (None si el plazo no es válido)
+    """
+    validar_sistema(sistema)
+    tasas = [Decimal(t) / 100 / 12 for t in tasas_anuales]
+    if sistema == 'frances':
+        totales = [
+            cuota_francesa(Decimal(m), r, n) * n - Decimal(m) if n and n > 0 else None
+            for m, r, n in zip(montos, tasas, plazos)
+        ]
+    else:
+        # Alemán: el saldo baja linealmente, interés = P * r * (n + 1) / 2
+        totales = [
+            Decimal(m) * r * (n + 1) / 2 if n and n > 0 else None
+            for m, r, n in zip(montos, tasas, plazos)
+        ]
+    return [t.quantize(CENTAVO, ROUND_HALF_UP) if t is not None else None for t in totales]
+
+
+def tabla_amortizacion(monto, tasa_anual, cuotas, sistema='frances', fecha_inicio=None):
+    """
+    Construye la tabla de amortización de un crédito
+
+    Args:
+        monto: Monto prestado
+        tasa_anual: Tasa de interés anual en porcentaje (p. ej. 15.5)
+        cuotas: Número de cuotas mensuales
+        sistema: 'frances' (cuota fija) o 'aleman' (amortización de capital fija)
+        fecha_inicio: Fecha desde la que se cuentan los vencimientos (opcional)
+
+    Returns:
+        Dict con 'cuotas' (lista por período) y los totales del crédito
+    """
+    validar_sistema(sistema)
+    monto = Decimal(monto)
+    cuotas = int(cuotas)
+    if cuotas <= 0:
+        raise ValidationError("El número de cuotas debe ser mayor a 0")
+    if monto <= 0:
+        raise ValidationError("El monto debe ser mayor a 0")
+
+    tasa_mensual = Decimal(tasa_anual) / 100 / 12
+    saldo = monto
+    cuota_fija = cuota_francesa(monto, tasa_mensual, cuotas).quantize(CENTAVO, ROUND_HALF_UP)
+    capital_fijo = (monto / cuotas).quantize(CENTAVO, ROUND_HALF_UP)
+
+    tabla = []
+    total_interes = Decimal('0')
+    total_pagar = Decimal('0')
+    for numero in range(1, cuotas + 1):
+        interes = (saldo * tasa_mensual).quantize(CENTAVO, ROUND_HALF_UP)
+        if numero == cuotas:
+            # La última cuota absorbe el redondeo para dejar el saldo en cero
+            capital = saldo
+        elif sistema == 'frances':
+            capital = cuota_fija - interes
+        else:
+            capital = capital_fijo
+        cuota = capital + interes
+        saldo -= capital
+        total_interes += interes
+        total_pagar += cuota
+        tabla.append({
+            'numero': numero,
+            'fecha_vencimiento': sumar_meses(fecha_inicio, numero) if fecha_inicio else None,
+            'cuota': cuota,
+            'capital': capital,
+            'interes': interes,
+            'saldo': saldo,
+        })
+
+    return {
+        'sistema': sistema,
+        'monto': monto,
+        'tasa_anual': Decimal(tasa_anual),
+        'numero_cuotas': cuotas,
+        'cuota_inicial': tabla[0]['cuota'],
+        'total_interes': total_interes,
+        'total_pagar': total_pagar,
+        'cuotas': tabla,
+    }
+
+
+def columnas_cartera(filas):
+    """
+    Convierte filas .values() de CAMPOS_CARTERA en columnas paralelas (float)
+
+    Descarta créditos sin monto o sin cuotas.
+
+    Returns:
+        Tupla (montos, tasas_mensuales, plazos, fechas_inicio)
+    """
+    montos, tasas, plazos, inicios = [], [], [], []
+    for fila in filas:
+        plazo = fila['Numero_Cuotas'] or 0
+        if plazo <= 0 or not fila['Monto_Solicitado']:
+            continue
+        inicio = fila['Fecha_Desembolso'] or fila['fecha_creacion'].date()
+        montos.append(float(fila['Monto_Solicitado']))
+        tasas.append(float(fila['Tasa_Interes']) / 100 / 12)
+        plazos.append(plazo)
+        inicios.append(inicio)
+    return montos, tasas, plazos, inicios
+
+
+def proyectar_cartera(filas, sistema='frances'):
+    """
+    Proyecta el flujo de caja mensual de una cartera de créditos
+
+    Trabaja por columnas: para cada período k calcula interés, capital y saldo
+    de todos los créditos vigentes a la vez y acumula por mes de vencimiento.
+    Los créditos se ordenan por plazo descendente, así los vigentes en k son
+    siempre un prefijo, y el mes de vencimiento es un entero (año * 12 + mes)
+    que se calcula una vez por crédito: el del período k es base + k.
+    Usa float; para montos exactos de un crédito usar tabla_amortizacion.
+
+    Args:
+        filas: Iterable de dicts con las columnas de CAMPOS_CARTERA
+        sistema: 'frances' o 'aleman'
+
+    Returns:
+        Dict con 'meses' (lista ordenada por mes) y totales de la cartera
+    """
+    validar_sistema(sistema)
+
+    montos, tasas, plazos, inicios = columnas_cartera(filas)
+
+    orden = sorted(range(len(plazos)), key=plazos.__getitem__, reverse=True)
+    tasas = [tasas[i] for i in orden]
+    plazos = [plazos[i] for i in orden]
+    bases = [inicios[i].year * 12 + inicios[i].month - 1 for i in orden]
+    saldos = [montos[i] for i in orden]
+    if sistema == 'frances':
+        cuotas_fijas = [cuota_francesa(m, r, n) for m, r, n in zip(saldos, tasas, plazos)]
+    else:
+        capitales_fijos = [m / n for m, n in zip(saldos, plazos)]
+
+    capital_mes = defaultdict(float)
+    interes_mes = defaultdict(float)
+    creditos_mes = defaultdict(int)
+
+    vigentes = len(plazos)
+    for k in range(1, (plazos[0] if plazos else 0) + 1):
+        while plazos[vigentes - 1] < k:
+            vigentes -= 1
+        for i in range(vigentes):
+            interes = saldos[i] * tasas[i]
+            if k == plazos[i]:
+                capital = saldos[i]
+            elif sistema == 'frances':
+                capital = cuotas_fijas[i] - interes
+            else:
+                capital = capitales_fijos[i]
+            saldos[i] -= capital
+            mes = bases[i] + k
+            capital_mes[mes] += capital
+            interes_mes[mes] += interes
+            creditos_mes[mes] += 1
+
+    meses = [
+        {
+            'mes': f"{mes // 12:04d}-{mes % 12 + 1:02d}",
+            'cuota': round(capital_mes[mes] + interes_mes[mes], 2),
+            'capital': round(capital_mes[mes], 2),
+            'interes': round(interes_mes[mes], 2),
+            'creditos': creditos_mes[mes],
+        }
+        for mes in sorted(creditos_mes)
+    ]
+
+    return {
+        'sistema': sistema,
+        'total_creditos': len(montos),
+        'total_capital': round(sum(montos), 2),
+        'total_interes': round(sum(m['interes'] for m in meses), 2),
+        'meses': meses,
+    }
@@ -0,0 +1,246 @@
+"""
+Analítica de duración de las fases del workflow de créditos
+
+- actualizar_duraciones: calcula con LEAD(fecha_cambio) OVER (PARTITION BY
+  credito) cuánto estuvo cada crédito en cada fase, guarda los intervalos
+  cerrados en DuracionFase y suma los nuevos a ResumenDuracionFase. Es
+  incremental: solo recorre el histórico de los créditos con eventos
+  posteriores a la marca de la corrida anterior. Solo la llama el handler del
+  outbox, con la marca de la empresa bloqueada.
+- resumen_duraciones: mediana, p90 y promedio por fase, agrupados por empresa,
+  tipo de crédito o analista, leyendo solo ResumenDuracionFase y cacheados por
+  versión. Mediana y p90 salen del histograma logarítmico: error relativo
+  menor a (RAZON_CUBETAS - 1) / 2.
+"""
+import datetime
+import math
+from collections import Counter, defaultdict
+
+from django.conf import settings
+from django.db import transaction
+from django.db.models import F, Window
+from django.db.models.functions import Lead
+
+from app_User.cache import LRUCache
+from .models import HistoricoCredito, DuracionFase, MarcaProceso, ResumenDuracionFase, ENUM_FASE_CREDITO
+from .outbox import registrar_handler, EVENTO_FASE_CAMBIADA
+
+
+PROCESO_DURACIONES = 'duracion_fases'
+
+# Reprocesa este margen antes de la marca por eventos que se confirmaron tarde;
+# los intervalos repetidos se descartan por el unique de id_historico
+SOLAPAMIENTO = datetime.timedelta(minutes=5)
+
+AGRUPACIONES = {
+    'empresa': None,
+    'tipo_credito': 'tipo_credito_id',
+    'analista': 'usuario_id',
+}
+
+# La cubeta i del histograma cubre [RAZON_CUBETAS**i, RAZON_CUBETAS**(i+1)) segundos
+RAZON_CUBETAS = 1.1
+
+duraciones_cache = LRUCache(
+    'duracion_fases',
+    maxsize=getattr(settings, 'ANALITICA_CACHE_MAXSIZE', 512),
+    timeout=getattr(settings, 'ANALITICA_CACHE_TIMEOUT', 300),
+    use_django_cache=getattr(settings, 'ANALITICA_CACHE_USE_DJANGO_CACHE', False),
+)
+
+
+def cubeta(segundos):
+    """Cubeta del histograma de una duración (menos de un segundo cuenta como uno)"""
+    return math.floor(math.log(max(segundos, 1.0), RAZON_CUBETAS))
+
+
+def _grupos(duracion):
+    """(agrupacion, grupo) en que cuenta un intervalo, uno por agrupación"""
+    return [
+        (agrupar, (getattr(duracion, columna) or 0) if columna else duracion.empresa_id)
+        for agrupar, columna in AGRUPACIONES.items()
+    ]
+
+
+def _sumar_al_resumen(empresa_id, duraciones):
+    """Suma los intervalos nuevos a ResumenDuracionFase"""
+    sumas = defaultdict(lambda: {'cantidad': 0, 'suma_segundos': 0.0, 'histograma': Counter()})
+    for duracion in duraciones:
+        for agrupar, grupo in _grupos(duracion):
+            suma = sumas[(agrupar, grupo, duracion.fase)]
+            suma['cantidad'] += 1
+            suma['suma_segundos'] += duracion.segundos
+            suma['histograma'][str(cubeta(duracion.segundos))] += 1
+    if not sumas:
+        return
+
+    existentes = {
+        (r.agrupacion, r.grupo, r.fase): r
+        for r in ResumenDuracionFase.objects.filter(empresa_id=empresa_id, fase__in={clave[2] for clave in sumas})
+    }
+    nuevos = []
+    for (agrupar, grupo, fase), suma in sumas.items():
+        resumen = existentes.get((agrupar, grupo, fase))
+        if resumen is None:
+            resumen = ResumenDuracionFase(empresa_id=empresa_id, agrupacion=agrupar, grupo=grupo, fase=fase)
+            nuevos.append(resumen)
+        resumen.cantidad += suma['cantidad']
+        resumen.suma_segundos += suma['suma_segundos']
+        resumen.histograma = dict(Counter(resumen.histograma) + suma['histograma'])
+
+    modificados = [r for r in existentes.values() if (r.agrupacion, r.grupo, r.fase) in sumas]
+    ResumenDuracionFase.objects.bulk_update(modificados, ['cantidad', 'suma_segundos', 'histograma'], batch_size=500)
+    ResumenDuracionFase.objects.bulk_create(nuevos, batch_size=500)
+
+
+def _guardar_nuevos(empresa_id, pendientes):
+    """Inserta los intervalos que todavía no están (el solapamiento relee algunos) y los suma al resumen"""
+    guardados = set(
+        DuracionFase.objects.filter(id_historico__in=[d.id_historico for d in pendientes])
+        .values_list('id_historico', flat=True)
+    )
+    nuevos = [d for d in pendientes if d.id_historico not in guardados]
+    DuracionFase.objects.bulk_create(nuevos)
+    _sumar_al_resumen(empresa_id, nuevos)
+    return len(nuevos)
+
+
+def actualizar_duraciones(empresa_id, lote=2000):
+    """
+    Agrega a DuracionFase y a ResumenDuracionFase los intervalos de fase
+    cerrados desde la última corrida
+
+    Corre con la marca de la empresa bloqueada (SELECT ... FOR UPDATE): dos
+    consumidores del outbox no suman dos veces el mismo intervalo.
+
+    Returns:
+        Tupla (intervalos nuevos guardados, marca de agua resultante)
+    """
+    with transaction.atomic():
+        MarcaProceso.objects.get_or_create(proceso=PROCESO_DURACIONES, empresa_id=empresa_id)
+        marca = MarcaProceso.objects.select_for_update().get(proceso=PROCESO_DURACIONES, empresa_id=empresa_id)
+        return _actualizar(marca, empresa_id, lote)
+
+
+def _actualizar(marca, empresa_id, lote):
+    eventos = HistoricoCredito.objects.filter(credito__empresa_id=empresa_id)
+    if marca.marca:
+        nuevos = eventos.filter(fecha_cambio__gt=marca.marca)
+        if not nuevos.exists():
+            return 0, marca.marca
+        desde = marca.marca - SOLAPAMIENTO
+        eventos = eventos.filter(credito_id__in=nuevos.values('credito_id'))
+    else:
+        desde = None
+
+    orden = [F('fecha_cambio').asc(), F('id').asc()]
+    intervalos = eventos.annotate(
+        fin=Window(Lead('fecha_cambio'), partition_by=[F('credito_id')], order_by=orden),
+        usuario_cierre=Window(Lead('usuario_cambio_id'), partition_by=[F('credito_id')], order_by=orden),
+    ).filter(fin__isnull=False)
+    if desde is not None:
+        intervalos = intervalos.filter(fin__gt=desde)
+    intervalos = intervalos.values(
+        'id', 'credito_id', 'credito__tipo_credito_id', 'fase_nueva', 'fecha_cambio', 'fin', 'usuario_cierre',
+    )
+
+    guardados = 0
+    ultima = marca.marca
+    pendientes = []
+    for fila in intervalos.iterator(chunk_size=lote):
+        pendientes.append(DuracionFase(
+            id_historico=fila['id'],
+            id_credito=fila['credito_id'],
+            empresa_id=empresa_id,
+            tipo_credito_id=fila['credito__tipo_credito_id'],
+            usuario_id=fila['usuario_cierre'],
+            fase=fila['fase_nueva'],
+            inicio=fila['fecha_cambio'],
+            fin=fila['fin'],
+            segundos=(fila['fin'] - fila['fecha_cambio']).total_seconds(),
+        ))
+        ultima = fila['fin'] if ultima is None else max(ultima, fila['fin'])
+        if len(pendientes) >= lote:
+            guardados += _guardar_nuevos(empresa_id, pendientes)
+            pendientes = []
+    if pendientes:
+        guardados += _guardar_nuevos(empresa_id, pendientes)
+
+    if ultima != marca.marca:
+        marca.marca = ultima
+        marca.save(update_fields=['marca', 'fecha_ejecucion'])
+    return guardados, marca.marca
+
+
+@registrar_handler(EVENTO_FASE_CAMBIADA)
+def actualizar_duraciones_eventos(eventos):
+    """Handler del outbox: único que avanza la marca y el resumen del dashboard"""
+    for empresa_id in sorted({evento.empresa_id for evento in eventos}):
+        actualizar_duraciones(empresa_id)
+
+
+def percentil(histograma, cantidad, q):
+    """Percentil q (0 a 1) estimado del histograma, en segundos: centro geométrico de la cubeta"""
+    objetivo = q * (cantidad - 1)
+    acumulado = 0
+    for indice in sorted(histograma, key=int):
+        acumulado += histograma[indice]
+        if acumulado > objetivo:
+            return RAZON_CUBETAS ** (int(indice) + 0.5)
+    return RAZON_CUBETAS ** (max(map(int, histograma)) + 0.5)
+
+
+def _estadisticas(resumen):
+    return {
+        'cantidad': resumen.cantidad,
+        'mediana_horas': round(percentil(resumen.histograma, resumen.cantidad, 0.5) / 3600, 2),
+        'p90_horas': round(percentil(resumen.histograma, resumen.cantidad, 0.9) / 3600, 2),
+        'promedio_horas': round(resumen.suma_segundos / resumen.cantidad / 3600, 2),
+    }
+
+
+def resumen_duraciones(empresa_id, agrupar='empresa'):
+    """
+    Estadísticas de duración por fase de la empresa
+
+    Lee ResumenDuracionFase, sin actualizar nada: los intervalos nuevos los
+    suma el handler del outbox. Reutiliza el resumen cacheado mientras la marca
+    de agua no cambie.
+
+    Args:
+        empresa_id: ID de la empresa
+        agrupar: 'empresa', 'tipo_credito' o 'analista'
+
+    Returns:
+        Dict con 'grupos': lista de {grupo, fases: [{fase, cantidad, mediana_horas, p90_horas, promedio_horas}]}
+    """
+    version = (
+        MarcaProceso.objects.filter(proceso=PROCESO_DURACIONES, empresa_id=empresa_id)
+        .values_list('marca', flat=True).first()
+    )
+    clave = f"{empresa_id}:{agrupar}:{version.isoformat() if version else ''}"
+    encontrado, resumen = duraciones_cache.get(clave)
+    if encontrado:
+        return resumen
+
+    por_grupo = defaultdict(dict)
+    for fila in ResumenDuracionFase.objects.filter(empresa_id=empresa_id, agrupacion=agrupar, cantidad__gt=0):
+        por_grupo[fila.grupo or None][fila.fase] = fila
+
+    orden_fases = [fase for fase, _ in ENUM_FASE_CREDITO]
+    resumen = {
+        'agrupar': agrupar,
+        'actualizado_hasta': version,
+        'grupos': [
+            {
+                'grupo': grupo,
+                'fases': [
+                    {'fase': fase, **_estadisticas(fases[fase])}
+                    for fase in orden_fases if fase in fases
+                ],
+            }
+            for grupo, fases in sorted(por_grupo.items(), key=lambda item: (item[0] is None, item[0] or 0))
+        ],
+    }
+    duraciones_cache.set(clave, resumen)
+    return resumen
@@ -1,53 +1,159 @@
+import heapq
+import itertools
+import json
+from operator import itemgetter
+
+from asgiref.sync import sync_to_async
+from django.core.handlers.asgi import ASGIRequest
+from django.http import StreamingHttpResponse
+from rest_framework.utils.encoders import JSONEncoder
 from rest_framework.views import APIView
 from rest_framework.response import Response
 from rest_framework import permissions, status
 from app_Cliente.models import Documentacion
-from app_Credito.models import Credito
+from app_Credito.models import Credito, CreditoArchivado
+from app_Credito.archivo import incluir_archivados
 from app_User.models import Perfiluser
+from app_User.tenant import get_perfil
+
+
+# Columnas del historial → clave en la respuesta
+CAMPOS_HISTORIAL = {
+    'cliente__documentacion__ci': 'ci_cliente',
+    'cliente__nombre': 'nombre_cliente',
+    'cliente__apellido': 'apellido_cliente',
+    'cliente__trabajo__cargo': 'cargo',
+    'cliente__trabajo__empresa': 'empresa_trabajo',
+    'cliente__trabajo__salario': 'salario',
+    'Monto_Solicitado': 'monto_prestamo',
+    'enum_estado': 'estado_prestamo',
+    'Moneda': 'moneda',
+}
+
+# Filas que se leen por viaje a la base de datos en modo streaming
+HISTORIAL_CHUNK_SIZE = 2000
+HISTORIAL_LIMITE_MAX = 1000
+
+
+async def en_bloques_async(partes, tamano=HISTORIAL_CHUNK_SIZE):
+    """
+    Recorre un generador síncrono de strings desde el event loop, de a bloques
+
+    Con ASGI, Django lee un iterador síncrono de StreamingHttpResponse entero
+    en memoria antes de enviarlo; este adaptador consume `tamano` partes por
+    llamada en el thread de la vista (que tiene abierto el cursor) y entrega
+    cada bloque apenas se lee.
+    """
+    iterador = iter(partes)
+
+    def siguiente_bloque():
+        return ''.join(itertools.islice(iterador, tamano))
+
+    try:
+        while True:
+            bloque = await sync_to_async(siguiente_bloque)()
+            if not bloque:
+                return
+            yield bloque
+    finally:
+        # Cierra el cursor del lado del servidor si el cliente corta antes del final
+        await sync_to_async(iterador.close)()
 
 
 class HistorialCreditoView(APIView):
+    """
+    Historial de créditos de la empresa
+    
+    GET /api/Creditos/historial/                    -> lista completa
+    GET /api/Creditos/historial/?limit=500          -> página + siguiente_cursor
+    GET /api/Creditos/historial/?limit=500&cursor=N -> página siguiente
+    GET /api/Creditos/historial/?stream=ndjson      -> un JSON por línea, en streaming
+    GET /api/Creditos/historial/?stream=json        -> arreglo JSON en streaming
+    
+    Con ?incluir_archivados=true se mezclan, por id, los créditos archivados.
+    """
     permission_classes = [permissions.IsAuthenticated]
 
     def get(self, request):
         try:
-            perfil = Perfiluser.objects.get(usuario=request.user)
+            perfil = get_perfil(request)
         except Perfiluser.DoesNotExist:
             return Response({'error': 'Sin empresa'}, status=status.HTTP_403_FORBIDDEN)
         
-        creditos = Credito.objects.filter(empresa=perfil.empresa).select_related('cliente', 'cliente__documentacion', 'cliente__trabajo')
+        fuentes = [Credito.objects.filter(empresa=perfil.empresa).order_by('id')]
+        if incluir_archivados(request):
+            # Los archivados conservan su id original: ambas fuentes se mezclan por id
+            fuentes.append(CreditoArchivado.objects.filter(empresa=perfil.empresa).order_by('id'))
         
-        historial = []
-        for c in creditos:
-            try:
-                doc = c.cliente.documentacion
-                ci = doc.ci
-            except:
-                ci = None
-                
-            try:
-                trabajo = c.cliente.trabajo
-                cargo = trabajo.cargo
-                empresa_trabajo = trabajo.empresa
-                salario = trabajo.salario
-            except:
-                cargo = None
-                empresa_trabajo = None
-                salario = None
-                
-            historial.append({
-                'ci_cliente': ci,
-                'nombre_cliente': c.cliente.nombre,
-                'apellido_cliente': c.cliente.apellido,
-                'cargo': cargo,
-                'empresa_trabajo': empresa_trabajo,
-                'salario': salario,
-                'monto_prestamo': c.Monto_Solicitado,
-                'estado_prestamo': c.enum_estado,
-                'moneda': c.Moneda,
-            })
+        modo_stream = request.query_params.get('stream')
+        if modo_stream:
+            if modo_stream not in ('ndjson', 'json'):
+                return Response({'error': "stream debe ser 'ndjson' o 'json'"}, status=status.HTTP_400_BAD_REQUEST)
+            filas = (
+                self.formatear(fila)
+                for fila in self.mezclar(
+                    fuente.values('id', *CAMPOS_HISTORIAL).iterator(chunk_size=HISTORIAL_CHUNK_SIZE)
+                    for fuente in fuentes
+                )
+            )
+            if modo_stream == 'ndjson':
+                return self.respuesta_stream(request, self.stream_ndjson(filas), 'application/x-ndjson')
+            return self.respuesta_stream(request, self.stream_json(filas), 'application/json')
         
-        return Response(historial)
+        limite = request.query_params.get('limit')
+        if limite is None:
+            historial = [
+                self.formatear(fila)
+                for fila in self.mezclar(fuente.values('id', *CAMPOS_HISTORIAL) for fuente in fuentes)
+            ]
+            return Response(historial)
+        
+        try:
+            limite = max(1, min(int(limite), HISTORIAL_LIMITE_MAX))
+            cursor = request.query_params.get('cursor')
+            if cursor:
+                fuentes = [fuente.filter(id__gt=int(cursor)) for fuente in fuentes]
+        except ValueError:
+            return Response({'error': 'limit y cursor deben ser números enteros'}, status=status.HTTP_400_BAD_REQUEST)
+        
+        filas = list(self.mezclar(fuente.values('id', *CAMPOS_HISTORIAL)[:limite + 1] for fuente in fuentes))[:limite + 1]
+        hay_mas = len(filas) > limite
+        filas = filas[:limite]
+        
+        return Response({
+            'resultados': [self.formatear(fila) for fila in filas],
+            'siguiente_cursor': str(filas[-1]['id']) if hay_mas else None,
+        })
+
+    @staticmethod
+    def respuesta_stream(request, partes, content_type):
+        """StreamingHttpResponse con un iterador asíncrono si la petición llegó por ASGI"""
+        if isinstance(request._request, ASGIRequest):
+            partes = en_bloques_async(partes)
+        return StreamingHttpResponse(partes, content_type=content_type)
+
+    @staticmethod
+    def mezclar(fuentes):
+        """Mezcla iterables de filas ya ordenados por id en un único orden por id"""
+        return heapq.merge(*fuentes, key=itemgetter('id'))
+
+    @staticmethod
+    def formatear(fila):
+        return {clave: fila[columna] for columna, clave in CAMPOS_HISTORIAL.items()}
+
+    @staticmethod
+    def stream_ndjson(filas):
+        for fila in filas:
+            yield json.dumps(fila, cls=JSONEncoder, ensure_ascii=False) + '\n'
+
+    @staticmethod
+    def stream_json(filas):
+        yield '['
+        separador = ''
+        for fila in filas:
+            yield separador + json.dumps(fila, cls=JSONEncoder, ensure_ascii=False)
+            separador = ','
+        yield ']'
 
 
 class HistorialCreditoCIView(APIView):
@@ -55,7 +161,7 @@ class HistorialCreditoCIView(APIView):
 
     def get(self, request, ci):
         try:
-            perfil = Perfiluser.objects.get(usuario=request.user)
+            perfil = get_perfil(request)
         except Perfiluser.DoesNotExist:
             return Response({'error': 'Sin empresa'}, status=status.HTTP_403_FORBIDDEN)
         
@@ -65,9 +171,11 @@ class HistorialCreditoCIView(APIView):
         except Documentacion.DoesNotExist:
             return Response({'message': 'No se encontraron registros para el CI proporcionado'}, status=status.HTTP_404_NOT_FOUND)
         
-        creditos = Credito.objects.filter(cliente=cliente, empresa=perfil.empresa).select_related('cliente', 'cliente__trabajo')
+        creditos = list(Credito.objects.filter(cliente=cliente, empresa=perfil.empresa).select_related('cliente', 'cliente__trabajo'))
+        if incluir_archivados(request):
+            creditos += list(CreditoArchivado.objects.filter(cliente=cliente, empresa=perfil.empresa).order_by('id'))
         
-        if not creditos.exists():
+        if not creditos:
             return Response({'message': 'No se encontraron créditos para el CI proporcionado'}, status=status.HTTP_404_NOT_FOUND)
         
         historial = []
@@ -102,7 +210,7 @@ class EstadoCreditoCIView(APIView):
 
     def get(self, request, ci):
         try:
-            perfil = Perfiluser.objects.get(usuario=request.user)
+            perfil = get_perfil(request)
         except Perfiluser.DoesNotExist:
             return Response({'error': 'Sin empresa'}, status=status.HTTP_403_FORBIDDEN)
         
@@ -113,6 +221,9 @@ class EstadoCreditoCIView(APIView):
             return Response({'message': 'No se encontraron créditos para el CI proporcionado'}, status=status.HTTP_404_NOT_FOUND)
         
         creditos = Credito.objects.filter(cliente=cliente, empresa=perfil.empresa).order_by('-Fecha_Aprobacion')
+        if incluir_archivados(request) and not creditos.exists():
+            # Los archivados son siempre créditos finalizados: solo se usan si no hay vigentes
+            creditos = CreditoArchivado.objects.filter(cliente=cliente, empresa=perfil.empresa).order_by('-Fecha_Aprobacion')
         
         if not creditos.exists():
             return Response({'message': 'No se encontraron créditos para el CI proporcionado'}, status=status.HTTP_404_NOT_FOUND)
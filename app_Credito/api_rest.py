@@ -1,19 +1,55 @@
-from .models import Credito, Tipo_Credito, HistoricoCredito
+from .models import Credito, Tipo_Credito, HistoricoCredito, CreditoArchivado
 from .serializers import (
-    CreditoSerializer, TipoCreditoSerializer, HistoricoreditoSerializer,
-    CreditoWorkflowSerializer, AgregarDocumentacionSerializer
+    CreditoSerializer, CreditoListSerializer, TipoCreditoSerializer, HistoricoreditoSerializer,
+    CreditoWorkflowSerializer, AgregarDocumentacionSerializer, RiesgoCreditoSerializer
 )
-from .workflow import cambiar_fase, validar_fase_secuencial, obtener_linea_tiempo, obtener_estado_actual
+from .workflow import (
+    cambiar_fase, validar_fase_secuencial, obtener_linea_tiempo, obtener_estado_actual, ConflictoFase,
+    cambiar_fase_lote,
+)
+from .amortizacion import tabla_amortizacion, proyectar_cartera, CAMPOS_CARTERA
+from .simulacion import simular_cartera
+from .pagination import CreditoCursorPagination
+from .pipeline import obtener_pipeline, ajustar_contadores, registrar_cambio
+from .eventos import emitir_token_stream
+from .analitica import resumen_duraciones, AGRUPACIONES
+from .riesgo import obtener_riesgo
+from .idempotencia import idempotente
+from .condicional import condicional
+from .archivo import incluir_archivados, CreditosConArchivados
+from .cola_revision import reclamar, asignado_a_otro, asignados_a_otros, liberar, cola_analista, duracion_lease
 from app_User.models import Perfiluser
+from app_User.tenant import get_perfil
 from app_Cliente.models import Documentacion, Trabajo, Domicilio, Garante
 from rest_framework import viewsets, permissions, status
 from rest_framework.response import Response
 from rest_framework.decorators import action
 from rest_framework.exceptions import ValidationError
+from django.conf import settings
+from django.db import transaction
+from django.http import Http404
+from django.shortcuts import get_object_or_404
 from django.utils import timezone
+from django.utils.dateparse import parse_date
+from decimal import Decimal, InvalidOperation
 import datetime
 
 
+# Paginación de la línea de tiempo (linea-tiempo)
+LINEA_TIEMPO_LIMITE_DEFAULT = 50
+LINEA_TIEMPO_LIMITE_MAX = 500
+
+# Máximo de créditos por acción por lote (revisar-lote, desembolsar-lote)
+LOTE_LIMITE_MAX = 1000
+
+# Tamaño de la cola de revisión por analista (cola-revision)
+COLA_REVISION_CANTIDAD_DEFAULT = 10
+COLA_REVISION_CANTIDAD_MAX = 100
+
+# Estados que se consideran cartera vigente en las proyecciones
+ESTADOS_CARTERA_ACTIVA = ('Aprobado', 'DESENBOLSADO')
+
+
 class TipoCreditoViewSet(viewsets.ModelViewSet):
     serializer_class = TipoCreditoSerializer
     permission_classes = [permissions.IsAuthenticated]
@@ -22,15 +58,15 @@ class TipoCreditoViewSet(viewsets.ModelViewSet):
         """Filtrar tipos de crédito por empresa del usuario"""
         user = self.request.user
         try:
-            perfil = Perfiluser.objects.get(usuario=user)
-            return Tipo_Credito.objects.filter(empresa=perfil.empresa)
+            perfil = get_perfil(self.request)
+            return Tipo_Credito.objects.filter(empresa=perfil.empresa).order_by('id')
         except Perfiluser.DoesNotExist:
             return Tipo_Credito.objects.none()
     
     def perform_create(self, serializer):
         """Auto-asignar empresa al crear tipo de crédito"""
         try:
-            perfil = Perfiluser.objects.get(usuario=self.request.user)
+            perfil = get_perfil(self.request)
             serializer.save(empresa=perfil.empresa)
         except Perfiluser.DoesNotExist:
             raise ValidationError("No se encontró el perfil de usuario. Contacta al administrador.")
@@ -39,37 +75,186 @@ class TipoCreditoViewSet(viewsets.ModelViewSet):
 class CreditoViewSet(viewsets.ModelViewSet):
     serializer_class = CreditoSerializer
     permission_classes = [permissions.IsAuthenticated]
+    pagination_class = CreditoCursorPagination
+
+    # Acciones que aceptan ?fields= (solo lectura: con .only() no se debe guardar)
+    ACCIONES_CAMPOS = ('list', 'retrieve')
+    # Acciones de solo lectura que con ?incluir_archivados=true también leen CreditoArchivado
+    ACCIONES_ARCHIVO = ('list', 'retrieve', 'linea_tiempo', 'estado_actual')
 
     def get_queryset(self):
-        user = self.request.user
+        queryset = self.creditos_visibles(Credito)
+        if self.action == 'list' and incluir_archivados(self.request):
+            # El cursor (fecha_creacion, id) recorre las dos tablas como una sola
+            return CreditosConArchivados(queryset, self.creditos_visibles(CreditoArchivado))
+        return queryset
+
+    def get_object(self):
         try:
-            perfil = Perfiluser.objects.get(usuario=user)
-            return Credito.objects.filter(empresa=perfil.empresa)
+            return super().get_object()
+        except Http404:
+            if self.action not in self.ACCIONES_ARCHIVO or not incluir_archivados(self.request):
+                raise
+            return get_object_or_404(self.creditos_visibles(CreditoArchivado), pk=self.kwargs['pk'])
+
+    def creditos_visibles(self, modelo):
+        """Créditos de `modelo` (Credito o CreditoArchivado) de la empresa del usuario, con los filtros y ?fields= de la acción"""
+        try:
+            perfil = get_perfil(self.request)
+            queryset = modelo.objects.filter(empresa=perfil.empresa)
         except Perfiluser.DoesNotExist:
-            return Credito.objects.none()
+            return modelo.objects.none()
+
+        if self.action == 'list':
+            queryset = self.filtrar_creditos(queryset, self.request.query_params)
+
+        campos = self.get_campos()
+        if campos:
+            # El orden del cursor necesita fecha_creacion e id aunque no se devuelvan
+            queryset = queryset.only(*set(campos) | {'id', 'fecha_creacion'})
+        return queryset
+
+    def filtrar_creditos(self, queryset, params):
+        """
+        Filtros del listado, cubiertos por los índices (empresa, ...) de Credito
+        
+        Query params:
+            enum_estado, fase_actual: uno o varios valores separados por coma
+            tipo_credito: ID del tipo de crédito
+            Moneda: código de moneda
+            fecha_desde, fecha_hasta: rango de fecha_creacion (YYYY-MM-DD, ambos inclusive)
+            monto_min, monto_max: rango de Monto_Solicitado
+        """
+        for campo in ('enum_estado', 'fase_actual'):
+            valores = [v.strip() for v in params.get(campo, '').split(',') if v.strip()]
+            if valores:
+                queryset = queryset.filter(**{f'{campo}__in': valores})
+
+        if params.get('tipo_credito'):
+            if not params['tipo_credito'].isdigit():
+                raise ValidationError({'tipo_credito': "Debe ser un ID numérico"})
+            queryset = queryset.filter(tipo_credito_id=int(params['tipo_credito']))
+        if params.get('Moneda'):
+            queryset = queryset.filter(Moneda=params['Moneda'])
+
+        # Rango por límites de día en lugar de __date para que use el índice
+        for parametro, lookup, dias in (('fecha_desde', 'gte', 0), ('fecha_hasta', 'lt', 1)):
+            if params.get(parametro):
+                try:
+                    fecha = parse_date(params[parametro])
+                except ValueError:
+                    fecha = None
+                if fecha is None:
+                    raise ValidationError({parametro: "Formato de fecha inválido, usar YYYY-MM-DD"})
+                limite = timezone.make_aware(datetime.datetime.combine(fecha + datetime.timedelta(days=dias), datetime.time.min))
+                queryset = queryset.filter(**{f'fecha_creacion__{lookup}': limite})
+
+        for parametro, lookup in (('monto_min', 'gte'), ('monto_max', 'lte')):
+            if params.get(parametro):
+                try:
+                    monto = Decimal(params[parametro])
+                except InvalidOperation:
+                    monto = None
+                if monto is None or not monto.is_finite():
+                    raise ValidationError({parametro: "Debe ser un número"})
+                queryset = queryset.filter(**{f'Monto_Solicitado__{lookup}': monto})
+
+        return queryset
+
+    def get_serializer_class(self):
+        if self.action == 'list':
+            return CreditoListSerializer
+        return CreditoSerializer
+
+    def get_serializer_context(self):
+        context = super().get_serializer_context()
+        context['fields'] = self.get_campos()
+        return context
+
+    def get_campos(self):
+        """
+        Campos pedidos con ?fields= en list/retrieve, validados contra el serializer de la acción
+
+        Returns:
+            Lista de nombres de campo, o None si no se pidió un subconjunto
+        """
+        if self.action not in self.ACCIONES_CAMPOS:
+            return None
+        if not hasattr(self, '_campos'):
+            parametro = self.request.query_params.get('fields')
+            campos = [c.strip() for c in parametro.split(',') if c.strip()] if parametro else None
+            if campos:
+                disponibles = self.get_serializer_class().Meta.fields
+                if disponibles == '__all__':
+                    disponibles = [f.name for f in Credito._meta.concrete_fields]
+                invalidos = [c for c in campos if c not in disponibles]
+                if invalidos:
+                    raise ValidationError({'fields': f"Campos inválidos: {', '.join(invalidos)}"})
+            self._campos = campos
+        return self._campos
 
     def perform_create(self, serializer):
         try:
-            perfil = Perfiluser.objects.get(usuario=self.request.user)
-            serializer.save(empresa=perfil.empresa, usuario=self.request.user)
+            perfil = get_perfil(self.request)
+            # Atómico para que el crédito y su contador del pipeline se guarden juntos
+            with transaction.atomic():
+                serializer.save(empresa=perfil.empresa, usuario=self.request.user)
         except Perfiluser.DoesNotExist:
             pass
 
+    def perform_update(self, serializer):
+        with transaction.atomic():
+            # (fase, estado) de la fila bloqueada: lo que save() reemplaza de verdad
+            anterior = Credito.objects.select_for_update().values_list(
+                'fase_actual', 'enum_estado',
+            ).get(pk=serializer.instance.pk)
+            credito = serializer.save()
+            nuevo = (credito.fase_actual, credito.enum_estado)
+            ajustar_contadores(registrar_cambio(credito.empresa_id, anterior, nuevo))
+
     @action(detail=True, methods=['get'], url_path='linea-tiempo')
+    @condicional
     def linea_tiempo(self, request, pk=None):
-        """Obtiene la línea de tiempo completa del crédito"""
+        """
+        Obtiene la línea de tiempo del crédito, paginada por cursor
+        
+        Query params:
+            limit: eventos por página (default LINEA_TIEMPO_LIMITE_DEFAULT, máx. LINEA_TIEMPO_LIMITE_MAX)
+            cursor: valor de 'siguiente_cursor' de la página anterior
+            fields: campos separados por coma (id, fase_anterior, fase_nueva, fecha_cambio, usuario, descripcion, datos_agregados)
+        """
         try:
             credito = self.get_object()
-            linea = obtener_linea_tiempo(credito)
+            
+            try:
+                limite = int(request.query_params.get('limit', LINEA_TIEMPO_LIMITE_DEFAULT))
+            except ValueError:
+                raise ValidationError("limit debe ser un número entero")
+            limite = max(1, min(limite, LINEA_TIEMPO_LIMITE_MAX))
+            
+            campos = request.query_params.get('fields')
+            campos = [c.strip() for c in campos.split(',') if c.strip()] if campos else None
+            
+            linea, siguiente_cursor = obtener_linea_tiempo(
+                credito,
+                limite=limite,
+                cursor=request.query_params.get('cursor'),
+                campos=campos,
+            )
             return Response({
                 'credito_id': credito.id,
                 'linea_tiempo': linea,
-                'total_cambios': len(linea),
+                # Total del crédito, no de la página
+                'total_cambios': credito.historico.count(),
+                'siguiente_cursor': siguiente_cursor,
             })
         except Credito.DoesNotExist:
             return Response({'error': 'Crédito no encontrado'}, status=status.HTTP_404_NOT_FOUND)
+        except ValidationError as e:
+            return Response({'error': str(e)}, status=status.HTTP_400_BAD_REQUEST)
 
     @action(detail=True, methods=['get'], url_path='estado-actual')
+    @condicional
     def estado_actual(self, request, pk=None):
         """Obtiene el estado actual del crédito con información detallada"""
         try:
@@ -79,7 +264,163 @@ class CreditoViewSet(viewsets.ModelViewSet):
         except Credito.DoesNotExist:
             return Response({'error': 'Crédito no encontrado'}, status=status.HTTP_404_NOT_FOUND)
 
+    @action(detail=True, methods=['get'], url_path='riesgo')
+    def riesgo(self, request, pk=None):
+        """Deuda/ingreso, carga de la cuota, exposición y puntaje de la solicitud"""
+        try:
+            credito = self.get_object()
+            return Response(RiesgoCreditoSerializer(obtener_riesgo(credito)).data)
+        except Credito.DoesNotExist:
+            return Response({'error': 'Crédito no encontrado'}, status=status.HTTP_404_NOT_FOUND)
+
+    @action(detail=True, methods=['get'], url_path='amortizacion')
+    def amortizacion(self, request, pk=None):
+        """
+        Calcula la tabla de amortización del crédito
+        
+        Query params:
+            sistema: 'frances' (default) o 'aleman'
+        """
+        try:
+            credito = self.get_object()
+            sistema = request.query_params.get('sistema', 'frances')
+            fecha_inicio = credito.Fecha_Desembolso or credito.fecha_creacion.date()
+            
+            tabla = tabla_amortizacion(
+                credito.Monto_Solicitado,
+                credito.Tasa_Interes,
+                credito.Numero_Cuotas,
+                sistema=sistema,
+                fecha_inicio=fecha_inicio,
+            )
+            
+            # Comparar con los valores enviados por el cliente al crear el crédito
+            tabla['credito_id'] = credito.id
+            tabla['moneda'] = credito.Moneda
+            tabla['diferencia_cuota'] = credito.Monto_Cuota - tabla['cuota_inicial']
+            tabla['diferencia_total_pagar'] = credito.Monto_Pagar - tabla['total_pagar']
+            return Response(tabla)
+            
+        except Credito.DoesNotExist:
+            return Response({'error': 'Crédito no encontrado'}, status=status.HTTP_404_NOT_FOUND)
+        except ValidationError as e:
+            return Response({'error': str(e)}, status=status.HTTP_400_BAD_REQUEST)
+
+    @action(detail=False, methods=['get'], url_path='proyeccion-flujo')
+    def proyeccion_flujo(self, request):
+        """
+        Proyecta el flujo de caja mensual de la cartera de la empresa
+        
+        Query params:
+            sistema: 'frances' (default) o 'aleman'
+            estado: estados a incluir separados por coma (default: Aprobado,DESENBOLSADO)
+        """
+        try:
+            sistema = request.query_params.get('sistema', 'frances')
+            estados = request.query_params.get('estado', ','.join(ESTADOS_CARTERA_ACTIVA)).split(',')
+            
+            filas = self.get_queryset().filter(enum_estado__in=estados).values(*CAMPOS_CARTERA)
+            proyeccion = proyectar_cartera(filas.iterator(chunk_size=2000), sistema=sistema)
+            return Response(proyeccion)
+            
+        except ValidationError as e:
+            return Response({'error': str(e)}, status=status.HTTP_400_BAD_REQUEST)
+
+    @action(detail=False, methods=['get'], url_path='pipeline')
+    def pipeline(self, request):
+        """Cantidad de créditos de la empresa por fase y por estado (contadores, sin recorrer Credito)"""
+        try:
+            perfil = get_perfil(request)
+        except Perfiluser.DoesNotExist:
+            return Response({"error": "Usuario no tiene perfil asociado"}, status=status.HTTP_403_FORBIDDEN)
+        return Response(obtener_pipeline(perfil.empresa_id))
+
+    @action(detail=False, methods=['post'], url_path='token-eventos')
+    def token_eventos(self, request):
+        """
+        Token de corta duración (SSE_TOKEN_MAX_AGE) para abrir el stream de
+        eventos con ?token=, que solo sirve para eso: el token de la API no va en la URL
+        """
+        try:
+            perfil = get_perfil(request)
+        except Perfiluser.DoesNotExist:
+            return Response({"error": "Usuario no tiene perfil asociado"}, status=status.HTTP_403_FORBIDDEN)
+        if request.auth is None:
+            return Response({"error": "Se requiere autenticación por token"}, status=status.HTTP_401_UNAUTHORIZED)
+        return Response({
+            'token': emitir_token_stream(request.user, perfil.empresa_id, request.auth),
+            'expira_en': getattr(settings, 'SSE_TOKEN_MAX_AGE', 60),
+        })
+
+    @action(detail=False, methods=['get'], url_path='duracion-fases')
+    def duracion_fases(self, request):
+        """
+        Mediana, p90 y promedio (en horas) del tiempo que los créditos pasan en cada fase
+        
+        Query params:
+            agrupar: 'empresa' (default), 'tipo_credito' o 'analista' (usuario que cerró la fase)
+        """
+        try:
+            perfil = get_perfil(request)
+        except Perfiluser.DoesNotExist:
+            return Response({"error": "Usuario no tiene perfil asociado"}, status=status.HTTP_403_FORBIDDEN)
+        
+        agrupar = request.query_params.get('agrupar', 'empresa')
+        if agrupar not in AGRUPACIONES:
+            return Response(
+                {'error': f"agrupar debe ser uno de: {', '.join(AGRUPACIONES)}"},
+                status=status.HTTP_400_BAD_REQUEST,
+            )
+        return Response(resumen_duraciones(perfil.empresa_id, agrupar=agrupar))
+
+    @action(detail=False, methods=['get'], url_path='simulacion')
+    def simulacion(self, request):
+        """
+        Simula escenarios de estrés sobre la cartera vigente de la empresa
+        
+        Query params:
+            modo: 'escenario' (default, valores esperados) o 'montecarlo'
+            sistema: 'frances' (default) o 'aleman'
+            estado: estados a incluir separados por coma (default: Aprobado,DESENBOLSADO)
+            shock_tasa: puntos porcentuales sumados a la tasa anual (p. ej. 2)
+            tasa_default: probabilidad anual de mora, entre 0 y 1
+            recuperacion: fracción del saldo recuperada en mora, entre 0 y 1
+            volatilidad_tasa: desvío del shock de tasa por simulación (solo montecarlo)
+            simulaciones: cantidad de simulaciones (solo montecarlo, default 1000)
+            semilla: semilla del generador aleatorio (solo montecarlo)
+        """
+        try:
+            perfil = get_perfil(request)
+            params = request.query_params
+            modo = params.get('modo', 'escenario')
+            estados = params.get('estado', ','.join(ESTADOS_CARTERA_ACTIVA)).split(',')
+            
+            try:
+                parametros = {
+                    'sistema': params.get('sistema', 'frances'),
+                    'shock_tasa': float(params.get('shock_tasa', 0)),
+                    'tasa_default': float(params.get('tasa_default', 0)),
+                    'recuperacion': float(params.get('recuperacion', 0)),
+                }
+                if modo == 'montecarlo':
+                    parametros['volatilidad_tasa'] = float(params.get('volatilidad_tasa', 0))
+                    parametros['simulaciones'] = int(params.get('simulaciones', 1000))
+                    if params.get('semilla') is not None:
+                        parametros['semilla'] = int(params['semilla'])
+            except ValueError:
+                raise ValidationError("Los parámetros de la simulación deben ser numéricos")
+            
+            creditos = self.get_queryset().filter(enum_estado__in=estados)
+            resultado = simular_cartera(creditos, perfil.empresa_id, modo=modo, **parametros)
+            return Response(resultado)
+            
+        except Perfiluser.DoesNotExist:
+            return Response({"error": "Usuario no tiene perfil asociado"}, status=status.HTTP_403_FORBIDDEN)
+        except ValidationError as e:
+            return Response({'error': str(e)}, status=status.HTTP_400_BAD_REQUEST)
+
     @action(detail=True, methods=['patch'], url_path='agregar-documentacion')
+    @idempotente
     def agregar_documentacion(self, request, pk=None):
         """Agrega documentación y avanza a FASE_2"""
         try:
@@ -126,8 +467,11 @@ class CreditoViewSet(viewsets.ModelViewSet):
             return Response({'error': 'Crédito no encontrado'}, status=status.HTTP_404_NOT_FOUND)
         except ValidationError as e:
             return Response({'error': str(e)}, status=status.HTTP_400_BAD_REQUEST)
+        except ConflictoFase as e:
+            return Response({'error': str(e.detail)}, status=status.HTTP_409_CONFLICT)
 
     @action(detail=True, methods=['patch'], url_path='agregar-laboral')
+    @idempotente
     def agregar_laboral(self, request, pk=None):
         """Agrega información laboral y avanza a FASE_3"""
         try:
@@ -178,8 +522,11 @@ class CreditoViewSet(viewsets.ModelViewSet):
             return Response({'error': 'Crédito no encontrado'}, status=status.HTTP_404_NOT_FOUND)
         except ValidationError as e:
             return Response({'error': str(e)}, status=status.HTTP_400_BAD_REQUEST)
+        except ConflictoFase as e:
+            return Response({'error': str(e.detail)}, status=status.HTTP_409_CONFLICT)
 
     @action(detail=True, methods=['patch'], url_path='agregar-domicilio')
+    @idempotente
     def agregar_domicilio(self, request, pk=None):
         """Agrega domicilio y avanza a FASE_4"""
         try:
@@ -230,8 +577,11 @@ class CreditoViewSet(viewsets.ModelViewSet):
             return Response({'error': 'Crédito no encontrado'}, status=status.HTTP_404_NOT_FOUND)
         except ValidationError as e:
             return Response({'error': str(e)}, status=status.HTTP_400_BAD_REQUEST)
+        except ConflictoFase as e:
+            return Response({'error': str(e.detail)}, status=status.HTTP_409_CONFLICT)
 
     @action(detail=True, methods=['patch'], url_path='agregar-garante')
+    @idempotente
     def agregar_garante(self, request, pk=None):
         """Agrega datos del garante y avanza a FASE_5"""
         try:
@@ -286,8 +636,11 @@ class CreditoViewSet(viewsets.ModelViewSet):
             return Response({'error': 'Crédito no encontrado'}, status=status.HTTP_404_NOT_FOUND)
         except ValidationError as e:
             return Response({'error': str(e)}, status=status.HTTP_400_BAD_REQUEST)
+        except ConflictoFase as e:
+            return Response({'error': str(e.detail)}, status=status.HTTP_409_CONFLICT)
 
     @action(detail=True, methods=['patch'], url_path='enviar-revision')
+    @idempotente
     def enviar_revision(self, request, pk=None):
         """Envía el crédito a revisión (FASE_6)"""
         try:
@@ -316,8 +669,11 @@ class CreditoViewSet(viewsets.ModelViewSet):
             return Response({'error': 'Crédito no encontrado'}, status=status.HTTP_404_NOT_FOUND)
         except ValidationError as e:
             return Response({'error': str(e)}, status=status.HTTP_400_BAD_REQUEST)
+        except ConflictoFase as e:
+            return Response({'error': str(e.detail)}, status=status.HTTP_409_CONFLICT)
 
     @action(detail=True, methods=['patch'], url_path='revisar')
+    @idempotente
     def revisar_credito(self, request, pk=None):
         """Analista aprueba o rechaza el crédito (FASE_6)"""
         try:
@@ -327,6 +683,13 @@ class CreditoViewSet(viewsets.ModelViewSet):
             if credito.fase_actual != 'FASE_6_REVISION':
                 raise ValidationError(f"Solo se puede revisar créditos en FASE_6_REVISION")
             
+            asignacion = asignado_a_otro(credito.pk, request.user)
+            if asignacion:
+                return Response(
+                    {'error': f"Crédito asignado a {asignacion.analista.username} hasta {asignacion.vence.isoformat()}"},
+                    status=status.HTTP_409_CONFLICT,
+                )
+            
             aprobado = request.data.get('aprobado')
             razon = request.data.get('razon', '')
             
@@ -335,32 +698,34 @@ class CreditoViewSet(viewsets.ModelViewSet):
             
             if aprobado:
                 # Aprobar: cambiar estado y avanzar a FASE_7
-                credito.enum_estado = 'Aprobado'
-                credito.Fecha_Aprobacion = timezone.now().date()
-                
                 cambiar_fase(
                     credito=credito,
                     fase_nueva='FASE_7_DESEMBOLSO',
                     usuario=request.user,
-                    descripcion='Crédito aprobado'
+                    descripcion='Crédito aprobado',
+                    campos={
+                        'enum_estado': 'Aprobado',
+                        'Fecha_Aprobacion': timezone.now().date(),
+                    }
                 )
                 
                 mensaje = 'Crédito aprobado exitosamente'
             else:
                 # Rechazar: cambiar estado a Rechazado y mantener en FASE_6
-                credito.enum_estado = 'Rechazado'
-                credito.razon_rechazo = razon
-                credito.save()
-                
                 cambiar_fase(
                     credito=credito,
                     fase_nueva='FASE_6_REVISION',
                     usuario=request.user,
-                    descripcion=f'Crédito rechazado: {razon}'
+                    descripcion=f'Crédito rechazado: {razon}',
+                    campos={
+                        'enum_estado': 'Rechazado',
+                        'razon_rechazo': razon,
+                    }
                 )
                 
                 mensaje = 'Crédito rechazado'
             
+            liberar([credito.pk])
             estado = obtener_estado_actual(credito)
             return Response({
                 'mensaje': mensaje,
@@ -373,8 +738,11 @@ class CreditoViewSet(viewsets.ModelViewSet):
             return Response({'error': 'Crédito no encontrado'}, status=status.HTTP_404_NOT_FOUND)
         except ValidationError as e:
             return Response({'error': str(e)}, status=status.HTTP_400_BAD_REQUEST)
+        except ConflictoFase as e:
+            return Response({'error': str(e.detail)}, status=status.HTTP_409_CONFLICT)
 
     @action(detail=True, methods=['patch'], url_path='desembolsar')
+    @idempotente
     def desembolsar(self, request, pk=None):
         """Realiza el desembolso del crédito (FASE_7)"""
         try:
@@ -387,15 +755,16 @@ class CreditoViewSet(viewsets.ModelViewSet):
             if credito.enum_estado != 'Aprobado':
                 raise ValidationError("El crédito debe estar aprobado para desembolsar")
             
-            # Actualizar datos de desembolso
-            credito.enum_estado = 'DESENBOLSADO'
-            credito.Fecha_Desembolso = timezone.now().date()
-            
+            # Actualizar datos de desembolso junto con la fase
             cambiar_fase(
                 credito=credito,
                 fase_nueva='FASE_8_FINALIZADO',
                 usuario=request.user,
-                descripcion='Crédito desembolsado exitosamente'
+                descripcion='Crédito desembolsado exitosamente',
+                campos={
+                    'enum_estado': 'DESENBOLSADO',
+                    'Fecha_Desembolso': timezone.now().date(),
+                }
             )
             
             estado = obtener_estado_actual(credito)
@@ -410,3 +779,195 @@ class CreditoViewSet(viewsets.ModelViewSet):
             return Response({'error': 'Crédito no encontrado'}, status=status.HTTP_404_NOT_FOUND)
         except ValidationError as e:
             return Response({'error': str(e)}, status=status.HTTP_400_BAD_REQUEST)
+        except ConflictoFase as e:
+            return Response({'error': str(e.detail)}, status=status.HTTP_409_CONFLICT)
+
+    @action(detail=True, methods=['patch'], url_path='finalizar')
+    @idempotente
+    def finalizar(self, request, pk=None):
+        """Cierra un crédito desembolsado y cancelado; desde aquí lo toma archivar_creditos"""
+        try:
+            credito = self.get_object()
+
+            if credito.fase_actual != 'FASE_8_FINALIZADO' or credito.enum_estado != 'DESENBOLSADO':
+                raise ValidationError("Solo se puede finalizar un crédito desembolsado")
+
+            cambiar_fase(
+                credito=credito,
+                fase_nueva='FASE_8_FINALIZADO',
+                usuario=request.user,
+                descripcion='Crédito finalizado',
+                campos={
+                    'enum_estado': 'FINALIZADO',
+                    'Fecha_Finalizacion': timezone.now().date(),
+                }
+            )
+
+            return Response({
+                'mensaje': 'Crédito finalizado exitosamente',
+                'estado_actual': credito.enum_estado,
+                'fecha_finalizacion': credito.Fecha_Finalizacion,
+            }, status=status.HTTP_200_OK)
+
+        except Credito.DoesNotExist:
+            return Response({'error': 'Crédito no encontrado'}, status=status.HTTP_404_NOT_FOUND)
+        except ValidationError as e:
+            return Response({'error': str(e)}, status=status.HTTP_400_BAD_REQUEST)
+        except ConflictoFase as e:
+            return Response({'error': str(e.detail)}, status=status.HTTP_409_CONFLICT)
+
+    def _ids_lote(self, request):
+        """Lee y valida la lista 'ids' del body de las acciones por lote"""
+        ids = request.data.get('ids')
+        if not isinstance(ids, list) or not ids:
+            raise ValidationError("'ids' debe ser una lista no vacía de IDs de crédito")
+        if len(ids) > LOTE_LIMITE_MAX:
+            raise ValidationError(f"Máximo {LOTE_LIMITE_MAX} créditos por lote")
+        try:
+            # Quitar duplicados manteniendo el orden
+            return list(dict.fromkeys(int(i) for i in ids))
+        except (TypeError, ValueError):
+            raise ValidationError("'ids' solo puede contener números enteros")
+
+    def _respuesta_lote(self, resultados):
+        procesados = sum(1 for r in resultados if r['ok'])
+        return Response({
+            'procesados': procesados,
+            'fallidos': len(resultados) - procesados,
+            'resultados': resultados,
+        }, status=status.HTTP_200_OK)
+
+    @action(detail=False, methods=['get', 'post'], url_path='cola-revision')
+    def cola_revision(self, request):
+        """
+        Cola de revisión del analista: créditos en FASE_6 reservados para él
+        
+        GET: lista la cola actual
+        POST: completa la cola hasta 'cantidad' créditos con los pendientes más
+        antiguos y renueva el vencimiento de los que ya tenía
+        
+        Body (POST): {"cantidad": 10}
+        """
+        try:
+            get_perfil(request)
+        except Perfiluser.DoesNotExist:
+            return Response({"error": "Usuario no tiene perfil asociado"}, status=status.HTTP_403_FORBIDDEN)
+        
+        asignados = 0
+        if request.method == 'POST':
+            try:
+                cantidad = int(request.data.get('cantidad', COLA_REVISION_CANTIDAD_DEFAULT))
+            except (TypeError, ValueError):
+                return Response({'error': "'cantidad' debe ser un número entero"}, status=status.HTTP_400_BAD_REQUEST)
+            if not 1 <= cantidad <= COLA_REVISION_CANTIDAD_MAX:
+                return Response(
+                    {'error': f"'cantidad' debe estar entre 1 y {COLA_REVISION_CANTIDAD_MAX}"},
+                    status=status.HTTP_400_BAD_REQUEST,
+                )
+            asignados = reclamar(self.get_queryset(), request.user, cantidad)
+        
+        return Response({
+            'asignados': asignados,
+            'lease_minutos': duracion_lease().total_seconds() / 60,
+            'creditos': cola_analista(request.user),
+        })
+
+    @action(detail=True, methods=['post'], url_path='liberar-revision')
+    def liberar_revision(self, request, pk=None):
+        """Devuelve a la cola de revisión un crédito reservado por el analista"""
+        try:
+            credito = self.get_object()
+            if not liberar([credito.pk], request.user):
+                return Response({'error': 'El crédito no está asignado a este usuario'}, status=status.HTTP_400_BAD_REQUEST)
+            return Response({'mensaje': 'Crédito devuelto a la cola de revisión'})
+        except Credito.DoesNotExist:
+            return Response({'error': 'Crédito no encontrado'}, status=status.HTTP_404_NOT_FOUND)
+
+    @action(detail=False, methods=['post'], url_path='revisar-lote')
+    @idempotente
+    def revisar_lote(self, request):
+        """
+        Aprueba o rechaza varios créditos en FASE_6 en una sola operación
+        
+        Body: {"ids": [1, 2, 3], "aprobado": true, "razon": "..."}
+        """
+        try:
+            ids = self._ids_lote(request)
+            aprobado = request.data.get('aprobado')
+            razon = request.data.get('razon', '')
+            
+            if aprobado is None:
+                raise ValidationError("Campo 'aprobado' es requerido (true/false)")
+            
+            ajenos = asignados_a_otros(ids, request.user)
+            
+            def validar_asignacion(credito):
+                asignacion = ajenos.get(credito.pk)
+                if asignacion:
+                    raise ValidationError(f"Crédito asignado a {asignacion.analista.username}")
+            
+            if aprobado:
+                resultados = cambiar_fase_lote(
+                    self.get_queryset(), ids,
+                    fase_requerida='FASE_6_REVISION',
+                    fase_nueva='FASE_7_DESEMBOLSO',
+                    usuario=request.user,
+                    descripcion='Crédito aprobado',
+                    campos={
+                        'enum_estado': 'Aprobado',
+                        'Fecha_Aprobacion': timezone.now().date(),
+                    },
+                    validar=validar_asignacion,
+                )
+            else:
+                resultados = cambiar_fase_lote(
+                    self.get_queryset(), ids,
+                    fase_requerida='FASE_6_REVISION',
+                    fase_nueva='FASE_6_REVISION',
+                    usuario=request.user,
+                    descripcion=f'Crédito rechazado: {razon}',
+                    campos={
+                        'enum_estado': 'Rechazado',
+                        'razon_rechazo': razon,
+                    },
+                    validar=validar_asignacion,
+                )
+            
+            liberar([r['id'] for r in resultados if r['ok']])
+            return self._respuesta_lote(resultados)
+            
+        except ValidationError as e:
+            return Response({'error': str(e)}, status=status.HTTP_400_BAD_REQUEST)
+
+    @action(detail=False, methods=['post'], url_path='desembolsar-lote')
+    @idempotente
+    def desembolsar_lote(self, request):
+        """
+        Desembolsa varios créditos aprobados en FASE_7 en una sola operación
+        
+        Body: {"ids": [1, 2, 3]}
+        """
+        try:
+            ids = self._ids_lote(request)
+            
+            def validar_aprobado(credito):
+                if credito.enum_estado != 'Aprobado':
+                    raise ValidationError("El crédito debe estar aprobado para desembolsar")
+            
+            resultados = cambiar_fase_lote(
+                self.get_queryset(), ids,
+                fase_requerida='FASE_7_DESEMBOLSO',
+                fase_nueva='FASE_8_FINALIZADO',
+                usuario=request.user,
+                descripcion='Crédito desembolsado exitosamente',
+                campos={
+                    'enum_estado': 'DESENBOLSADO',
+                    'Fecha_Desembolso': timezone.now().date(),
+                },
+                validar=validar_aprobado,
+            )
+            
+            return self._respuesta_lote(resultados)
+            
+        except ValidationError as e:
+            return Response({'error': str(e)}, status=status.HTTP_400_BAD_REQUEST)
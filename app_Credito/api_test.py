@@ -8,6 +8,7 @@ from rest_framework.response import Response
 from rest_framework import status
 from .models import Tipo_Credito
 from app_User.models import Perfiluser
+from app_User.tenant import get_perfil
 
 @api_view(['GET', 'POST'])
 @permission_classes([IsAuthenticated])
@@ -19,7 +20,7 @@ def test_tipo_credito(request):
     user = request.user
     
     try:
-        perfil = Perfiluser.objects.get(usuario=user)
+        perfil = get_perfil(request)
         empresa = perfil.empresa
     except Perfiluser.DoesNotExist:
         return Response(
@@ -4,3 +4,7 @@ from django.apps import AppConfig
 class AppCreditoConfig(AppConfig):
     default_auto_field = 'django.db.models.BigAutoField'
     name = 'app_Credito'
+
+    def ready(self):
+        # Registrar señales y handlers del outbox (contadores del pipeline, duraciones, riesgo)
+        from . import signals, analitica, pipeline, riesgo  # noqa: F401
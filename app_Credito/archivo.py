@@ -0,0 +1,138 @@
+"""
+Archivo de créditos finalizados
+
+Mueve los créditos en FASE_8_FINALIZADO / FINALIZADO más viejos que N meses,
+junto con su HistoricoCredito y Ganancia_Credito, a las tablas *Archivado(a).
+Cada lote se copia y se borra en su propia transacción, así que una corrida
+interrumpida deja los créditos o en las tablas vivas o en las de archivo. Los
+contadores del pipeline se ajustan una vez por lote, con las señales de
+Credito desactivadas durante el borrado.
+
+Un crédito llega a FINALIZADO con la acción `finalizar` de CreditoViewSet.
+Con ?incluir_archivados=true el listado, el detalle, la línea de tiempo y el
+estado actual de CreditoViewSet (y las vistas de app_Credito/api.py) también
+leen las tablas de archivo.
+"""
+import datetime
+import heapq
+from operator import attrgetter
+
+from django.conf import settings
+from django.db import transaction
+from django.db.models import Count, Q
+from django.utils import timezone
+
+from .amortizacion import sumar_meses
+from .pipeline import ajustar_contadores
+from .signals import archivando
+from .models import (
+    Credito, HistoricoCredito, Ganancia_Credito,
+    CreditoArchivado, HistoricoCreditoArchivado, GananciaCreditoArchivada,
+)
+
+
+def _columnas(modelo):
+    return [campo.attname for campo in modelo._meta.concrete_fields if campo.attname != 'fecha_archivado']
+
+
+def creditos_archivables(meses=None, empresa_id=None):
+    """
+    Créditos finalizados cuya fecha de finalización (o última actualización, si
+    no tiene) es anterior a hoy menos `meses` meses
+    """
+    if meses is None:
+        meses = getattr(settings, 'ARCHIVO_CREDITOS_MESES', 12)
+    corte = sumar_meses(timezone.localdate(), -meses)
+    corte_dt = timezone.make_aware(datetime.datetime.combine(corte, datetime.time.min))
+
+    creditos = Credito.objects.filter(fase_actual='FASE_8_FINALIZADO', enum_estado='FINALIZADO').filter(
+        Q(Fecha_Finalizacion__lt=corte) | Q(Fecha_Finalizacion__isnull=True, fecha_actualizacion__lt=corte_dt)
+    )
+    if empresa_id is not None:
+        creditos = creditos.filter(empresa_id=empresa_id)
+    return creditos
+
+
+def _mover(origen, destino, filtro):
+    """Copia las filas de `origen` que cumplen `filtro` a `destino` y las borra del origen"""
+    filas = list(origen.objects.filter(**filtro).values(*_columnas(destino)))
+    if filas:
+        destino.objects.bulk_create([destino(**fila) for fila in filas], batch_size=500)
+        origen.objects.filter(**filtro).delete()
+    return len(filas)
+
+
+def archivar_creditos(meses=None, empresa_id=None, lote=500):
+    """
+    Archiva los créditos de creditos_archivables en lotes de `lote` créditos
+
+    Returns:
+        Dict con la cantidad de créditos, históricos y ganancias archivados
+    """
+    resumen = {'creditos': 0, 'historicos': 0, 'ganancias': 0, 'lotes': 0}
+    candidatos = creditos_archivables(meses, empresa_id).order_by('id')
+
+    while True:
+        with transaction.atomic():
+            ids = list(
+                candidatos.select_for_update(skip_locked=True).values_list('id', flat=True)[:lote]
+            )
+            if not ids:
+                break
+            # Primero los hijos, para que el borrado de Credito no tenga nada en cascada
+            columnas = _columnas(CreditoArchivado)
+            creditos = list(Credito.objects.filter(id__in=ids).values(*columnas))
+            CreditoArchivado.objects.bulk_create([CreditoArchivado(**fila) for fila in creditos], batch_size=500)
+            resumen['historicos'] += _mover(HistoricoCredito, HistoricoCreditoArchivado, {'credito_id__in': ids})
+            resumen['ganancias'] += _mover(Ganancia_Credito, GananciaCreditoArchivada, {'Credito_id__in': ids})
+            deltas = {
+                (fila['empresa_id'], fila['fase_actual'], fila['enum_estado']): -fila['total']
+                for fila in Credito.objects.filter(id__in=ids)
+                .values('empresa_id', 'fase_actual', 'enum_estado').annotate(total=Count('id')).order_by()
+            }
+            with archivando():
+                Credito.objects.filter(id__in=ids).delete()
+            ajustar_contadores(deltas)
+
+        resumen['creditos'] += len(ids)
+        resumen['lotes'] += 1
+
+    return resumen
+
+
+def incluir_archivados(request):
+    """True si el request pide incluir créditos archivados (?incluir_archivados=true)"""
+    return request.query_params.get('incluir_archivados', '').lower() in ('1', 'true', 'si', 'sí')
+
+
+class CreditosConArchivados:
+    """
+    Créditos vivos y archivados como una sola secuencia, para CursorPagination
+
+    Implementa la parte de QuerySet que usa la paginación por cursor: order_by,
+    filter y el corte [inicio:fin]. Cada operación se aplica a las dos fuentes;
+    el corte pide a cada una sus primeras `fin` filas y las mezcla por el orden
+    pedido. Los archivados conservan su id original, así que (fecha_creacion, id)
+    sigue siendo un orden total.
+    """
+
+    def __init__(self, vivos, archivados, orden=('fecha_creacion', 'id')):
+        self.orden = tuple(orden)
+        self.fuentes = (vivos.order_by(*self.orden), archivados.order_by(*self.orden))
+
+    def order_by(self, *campos):
+        return CreditosConArchivados(*self.fuentes, orden=campos)
+
+    def filter(self, *args, **kwargs):
+        return CreditosConArchivados(*(fuente.filter(*args, **kwargs) for fuente in self.fuentes), orden=self.orden)
+
+    def __getitem__(self, corte):
+        if not isinstance(corte, slice) or corte.stop is None or corte.step is not None:
+            raise TypeError("Solo se admiten cortes [inicio:fin]")
+        clave = attrgetter(*(campo.lstrip('-') for campo in self.orden))
+        mezcla = heapq.merge(
+            *(fuente[:corte.stop] for fuente in self.fuentes),
+            key=clave,
+            reverse=self.orden[0].startswith('-'),
+        )
+        return list(mezcla)[corte.start or 0:corte.stop]
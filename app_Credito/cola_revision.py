@@ -0,0 +1,143 @@
+"""
+Cola de trabajo de los analistas para los créditos en FASE_6_REVISION
+
+Cada analista reclama los N créditos pendientes más antiguos (por
+fecha_actualizacion, índice credito_emp_fase_act_idx). La selección usa
+SELECT ... FOR UPDATE SKIP LOCKED: dos analistas reclamando a la vez se saltan
+las filas que el otro está tomando en lugar de esperarse, y la reserva queda
+en AsignacionRevision con un vencimiento (lease). Si el analista no revisa el
+crédito antes de que venza, vuelve a la cola.
+"""
+import datetime
+
+from django.conf import settings
+from django.db import transaction
+from django.db.models import Exists, OuterRef
+from django.utils import timezone
+
+from .models import AsignacionRevision
+
+
+FASE_REVISION = 'FASE_6_REVISION'
+
+# Rechazado es un resultado de la revisión aunque el crédito quede en FASE_6
+ESTADOS_REVISADOS = ('Rechazado',)
+
+
+def duracion_lease():
+    return datetime.timedelta(minutes=getattr(settings, 'COLA_REVISION_LEASE_MINUTOS', 15))
+
+
+def asignaciones_vigentes(analista, ahora=None):
+    """Asignaciones no vencidas del analista sobre créditos todavía pendientes de revisión"""
+    return AsignacionRevision.objects.filter(
+        analista=analista,
+        vence__gt=ahora or timezone.now(),
+        credito__fase_actual=FASE_REVISION,
+    ).exclude(credito__enum_estado__in=ESTADOS_REVISADOS)
+
+
+def reclamar(queryset, analista, cantidad):
+    """
+    Completa la cola del analista hasta `cantidad` créditos y renueva el
+    vencimiento de los que ya tenía
+
+    Args:
+        queryset: QuerySet de créditos visibles para el usuario (multitenancy)
+        analista: Usuario que reclama
+        cantidad: Tamaño de la cola del analista después de reclamar
+
+    Returns:
+        Cantidad de créditos nuevos asignados
+    """
+    ahora = timezone.now()
+    vence = ahora + duracion_lease()
+
+    with transaction.atomic():
+        propias = asignaciones_vigentes(analista, ahora)
+        faltan = cantidad - propias.update(vence=vence)
+        if faltan <= 0:
+            return 0
+
+        ocupados = AsignacionRevision.objects.filter(credito=OuterRef('pk'), vence__gt=ahora)
+        ids = list(
+            queryset.filter(fase_actual=FASE_REVISION)
+            .exclude(enum_estado__in=ESTADOS_REVISADOS)
+            .filter(~Exists(ocupados))
+            .order_by('fecha_actualizacion', 'id')
+            .select_for_update(skip_locked=True)
+            .values_list('id', 'empresa_id')[:faltan]
+        )
+        # Las asignaciones vencidas de otros analistas se pisan
+        AsignacionRevision.objects.bulk_create(
+            [
+                AsignacionRevision(
+                    credito_id=credito_id, empresa_id=empresa_id, analista=analista,
+                    fecha_asignacion=ahora, vence=vence,
+                )
+                for credito_id, empresa_id in ids
+            ],
+            update_conflicts=True,
+            unique_fields=['credito'],
+            update_fields=['analista', 'fecha_asignacion', 'vence'],
+        )
+    return len(ids)
+
+
+def asignado_a_otro(credito_id, analista):
+    """Asignación vigente del crédito a otro analista, o None"""
+    return (
+        AsignacionRevision.objects.select_related('analista')
+        .filter(credito_id=credito_id, vence__gt=timezone.now())
+        .exclude(analista=analista)
+        .first()
+    )
+
+
+def asignados_a_otros(credito_ids, analista):
+    """Asignaciones vigentes a otros analistas de los créditos, en una consulta: {credito_id: asignación}"""
+    asignaciones = (
+        AsignacionRevision.objects.select_related('analista')
+        .filter(credito_id__in=credito_ids, vence__gt=timezone.now())
+        .exclude(analista=analista)
+    )
+    return {asignacion.credito_id: asignacion for asignacion in asignaciones}
+
+
+def liberar(credito_ids, analista=None):
+    """
+    Quita las asignaciones de los créditos (solo las del analista, si se indica)
+
+    Returns:
+        Cantidad de asignaciones borradas
+    """
+    asignaciones = AsignacionRevision.objects.filter(credito_id__in=credito_ids)
+    if analista is not None:
+        asignaciones = asignaciones.filter(analista=analista)
+    borradas, _ = asignaciones.delete()
+    return borradas
+
+
+def cola_analista(analista):
+    """Créditos de la cola del analista, los más antiguos primero"""
+    filas = (
+        asignaciones_vigentes(analista)
+        .order_by('credito__fecha_actualizacion', 'credito_id')
+        .values(
+            'credito_id', 'vence', 'credito__Monto_Solicitado', 'credito__Monto_Cuota', 'credito__cliente_id',
+            'credito__fecha_actualizacion', 'credito__riesgo__puntaje', 'credito__riesgo__categoria',
+        )
+    )
+    return [
+        {
+            'id': fila['credito_id'],
+            'Monto_Solicitado': fila['credito__Monto_Solicitado'],
+            'Monto_Cuota': fila['credito__Monto_Cuota'],
+            'cliente': fila['credito__cliente_id'],
+            'fecha_actualizacion': fila['credito__fecha_actualizacion'],
+            'puntaje_riesgo': fila['credito__riesgo__puntaje'],
+            'categoria_riesgo': fila['credito__riesgo__categoria'],
+            'vence': fila['vence'],
+        }
+        for fila in filas
+    ]
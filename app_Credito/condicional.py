@@ -0,0 +1,64 @@
+"""
+GET condicional (ETag / Last-Modified) para las vistas de estado de un crédito
+
+El frontend consulta periódicamente estado-actual y linea-tiempo. La versión
+del crédito es (fecha_actualizacion, id del último HistoricoCredito), que se
+lee en una sola consulta indexada; si coincide con If-None-Match (o no es
+posterior a If-Modified-Since) se responde 304 sin armar ni serializar el
+agregado.
+
+La versión no cubre ediciones de los datos del cliente (Cliente, Trabajo, ...)
+hechas fuera del workflow: esas tablas no registran fecha de modificación.
+"""
+import functools
+import hashlib
+
+from django.db.models import OuterRef, Subquery
+from django.utils.cache import get_conditional_response, patch_cache_control
+from django.utils.http import http_date, quote_etag
+
+from .models import HistoricoCredito
+
+
+def version_credito(queryset, pk):
+    """(fecha_actualizacion, id del último histórico) del crédito, o None si no es visible"""
+    ultimo = HistoricoCredito.objects.filter(credito=OuterRef('pk')).order_by('-id').values('id')[:1]
+    return (
+        queryset.filter(pk=pk)
+        .annotate(ultimo_historico=Subquery(ultimo))
+        .values_list('fecha_actualizacion', 'ultimo_historico')
+        .first()
+    )
+
+
+def condicional(accion):
+    """
+    Decorador para acciones de detalle de CreditoViewSet: agrega ETag y
+    Last-Modified y responde 304 cuando el cliente ya tiene la versión actual
+    """
+    @functools.wraps(accion)
+    def envoltura(self, request, pk=None, *args, **kwargs):
+        version = version_credito(self.get_queryset(), pk)
+        if version is None:
+            # La acción responde el 404 (o el crédito archivado, sin ETag) como siempre
+            return accion(self, request, pk, *args, **kwargs)
+
+        fecha_actualizacion, ultimo_historico = version
+        # La ruta completa entra en la ETag: limit, cursor y fields cambian la respuesta
+        firma = f"{pk}:{fecha_actualizacion.isoformat()}:{ultimo_historico}:{request.get_full_path()}"
+        etag = quote_etag(hashlib.md5(firma.encode(), usedforsecurity=False).hexdigest())
+        ultima_modificacion = int(fecha_actualizacion.timestamp())
+
+        respuesta = get_conditional_response(request, etag=etag, last_modified=ultima_modificacion)
+        if respuesta is None:
+            respuesta = accion(self, request, pk, *args, **kwargs)
+            if respuesta.status_code != 200:
+                return respuesta
+
+        respuesta['ETag'] = etag
+        respuesta['Last-Modified'] = http_date(ultima_modificacion)
+        # Que el navegador guarde la respuesta pero la revalide en cada consulta
+        patch_cache_control(respuesta, private=True, no_cache=True)
+        return respuesta
+
+    return envoltura
@@ -0,0 +1,294 @@
+"""
+Stream SSE (server-sent events) de cambios de fase por empresa
+
+Los eventos salen de EventoOutbox (ver app_Credito/outbox.py): el id del evento
+es el id de SSE, así que un cliente que se reconecta con Last-Event-ID recibe
+de la tabla lo que se perdió y después sigue en vivo.
+
+Cada event loop (un worker ASGI) tiene un único Difusor: una sola tarea lee los
+eventos nuevos de las empresas con conexiones abiertas y los reparte a la cola
+de cada conexión, así el costo en base de datos no crece con la cantidad de
+clientes. La tarea se despierta con LISTEN en CANAL_EVENTOS (PostgreSQL con
+psycopg 3) y, como respaldo, cada SSE_INTERVALO_SONDEO segundos.
+
+El navegador (EventSource) no puede enviar headers: abre el stream con
+?token= y un token de stream (emitir_token_stream), firmado con su propia sal
+y válido SSE_TOKEN_MAX_AGE segundos para conectarse, en lugar del token de la
+API, que quedaría en los logs de acceso. Mientras la conexión sigue abierta,
+la credencial y el perfil se revalidan cada SSE_LATIDO segundos y el stream se
+cierra si dejan de valer.
+"""
+import asyncio
+import hashlib
+import json
+import logging
+import time
+import weakref
+from collections import defaultdict
+
+from asgiref.sync import sync_to_async
+from django.conf import settings
+from django.core import signing
+from django.core.serializers.json import DjangoJSONEncoder
+from django.db import connection
+from rest_framework.authtoken.models import Token
+
+from app_User.authentication import obtener_usuario
+from app_User.signed_tokens import token_revocado
+from .models import EventoOutbox
+from .outbox import EVENTO_FASE_CAMBIADA, CANAL_EVENTOS
+
+
+logger = logging.getLogger(__name__)
+
+# Ids hacia atrás que se vuelven a leer en cada pasada: un evento con id menor
+# puede confirmarse después que uno con id mayor
+VENTANA_IDS = 100
+
+SALT_TOKEN = 'app_Credito.eventos'
+
+# Mensaje con que se cierra el stream cuando la credencial deja de valer
+CIERRE_CREDENCIALES = 'event: cerrado\ndata: {"motivo": "credenciales"}\n\n'
+
+
+def _config(nombre, default):
+    return getattr(settings, nombre, default)
+
+
+def _huella(key):
+    """Identifica un token de DRF sin guardarlo en el token de stream"""
+    return hashlib.sha256(key.encode()).hexdigest()[:32]
+
+
+def emitir_token_stream(usuario, empresa_id, auth):
+    """
+    Emite un token de stream atado a la credencial con que se pidió
+
+    Args:
+        auth: request.auth: payload del token firmado, o Token de DRF
+
+    Returns:
+        String del token
+    """
+    payload = {'u': usuario.pk, 'e': empresa_id}
+    if isinstance(auth, dict):
+        payload['j'] = auth['j']
+        payload['x'] = auth['x']
+    else:
+        payload['t'] = _huella(auth.key)
+    return signing.dumps(payload, salt=SALT_TOKEN, compress=True)
+
+
+def verificar_token_stream(token):
+    """
+    Payload del token de stream
+
+    Raises:
+        signing.BadSignature si la firma no es válida o pasaron SSE_TOKEN_MAX_AGE segundos
+    """
+    return signing.loads(token, salt=SALT_TOKEN, max_age=_config('SSE_TOKEN_MAX_AGE', 60))
+
+
+def usuario_de_token_stream(payload):
+    """
+    (usuario, payload) si la credencial de origen sigue vigente y el usuario
+    activo; (None, None) si no
+
+    Un token firmado vale hasta su expiración y mientras no se revoque; uno de
+    DRF, mientras exista (el logout lo borra).
+    """
+    if 'j' in payload:
+        vigente = payload['x'] > time.time() and not token_revocado(payload['j'])
+    else:
+        vigente = any(
+            _huella(key) == payload['t']
+            for key in Token.objects.filter(user_id=payload['u']).values_list('key', flat=True)
+        )
+    usuario = obtener_usuario(payload['u']) if vigente else None
+    if usuario is None or not usuario.is_active:
+        return None, None
+    return usuario, payload
+
+
+def _eventos_desde(ultimo_id, empresa_ids, limite=None):
+    eventos = EventoOutbox.objects.filter(
+        id__gt=ultimo_id, tipo=EVENTO_FASE_CAMBIADA, empresa_id__in=empresa_ids,
+    ).order_by('id')
+    return list(eventos[:limite] if limite else eventos)
+
+
+def _ultimo_id():
+    return EventoOutbox.objects.order_by('-id').values_list('id', flat=True).first() or 0
+
+
+def formatear(evento):
+    """Mensaje SSE de un EventoOutbox"""
+    datos = {
+        'id_credito': evento.id_credito,
+        'fecha': evento.fecha_creacion,
+        **evento.payload,
+    }
+    return f"id: {evento.id}\nevent: {evento.tipo}\ndata: {json.dumps(datos, cls=DjangoJSONEncoder)}\n\n"
+
+
+class Difusor:
+    """Lector único de EventoOutbox por event loop que reparte a las conexiones abiertas"""
+
+    def __init__(self):
+        self._suscriptores = defaultdict(set)  # empresa_id -> colas de las conexiones
+        self._despertar = asyncio.Event()
+        self._tarea = None
+        self._ultimo = 0
+        self._entregados = set()
+
+    def suscribir(self, empresa_id):
+        cola = asyncio.Queue(maxsize=_config('SSE_COLA_MAX', 1000))
+        self._suscriptores[empresa_id].add(cola)
+        if self._tarea is None or self._tarea.done():
+            self._tarea = asyncio.get_running_loop().create_task(self._leer())
+        return cola
+
+    def desuscribir(self, empresa_id, cola):
+        colas = self._suscriptores.get(empresa_id)
+        if colas is not None:
+            colas.discard(cola)
+            if not colas:
+                del self._suscriptores[empresa_id]
+
+    def despertar(self):
+        self._despertar.set()
+
+    async def _leer(self):
+        self._ultimo = await sync_to_async(_ultimo_id)()
+        self._entregados.clear()
+        escucha = None
+        if connection.vendor == 'postgresql':
+            escucha = asyncio.get_running_loop().create_task(self._escuchar())
+        try:
+            # Termina cuando se cierra la última conexión; la próxima la vuelve a lanzar
+            while self._suscriptores:
+                try:
+                    await asyncio.wait_for(self._despertar.wait(), timeout=_config('SSE_INTERVALO_SONDEO', 5))
+                except asyncio.TimeoutError:
+                    pass
+                self._despertar.clear()
+                try:
+                    await self._repartir()
+                except Exception:
+                    logger.exception("Error leyendo eventos para SSE")
+        finally:
+            if escucha is not None:
+                escucha.cancel()
+
+    async def _repartir(self):
+        empresas = list(self._suscriptores)
+        if not empresas:
+            return
+        desde = max(self._ultimo - VENTANA_IDS, 0)
+        for evento in await sync_to_async(_eventos_desde)(desde, empresas):
+            if evento.id in self._entregados:
+                continue
+            self._entregados.add(evento.id)
+            self._ultimo = max(self._ultimo, evento.id)
+            for cola in list(self._suscriptores.get(evento.empresa_id, ())):
+                try:
+                    cola.put_nowait(evento)
+                except asyncio.QueueFull:
+                    # Cliente lento: se vacía la cola y se le pide reconectar con Last-Event-ID
+                    while not cola.empty():
+                        cola.get_nowait()
+                    cola.put_nowait(None)
+                    self.desuscribir(evento.empresa_id, cola)
+        self._entregados = {i for i in self._entregados if i > self._ultimo - VENTANA_IDS}
+
+    async def _escuchar(self):
+        """LISTEN en una conexión asíncrona propia; cada NOTIFY adelanta la próxima lectura"""
+        import psycopg
+
+        datos = connection.settings_dict
+        parametros = {
+            'dbname': datos['NAME'], 'user': datos['USER'], 'password': datos['PASSWORD'],
+            'host': datos['HOST'], 'port': datos['PORT'],
+        }
+        parametros = {clave: valor for clave, valor in parametros.items() if valor}
+        while True:
+            try:
+                async with await psycopg.AsyncConnection.connect(autocommit=True, **parametros) as conexion:
+                    await conexion.execute(f"LISTEN {CANAL_EVENTOS}")
+                    async for _ in conexion.notifies():
+                        self.despertar()
+            except asyncio.CancelledError:
+                raise
+            except Exception:
+                # Mientras tanto sigue funcionando el sondeo periódico
+                logger.exception("Error en LISTEN %s; reintentando", CANAL_EVENTOS)
+                await asyncio.sleep(_config('SSE_INTERVALO_SONDEO', 5))
+
+
+_difusores = weakref.WeakKeyDictionary()
+
+
+def obtener_difusor():
+    """Difusor del event loop actual (uno por worker ASGI)"""
+    loop = asyncio.get_running_loop()
+    difusor = _difusores.get(loop)
+    if difusor is None:
+        difusor = _difusores[loop] = Difusor()
+    return difusor
+
+
+async def stream_eventos(empresa_id, ultimo_id=None, vigente=None):
+    """
+    Generador asíncrono de mensajes SSE para una conexión
+
+    Con ultimo_id (Last-Event-ID) primero repite desde la tabla los eventos
+    posteriores. Si son más de SSE_REPLAY_MAX, cierra después de enviarlos y el
+    cliente sigue desde ahí al reconectarse.
+
+    Args:
+        vigente: Función asíncrona sin argumentos que revalida la credencial y
+                 el perfil de la conexión; se llama cada SSE_LATIDO segundos y,
+                 si devuelve False, el stream envía CIERRE_CREDENCIALES y termina
+    """
+    difusor = obtener_difusor()
+    # Suscribir antes de leer la tabla para no perder eventos entre ambos pasos
+    cola = difusor.suscribir(empresa_id)
+    try:
+        reanudar = ultimo_id is not None
+        if not reanudar:
+            ultimo_id = await sync_to_async(_ultimo_id)()
+        yield f"retry: {_config('SSE_REINTENTO_MS', 3000)}\n\n"
+
+        if reanudar:
+            limite = _config('SSE_REPLAY_MAX', 500)
+            pendientes = await sync_to_async(_eventos_desde)(ultimo_id, [empresa_id], limite)
+            for evento in pendientes:
+                yield formatear(evento)
+                ultimo_id = evento.id
+            if len(pendientes) >= limite:
+                return
+
+        latido = _config('SSE_LATIDO', 15)
+        loop = asyncio.get_running_loop()
+        revalidar = loop.time() + latido
+        while True:
+            # Con eventos seguidos no hay latidos: la revalidación va por reloj
+            if vigente is not None and loop.time() >= revalidar:
+                if not await vigente():
+                    yield CIERRE_CREDENCIALES
+                    return
+                revalidar = loop.time() + latido
+            try:
+                evento = await asyncio.wait_for(cola.get(), timeout=latido)
+            except asyncio.TimeoutError:
+                # Comentario SSE: mantiene viva la conexión a través de proxies
+                yield ": latido\n\n"
+                continue
+            if evento is None:
+                return
+            if evento.id <= ultimo_id:
+                continue
+            ultimo_id = evento.id
+            yield formatear(evento)
+    finally:
+        difusor.desuscribir(empresa_id, cola)
@@ -0,0 +1,111 @@
+"""
+Recalculo por lotes de Ganancia_Credito a partir de los datos de Credito
+"""
+import datetime
+
+from django.db import transaction
+
+from .amortizacion import intereses_totales
+from .models import Credito, Ganancia_Credito, MarcaProceso
+
+
+PROCESO_GANANCIAS = 'ganancia_credito'
+
+CAMPOS_GANANCIA = ('monto_prestado', 'tasa_interes', 'duracion_meses', 'ganacia_esperada')
+
+# Un crédito guardado en una transacción que confirma después de la lectura
+# puede tener fecha_actualizacion anterior a la nueva marca: cada ejecución
+# vuelve a leer este margen. Releer es inocuo, las filas iguales no se escriben
+SOLAPAMIENTO = datetime.timedelta(minutes=5)
+
+
+def recalcular_ganancias(empresa_id=None, completo=False, lote=1000, sistema='frances'):
+    """
+    Recalcula la ganancia esperada de los créditos de una empresa (o de todas)
+
+    Solo lee los créditos con fecha_actualizacion posterior a la marca de agua
+    de la ejecución anterior menos SOLAPAMIENTO (salvo completo=True) y solo
+    escribe las filas de Ganancia_Credito cuyos valores cambiaron, así que
+    repetir una ejecución no cambia nada. Cada lote se escribe con un bulk_update y un bulk_create en su
+    propia transacción.
+
+    Args:
+        empresa_id: ID de la empresa, o None para todas
+        completo: Ignorar la marca de agua y recalcular todo
+        lote: Créditos por lote
+        sistema: Sistema de amortización ('frances' o 'aleman')
+
+    Returns:
+        Dict con contadores de la ejecución
+    """
+    marca, _ = MarcaProceso.objects.get_or_create(proceso=PROCESO_GANANCIAS, empresa_id=empresa_id)
+
+    creditos = Credito.objects.all()
+    if empresa_id is not None:
+        creditos = creditos.filter(empresa_id=empresa_id)
+    if marca.marca and not completo:
+        creditos = creditos.filter(fecha_actualizacion__gt=marca.marca - SOLAPAMIENTO)
+    creditos = creditos.order_by('fecha_actualizacion', 'id').values_list(
+        'id', 'cliente_id', 'Monto_Solicitado', 'Tasa_Interes', 'Numero_Cuotas', 'fecha_actualizacion',
+    )
+
+    resumen = {'leidos': 0, 'creados': 0, 'actualizados': 0, 'sin_cambios': 0, 'omitidos': 0}
+    filas = []
+    for fila in creditos.iterator(chunk_size=lote):
+        filas.append(fila)
+        if len(filas) >= lote:
+            _procesar_lote(filas, sistema, marca, resumen)
+            filas = []
+    if filas:
+        _procesar_lote(filas, sistema, marca, resumen)
+
+    return resumen
+
+
+def _procesar_lote(filas, sistema, marca, resumen):
+    ids, clientes, montos, tasas, plazos, fechas = zip(*filas)
+    ganancias = intereses_totales(montos, tasas, plazos, sistema=sistema)
+
+    with transaction.atomic():
+        # Bloquear los créditos del lote serializa con otra ejecución que los
+        # relea (p. ej. la de una empresa y la global): la segunda ve las filas
+        # de Ganancia_Credito que creó la primera y no las duplica
+        list(Credito.objects.select_for_update().filter(id__in=ids).order_by('id').values_list('id', flat=True))
+        existentes = {}
+        for ganancia in Ganancia_Credito.objects.filter(Credito_id__in=ids).order_by('id'):
+            existentes.setdefault(ganancia.Credito_id, ganancia)
+
+        nuevas = []
+        modificadas = []
+        for credito_id, cliente_id, monto, tasa, plazo, ganancia in zip(ids, clientes, montos, tasas, plazos, ganancias):
+            if ganancia is None:
+                resumen['omitidos'] += 1
+                continue
+            valores = {
+                'monto_prestado': monto,
+                'tasa_interes': tasa,
+                'duracion_meses': plazo,
+                'ganacia_esperada': ganancia,
+            }
+            actual = existentes.get(credito_id)
+            if actual is None:
+                nuevas.append(Ganancia_Credito(Credito_id=credito_id, Cliente_id=cliente_id, **valores))
+            elif any(getattr(actual, campo) != valor for campo, valor in valores.items()):
+                for campo, valor in valores.items():
+                    setattr(actual, campo, valor)
+                modificadas.append(actual)
+            else:
+                resumen['sin_cambios'] += 1
+
+        if nuevas:
+            Ganancia_Credito.objects.bulk_create(nuevas, batch_size=500)
+        if modificadas:
+            Ganancia_Credito.objects.bulk_update(modificadas, CAMPOS_GANANCIA, batch_size=500)
+        # Avanzar la marca de agua hasta el último crédito procesado del lote;
+        # los lotes del margen releído no la hacen retroceder
+        marca.marca = max(filter(None, (marca.marca, *fechas)))
+        marca.save(update_fields=['marca', 'fecha_ejecucion'])
+
+    resumen['leidos'] += len(filas)
+    resumen['creados'] += len(nuevas)
+    resumen['actualizados'] += len(modificadas)
@@ -0,0 +1,143 @@
+"""
+Soporte del header Idempotency-Key en las acciones del workflow
+
+Los clientes móviles reintentan las acciones (agregar-documentacion, revisar,
+desembolsar, ...) cuando se corta la conexión. Con el decorador idempotente, la
+primera petición con una clave graba su respuesta en RespuestaIdempotente y los
+reintentos con la misma clave la reciben tal cual, con una sola búsqueda por
+(usuario, clave), sin volver a ejecutar la acción.
+
+- Sin header, la acción se ejecuta normalmente.
+- Mientras la primera petición está en curso, un reintento recibe 409. Si
+  pasan IDEMPOTENCIA_BLOQUEO_SEGUNDOS sin respuesta (el worker murió), el
+  siguiente reintento toma la reserva con un UPDATE condicional y ejecuta la
+  acción; la petición original, si seguía viva, ya no graba su respuesta.
+- Reusar la clave en otra acción o crédito devuelve 422.
+- Las respuestas 5xx (o una excepción) no se graban: el reintento vuelve a ejecutar.
+"""
+import datetime
+import functools
+
+from django.conf import settings
+from django.db import IntegrityError, transaction
+from django.utils import timezone
+from rest_framework import status
+from rest_framework.response import Response
+
+from .models import RespuestaIdempotente
+
+
+HEADER = 'Idempotency-Key'
+HEADER_REPETIDA = 'Idempotent-Replayed'
+CLAVE_MAX = 255
+
+
+def _vigencia():
+    return datetime.timedelta(hours=getattr(settings, 'IDEMPOTENCIA_TTL_HORAS', 24))
+
+
+def _bloqueo():
+    return datetime.timedelta(seconds=getattr(settings, 'IDEMPOTENCIA_BLOQUEO_SEGUNDOS', 120))
+
+
+def _tomar_abandonada(previa, request, ahora):
+    """
+    Toma la reserva de una petición en curso que superó IDEMPOTENCIA_BLOQUEO_SEGUNDOS
+
+    fecha_creacion hace de marca del dueño: el UPDATE solo gana si nadie la
+    tomó antes, así que entre varios reintentos concurrentes la toma uno solo.
+
+    Returns:
+        True si esta petición quedó como dueña de la reserva
+    """
+    if previa.estado_http is not None or previa.metodo != request.method or previa.ruta != request.path:
+        return False
+    if previa.fecha_creacion > ahora - _bloqueo():
+        return False
+    vence = ahora + _vigencia()
+    tomada = RespuestaIdempotente.objects.filter(
+        pk=previa.pk, estado_http__isnull=True, fecha_creacion=previa.fecha_creacion,
+    ).update(fecha_creacion=ahora, vence=vence)
+    if tomada:
+        previa.fecha_creacion = ahora
+        previa.vence = vence
+    return bool(tomada)
+
+
+def _repetir(previa, request):
+    """Respuesta para un reintento cuya clave ya está registrada"""
+    if previa.metodo != request.method or previa.ruta != request.path:
+        return Response(
+            {'error': f"La {HEADER} ya se usó en otra petición"},
+            status=status.HTTP_422_UNPROCESSABLE_ENTITY,
+        )
+    if previa.estado_http is None:
+        return Response(
+            {'error': f"Hay una petición en curso con esta {HEADER}. Reintente en unos segundos."},
+            status=status.HTTP_409_CONFLICT,
+        )
+    return Response(previa.cuerpo, status=previa.estado_http, headers={HEADER_REPETIDA: 'true'})
+
+
+def idempotente(accion):
+    """Decorador para acciones de ViewSet: graba y repite la respuesta por Idempotency-Key"""
+    @functools.wraps(accion)
+    def envoltura(self, request, *args, **kwargs):
+        clave = request.headers.get(HEADER)
+        if not clave:
+            return accion(self, request, *args, **kwargs)
+        if len(clave) > CLAVE_MAX:
+            return Response(
+                {'error': f"{HEADER} no puede superar {CLAVE_MAX} caracteres"},
+                status=status.HTTP_400_BAD_REQUEST,
+            )
+
+        ahora = timezone.now()
+        previa = RespuestaIdempotente.objects.filter(usuario=request.user, clave=clave, vence__gt=ahora).first()
+        if previa is not None:
+            if not _tomar_abandonada(previa, request, ahora):
+                return _repetir(previa, request)
+            registro = previa
+        else:
+            try:
+                with transaction.atomic():
+                    # Una clave vencida del mismo usuario se reutiliza
+                    RespuestaIdempotente.objects.filter(usuario=request.user, clave=clave).delete()
+                    registro = RespuestaIdempotente.objects.create(
+                        usuario=request.user,
+                        clave=clave,
+                        metodo=request.method,
+                        ruta=request.path[:255],
+                        vence=ahora + _vigencia(),
+                    )
+            except IntegrityError:
+                # Otra petición con la misma clave ganó la carrera
+                previa = RespuestaIdempotente.objects.filter(usuario=request.user, clave=clave).first()
+                if previa is None:
+                    return Response(
+                        {'error': f"Hay una petición en curso con esta {HEADER}. Reintente en unos segundos."},
+                        status=status.HTTP_409_CONFLICT,
+                    )
+                return _repetir(previa, request)
+
+        # Solo mientras la reserva siga siendo de esta petición
+        propia = RespuestaIdempotente.objects.filter(pk=registro.pk, fecha_creacion=registro.fecha_creacion)
+        try:
+            respuesta = accion(self, request, *args, **kwargs)
+        except Exception:
+            propia.delete()
+            raise
+
+        if respuesta.status_code >= 500:
+            propia.delete()
+        else:
+            propia.update(estado_http=respuesta.status_code, cuerpo=respuesta.data)
+        return respuesta
+
+    return envoltura
+
+
+def purgar_vencidas():
+    """Borra las respuestas grabadas ya vencidas; devuelve la cantidad borrada"""
+    borradas, _ = RespuestaIdempotente.objects.filter(vence__lte=timezone.now()).delete()
+    return borradas
@@ -0,0 +1,32 @@
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+
+from app_Credito.archivo import archivar_creditos, creditos_archivables
+
+
+class Command(BaseCommand):
+    help = "Mueve los créditos finalizados más viejos que N meses (con su histórico y ganancia) a las tablas de archivo"
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--meses', type=int, default=getattr(settings, 'ARCHIVO_CREDITOS_MESES', 12),
+            help="Antigüedad mínima desde la finalización (default ARCHIVO_CREDITOS_MESES)",
+        )
+        parser.add_argument('--empresa', type=int, help="ID de la empresa (por defecto, todas)")
+        parser.add_argument('--lote', type=int, default=500, help="Créditos por transacción (default 500)")
+        parser.add_argument('--dry-run', action='store_true', help="Solo informar cuántos créditos se archivarían")
+
+    def handle(self, *args, **options):
+        if options['meses'] < 0 or options['lote'] <= 0:
+            raise CommandError("--meses no puede ser negativo y --lote debe ser mayor a 0")
+
+        if options['dry_run']:
+            total = creditos_archivables(options['meses'], options['empresa']).count()
+            self.stdout.write(f"{total} créditos para archivar")
+            return
+
+        resumen = archivar_creditos(meses=options['meses'], empresa_id=options['empresa'], lote=options['lote'])
+        self.stdout.write(self.style.SUCCESS(
+            f"{resumen['creditos']} créditos archivados en {resumen['lotes']} lotes "
+            f"({resumen['historicos']} históricos, {resumen['ganancias']} ganancias)"
+        ))
@@ -0,0 +1,173 @@
+"""
+Benchmark de los índices (empresa, ...) de los modelos por tenant
+
+Carga --filas filas sintéticas por modelo, repartidas en --empresas empresas,
+dentro de una transacción que se revierte al terminar (la base queda como
+estaba). Después de ANALYZE corre con EXPLAIN ANALYZE la consulta de listado de
+cada modelo, tal como la arman las vistas, con los índices y con los recorridos
+por índice deshabilitados, y muestra el plan y el tiempo de cada una.
+
+Solo PostgreSQL:
+    python manage.py benchmark_indices --filas 1000000
+"""
+import re
+
+from django.contrib.auth.models import User
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection, transaction
+
+from app_Assistant.models import ConsultaSQL, Conversacion
+from app_Cliente.models import Cliente, Documentacion, Domicilio, Garante, Trabajo
+from app_Credito.models import Credito, Tipo_Credito, ENUM_FASE_CREDITO
+from app_Empresa.models import Empresa
+
+
+TAMANO_PAGINA = 50
+
+# Modelo -> columnas del INSERT ... SELECT generate_series (g es el número de fila).
+# {empresa} y {fase} se reparten entre las filas; {usuario}, {cliente} y {tipo} son filas de apoyo.
+FILAS_SINTETICAS = {
+    Cliente: {
+        'nombre': "'Cliente ' || g", 'apellido': "'X'", 'telefono': "'700'",
+        'fecha_registro': "CURRENT_DATE - mod(g, 3650)", 'empresa': '{empresa}',
+    },
+    Documentacion: {
+        'ci': "'BENCH-' || g", 'fecha_registro': "CURRENT_DATE - mod(g, 3650)", 'empresa': '{empresa}',
+    },
+    Trabajo: {
+        'cargo': "'Cargo'", 'empresa': "'Empleador'", 'salario': '3000', 'empresa_rel': '{empresa}',
+    },
+    Domicilio: {
+        'descripcion': "'Calle ' || g", 'es_propietario': 'false', 'numero_ref': "'1'", 'empresa': '{empresa}',
+    },
+    Garante: {
+        'nombrecompleto': "'Garante ' || g", 'ci': "'G' || g", 'telefono': "'701'", 'empresa': '{empresa}',
+    },
+    Credito: {
+        'Monto_Solicitado': '1000 + mod(g, 50000)', 'enum_estado': "(ARRAY['Pendiente','Aprobado','Rechazado'])[mod(g, 3) + 1]",
+        'fase_actual': '{fase}', 'Numero_Cuotas': '12', 'Monto_Cuota': '100', 'Moneda': "'BOB'",
+        'Tasa_Interes': '12', 'Monto_Pagar': '1200', 'empresa': '{empresa}', 'usuario': '{usuario}',
+        'cliente': '{cliente}', 'tipo_credito': '{tipo}',
+        'fecha_creacion': "now() - g * interval '1 minute'", 'fecha_actualizacion': "now() - g * interval '1 minute'",
+    },
+    Conversacion: {
+        'usuario': '{usuario}', 'empresa': '{empresa}', 'titulo': "'Conversación'", 'activa': 'true',
+        'fecha_creacion': "now() - g * interval '1 minute'", 'fecha_actualizacion': "now() - g * interval '1 minute'",
+    },
+    ConsultaSQL: {
+        'usuario': '{usuario}', 'empresa': '{empresa}', 'consulta': "'SELECT 1'", 'exitosa': 'true',
+        'fecha_ejecucion': "now() - g * interval '1 minute'",
+    },
+}
+
+
+def consultas_de_listado(empresa, usuario):
+    """Primera página del listado de cada modelo, con el filtro y el orden de su vista"""
+    return {
+        'Cliente': Cliente.objects.filter(empresa=empresa),
+        'Documentacion': Documentacion.objects.filter(empresa=empresa),
+        'Trabajo': Trabajo.objects.filter(empresa_rel=empresa).order_by('id'),
+        'Domicilio': Domicilio.objects.filter(empresa=empresa).order_by('id'),
+        'Garante': Garante.objects.filter(empresa=empresa).order_by('id'),
+        'Credito': Credito.objects.filter(empresa=empresa).order_by('-fecha_creacion', '-id'),
+        'Credito (fase)': Credito.objects.filter(empresa=empresa, fase_actual='FASE_6_REVISION').order_by('-fecha_creacion'),
+        'Conversacion': Conversacion.objects.filter(empresa=empresa, usuario=usuario),
+        'ConsultaSQL': ConsultaSQL.objects.filter(empresa=empresa),
+    }
+
+
+def cargar_filas(filas, empresas):
+    """Inserta las filas sintéticas; devuelve (empresa consultada, usuario)"""
+    ids = [e.id for e in Empresa.objects.bulk_create(
+        [Empresa(razon_social=f'Benchmark {i}', email_contacto='benchmark@example.com') for i in range(empresas)]
+    )]
+    usuario = User.objects.create(username=f'benchmark-{ids[0]}')
+    cliente = Cliente.objects.create(nombre='Benchmark', apellido='X', telefono='700', empresa_id=ids[0])
+    tipo = Tipo_Credito.objects.create(
+        nombre='Benchmark', descripcion='-', monto_minimo=0, monto_maximo=100000, empresa_id=ids[0],
+    )
+    valores = {
+        'empresa': f"(ARRAY{ids})[mod(g, {len(ids)}) + 1]",
+        'fase': f"(ARRAY{[fase for fase, _ in ENUM_FASE_CREDITO]})[mod(g, {len(ENUM_FASE_CREDITO)}) + 1]",
+        'usuario': str(usuario.id), 'cliente': str(cliente.id), 'tipo': str(tipo.id),
+    }
+
+    with connection.cursor() as cursor:
+        for modelo, columnas in FILAS_SINTETICAS.items():
+            nombres = ', '.join(connection.ops.quote_name(modelo._meta.get_field(c).column) for c in columnas)
+            expresiones = ', '.join(e.format(**valores) for e in columnas.values())
+            cursor.execute(
+                f"INSERT INTO {connection.ops.quote_name(modelo._meta.db_table)} ({nombres}) "
+                f"SELECT {expresiones} FROM generate_series(1, %s) AS g",
+                [filas],
+            )
+            cursor.execute(f"ANALYZE {connection.ops.quote_name(modelo._meta.db_table)}")
+    return ids[len(ids) // 2], usuario
+
+
+def _plan(queryset, sin_indices=False):
+    with connection.cursor() as cursor:
+        if sin_indices:
+            cursor.execute('SET LOCAL enable_indexscan = off')
+            cursor.execute('SET LOCAL enable_bitmapscan = off')
+            cursor.execute('SET LOCAL enable_indexonlyscan = off')
+        try:
+            return queryset[:TAMANO_PAGINA].explain(analyze=True)
+        finally:
+            if sin_indices:
+                cursor.execute('RESET enable_indexscan')
+                cursor.execute('RESET enable_bitmapscan')
+                cursor.execute('RESET enable_indexonlyscan')
+
+
+def _tiempo(plan):
+    encontrado = re.search(r'Execution Time: ([\d.]+) ms', plan)
+    return float(encontrado.group(1)) if encontrado else None
+
+
+def medir(empresa, usuario):
+    """
+    Returns:
+        Lista de dicts por consulta: índice usado (o None), si el plan ordena
+        después de leer, y tiempos con y sin índices en ms
+    """
+    resultados = []
+    for nombre, queryset in consultas_de_listado(empresa, usuario).items():
+        plan = _plan(queryset)
+        indice = re.search(r'Index (?:Only )?Scan(?: Backward)? using "?(\w+)"?', plan)
+        resultados.append({
+            'consulta': nombre,
+            'indice': indice.group(1) if indice else None,
+            'ordena': bool(re.search(r'\bSort\b', plan)),
+            'ms': _tiempo(plan),
+            'ms_sin_indices': _tiempo(_plan(queryset, sin_indices=True)),
+        })
+    return resultados
+
+
+class Command(BaseCommand):
+    help = "Mide con EXPLAIN ANALYZE las consultas de listado por tenant sobre filas sintéticas (se revierten)"
+
+    def add_arguments(self, parser):
+        parser.add_argument('--filas', type=int, default=1_000_000, help="Filas por modelo (default 1000000)")
+        parser.add_argument('--empresas', type=int, default=100, help="Empresas entre las que se reparten (default 100)")
+
+    def handle(self, *args, **options):
+        if connection.vendor != 'postgresql':
+            raise CommandError("El benchmark necesita PostgreSQL")
+        if options['filas'] <= 0 or options['empresas'] <= 0:
+            raise CommandError("--filas y --empresas deben ser mayores a 0")
+
+        with transaction.atomic():
+            self.stdout.write(f"Cargando {options['filas']} filas por modelo...")
+            empresa, usuario = cargar_filas(options['filas'], options['empresas'])
+            resultados = medir(empresa, usuario)
+            transaction.set_rollback(True)
+
+        for r in resultados:
+            recorrido = f"índice {r['indice']}" if r['indice'] else "SIN ÍNDICE"
+            orden = ", ordena en memoria" if r['ordena'] else ""
+            self.stdout.write(
+                f"{r['consulta']:<16} {recorrido}{orden}: {r['ms']} ms (sin índices: {r['ms_sin_indices']} ms)"
+            )
+        self.stdout.write(self.style.SUCCESS("Datos sintéticos revertidos"))
@@ -0,0 +1,17 @@
+from django.core.management.base import BaseCommand, CommandError
+
+from app_Credito.riesgo import recalcular_revision
+
+
+class Command(BaseCommand):
+    help = "Recalcula el puntaje de riesgo de todos los créditos en FASE_6_REVISION"
+
+    def add_arguments(self, parser):
+        parser.add_argument('--empresa', type=int, help="ID de la empresa (por defecto, todas)")
+        parser.add_argument('--lote', type=int, default=500, help="Créditos por lote (default 500)")
+
+    def handle(self, *args, **options):
+        if options['lote'] <= 0:
+            raise CommandError("--lote debe ser mayor a 0")
+        calculados = recalcular_revision(empresa_id=options['empresa'], lote=options['lote'])
+        self.stdout.write(self.style.SUCCESS(f"{calculados} créditos puntuados"))
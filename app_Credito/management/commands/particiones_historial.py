@@ -0,0 +1,73 @@
+import datetime
+
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+
+from app_Credito.amortizacion import sumar_meses
+from app_Credito.particiones import (
+    archivar_particiones, convertir_a_particionada, convertir_a_tabla_simple, crear_particiones,
+    es_postgres, inicio_mes,
+)
+
+
+class Command(BaseCommand):
+    help = (
+        "Mantiene las particiones mensuales de HistoricoCredito: crea las de los próximos meses "
+        "y archiva las que superan la retención. Tiene que correr a diario (cron). "
+        "--convertir / --revertir pasan la tabla a particionada y de vuelta (ventana de mantenimiento)."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--meses-adelante', type=int,
+            default=getattr(settings, 'HISTORIAL_PARTICIONES_MESES_ADELANTE', 3),
+            help="Meses futuros con partición creada (default HISTORIAL_PARTICIONES_MESES_ADELANTE)",
+        )
+        parser.add_argument(
+            '--retencion-meses', type=int,
+            default=getattr(settings, 'HISTORIAL_PARTICIONES_RETENCION_MESES', 0),
+            help="Archivar particiones más viejas que estos meses (0 = no archivar)",
+        )
+        parser.add_argument('--esquema', help="Esquema de archivo (default HISTORIAL_ARCHIVO_SCHEMA)")
+        conversion = parser.add_mutually_exclusive_group()
+        conversion.add_argument(
+            '--convertir', action='store_true',
+            help="Convierte la tabla en particionada (bloquea el histórico mientras copia las filas)",
+        )
+        conversion.add_argument(
+            '--revertir', action='store_true',
+            help="Vuelve a la tabla simple con clave primaria en id",
+        )
+
+    def handle(self, *args, **options):
+        if not es_postgres():
+            self.stdout.write("El particionado de HistoricoCredito solo aplica a PostgreSQL; nada que hacer")
+            return
+        if options['meses_adelante'] < 0 or options['retencion_meses'] < 0:
+            raise CommandError("--meses-adelante y --retencion-meses no pueden ser negativos")
+
+        if options['revertir']:
+            if convertir_a_tabla_simple():
+                self.stdout.write(self.style.SUCCESS("HistoricoCredito vuelto a tabla simple"))
+            else:
+                self.stdout.write("HistoricoCredito no estaba particionada; nada que hacer")
+            return
+        if options['convertir']:
+            if convertir_a_particionada():
+                self.stdout.write("HistoricoCredito convertida en tabla particionada")
+            else:
+                self.stdout.write("HistoricoCredito ya estaba particionada")
+
+        creadas = crear_particiones(meses_adelante=options['meses_adelante'])
+        for nombre in creadas:
+            self.stdout.write(f"Partición creada: {nombre}")
+
+        if options['retencion_meses']:
+            limite = sumar_meses(inicio_mes(datetime.date.today()), -options['retencion_meses'])
+            archivadas, retenidas = archivar_particiones(limite, esquema=options['esquema'])
+            for nombre in archivadas:
+                self.stdout.write(f"Partición archivada: {nombre}")
+            for nombre in retenidas:
+                self.stdout.write(f"Partición retenida (tiene histórico de créditos sin archivar): {nombre}")
+
+        self.stdout.write(self.style.SUCCESS("Particiones de HistoricoCredito al día"))
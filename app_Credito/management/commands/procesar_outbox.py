@@ -0,0 +1,46 @@
+import time
+
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+
+from app_Credito.outbox import procesar_lote, purgar_procesados
+
+
+class Command(BaseCommand):
+    help = "Procesa los eventos pendientes del outbox del workflow por lotes, llamando a los handlers registrados"
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--lote', type=int, default=getattr(settings, 'OUTBOX_LOTE', 100),
+            help="Eventos por transacción (default OUTBOX_LOTE)",
+        )
+        parser.add_argument('--continuo', action='store_true', help="No terminar al vaciar el outbox; esperar eventos nuevos")
+        parser.add_argument('--intervalo', type=float, default=2.0, help="Segundos de espera en modo continuo (default 2)")
+        parser.add_argument('--purgar-dias', type=int, help="Borrar antes los eventos procesados hace más de N días")
+
+    def handle(self, *args, **options):
+        if options['lote'] <= 0:
+            raise CommandError("--lote debe ser mayor a 0")
+
+        if options['purgar_dias'] is not None:
+            self.stdout.write(f"{purgar_procesados(options['purgar_dias'])} eventos purgados")
+
+        total = {'tomados': 0, 'procesados': 0, 'fallidos': 0}
+        # Los eventos que fallan no se vuelven a tomar hasta la próxima pasada: no frenan al resto
+        excluidos = set()
+        while True:
+            resumen = procesar_lote(options['lote'], excluir=excluidos)
+            for clave in total:
+                total[clave] += resumen[clave]
+            excluidos.update(resumen['ids_fallidos'])
+            if resumen['tomados']:
+                continue
+            # Outbox vacío (salvo los que fallaron en esta pasada): terminar, o esperar y reintentarlos
+            if not options['continuo']:
+                break
+            excluidos.clear()
+            time.sleep(options['intervalo'])
+
+        self.stdout.write(self.style.SUCCESS(
+            f"{total['procesados']} eventos procesados, {total['fallidos']} fallidos"
+        ))
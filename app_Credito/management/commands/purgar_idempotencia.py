@@ -0,0 +1,10 @@
+from django.core.management.base import BaseCommand
+
+from app_Credito.idempotencia import purgar_vencidas
+
+
+class Command(BaseCommand):
+    help = "Borra las respuestas grabadas por Idempotency-Key que ya vencieron"
+
+    def handle(self, *args, **options):
+        self.stdout.write(self.style.SUCCESS(f"{purgar_vencidas()} respuestas vencidas borradas"))
@@ -0,0 +1,40 @@
+from django.core.management.base import BaseCommand, CommandError
+
+from app_Credito.amortizacion import SISTEMAS_AMORTIZACION
+from app_Credito.ganancias import recalcular_ganancias
+from app_Empresa.models import Empresa
+
+
+class Command(BaseCommand):
+    help = "Recalcula Ganancia_Credito por lotes para los créditos modificados desde la última ejecución"
+
+    def add_arguments(self, parser):
+        parser.add_argument('--empresa', type=int, help="ID de la empresa (por defecto, cada empresa por separado)")
+        parser.add_argument('--completo', action='store_true', help="Ignorar la marca de agua y recalcular todo")
+        parser.add_argument('--lote', type=int, default=1000, help="Créditos por lote (default 1000)")
+        parser.add_argument('--sistema', choices=SISTEMAS_AMORTIZACION, default='frances')
+
+    def handle(self, *args, **options):
+        if options['lote'] <= 0:
+            raise CommandError("--lote debe ser mayor a 0")
+
+        if options['empresa'] is not None:
+            if not Empresa.objects.filter(id=options['empresa']).exists():
+                raise CommandError(f"Empresa {options['empresa']} no existe")
+            empresas = [options['empresa']]
+        else:
+            empresas = list(Empresa.objects.order_by('id').values_list('id', flat=True))
+
+        for empresa_id in empresas:
+            resumen = recalcular_ganancias(
+                empresa_id=empresa_id,
+                completo=options['completo'],
+                lote=options['lote'],
+                sistema=options['sistema'],
+            )
+            self.stdout.write(
+                f"Empresa {empresa_id}: {resumen['leidos']} leídos, {resumen['creados']} creados, "
+                f"{resumen['actualizados']} actualizados, {resumen['sin_cambios']} sin cambios, "
+                f"{resumen['omitidos']} omitidos"
+            )
+        self.stdout.write(self.style.SUCCESS("Recalculo de ganancias completado"))
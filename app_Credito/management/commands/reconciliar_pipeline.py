@@ -0,0 +1,18 @@
+from django.core.management.base import BaseCommand
+
+from app_Credito.pipeline import reconciliar_contadores
+
+
+class Command(BaseCommand):
+    help = "Recalcula los contadores del pipeline desde Credito y corrige los desvíos"
+
+    def add_arguments(self, parser):
+        parser.add_argument('--empresa', type=int, help="ID de la empresa (por defecto, todas)")
+
+    def handle(self, *args, **options):
+        correcciones = reconciliar_contadores(empresa_id=options['empresa'])
+        for c in correcciones:
+            self.stdout.write(
+                f"Empresa {c['empresa_id']} {c['fase_actual']} / {c['enum_estado']}: {c['antes']} → {c['despues']}"
+            )
+        self.stdout.write(self.style.SUCCESS(f"{len(correcciones)} contadores corregidos"))
@@ -0,0 +1,19 @@
+# Generated by Django 5.2.7 on 2026-10-18 19:01
+
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('app_Credito', '0004_tipo_credito_empresa'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='historicocredito',
+            index=models.Index(fields=['credito', '-fecha_cambio', '-id'], name='hist_credito_fecha_idx'),
+        ),
+    ]
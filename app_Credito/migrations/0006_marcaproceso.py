@@ -0,0 +1,28 @@
+# Generated by Django 5.2.7 on 2026-10-18 19:05
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('app_Credito', '0005_historicocredito_linea_tiempo_idx'),
+        ('app_Empresa', '0002_alter_on_premise_fecha_de_compra'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='MarcaProceso',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('proceso', models.CharField(max_length=50)),
+                ('marca', models.DateTimeField(blank=True, null=True)),
+                ('fecha_ejecucion', models.DateTimeField(auto_now=True)),
+                ('empresa', models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.CASCADE, to='app_Empresa.empresa')),
+            ],
+            options={
+                'constraints': [models.UniqueConstraint(fields=('proceso', 'empresa'), name='marca_proceso_empresa_unica')],
+            },
+        ),
+    ]
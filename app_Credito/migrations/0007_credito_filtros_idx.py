@@ -0,0 +1,33 @@
+# Generated by Django 5.2.7 on 2026-10-18 19:09
+
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('app_Cliente', '0004_alter_documentacion_documento_url_and_more'),
+        ('app_Credito', '0006_marcaproceso'),
+        ('app_Empresa', '0002_alter_on_premise_fecha_de_compra'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='credito',
+            index=models.Index(fields=['empresa', 'fecha_creacion', 'id'], name='credito_emp_fecha_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='credito',
+            index=models.Index(fields=['empresa', 'fase_actual', 'fecha_creacion'], name='credito_emp_fase_fecha_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='credito',
+            index=models.Index(fields=['empresa', 'enum_estado', 'fecha_creacion'], name='credito_emp_estado_fecha_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='credito',
+            index=models.Index(fields=['empresa', 'Monto_Solicitado'], name='credito_emp_monto_idx'),
+        ),
+    ]
@@ -0,0 +1,25 @@
+# Generated by Django 5.2.7 on 2026-10-18 19:10
+
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('app_Cliente', '0005_tenant_idx'),
+        ('app_Credito', '0007_credito_filtros_idx'),
+        ('app_Empresa', '0002_alter_on_premise_fecha_de_compra'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='credito',
+            index=models.Index(fields=['empresa', 'id'], name='credito_emp_id_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='tipo_credito',
+            index=models.Index(fields=['empresa', 'id'], name='tipo_credito_emp_id_idx'),
+        ),
+    ]
@@ -0,0 +1,31 @@
+from django.db import migrations
+
+
+def particionar(apps, schema_editor):
+    from app_Credito.particiones import convertir_a_particionada, es_postgres
+    if es_postgres(schema_editor.connection):
+        convertir_a_particionada(schema_editor.connection)
+
+
+def revertir_particionado(apps, schema_editor):
+    from app_Credito.particiones import convertir_a_tabla_simple, es_postgres
+    if es_postgres(schema_editor.connection):
+        convertir_a_tabla_simple(schema_editor.connection)
+
+
+class Migration(migrations.Migration):
+    """
+    Convierte app_Credito_historicocredito en una tabla particionada por mes
+    de fecha_cambio (solo PostgreSQL; en otros motores no hace nada).
+
+    Copia todas las filas dentro de la transacción de la migración: en tablas
+    grandes, correrla en una ventana de mantenimiento.
+    """
+
+    dependencies = [
+        ('app_Credito', '0008_tenant_idx'),
+    ]
+
+    operations = [
+        migrations.RunPython(particionar, revertir_particionado),
+    ]
@@ -0,0 +1,79 @@
+# Generated by Django 5.2.7 on 2026-10-18 19:13
+
+import django.db.models.deletion
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('app_Cliente', '0005_tenant_idx'),
+        ('app_Credito', '0009_historicocredito_particiones'),
+        ('app_Empresa', '0002_alter_on_premise_fecha_de_compra'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='CreditoArchivado',
+            fields=[
+                ('id', models.BigIntegerField(primary_key=True, serialize=False)),
+                ('Monto_Solicitado', models.DecimalField(decimal_places=2, max_digits=10)),
+                ('enum_estado', models.CharField(choices=[('Pendiente', 'Pendiente'), ('Aprobado', 'Aprobado'), ('Rechazado', 'Rechazado'), ('SOLICITADO', 'SOLICITADO'), ('DESENBOLSADO', 'DESENBOLSADO'), ('FINALIZADO', 'FINALIZADO')], max_length=20)),
+                ('fase_actual', models.CharField(choices=[('FASE_1_SOLICITUD', 'Datos de la solicitud'), ('FASE_2_DOCUMENTACION', 'Documentación personal'), ('FASE_3_LABORAL', 'Información laboral'), ('FASE_4_DOMICILIO', 'Domicilio'), ('FASE_5_GARANTE', 'Datos del garante'), ('FASE_6_REVISION', 'Revisión y aprobación'), ('FASE_7_DESEMBOLSO', 'Desembolso del crédito'), ('FASE_8_FINALIZADO', 'Crédito finalizado')], max_length=30)),
+                ('Numero_Cuotas', models.IntegerField()),
+                ('Monto_Cuota', models.DecimalField(decimal_places=2, max_digits=10)),
+                ('Moneda', models.CharField(max_length=10)),
+                ('Tasa_Interes', models.DecimalField(decimal_places=2, max_digits=5)),
+                ('Fecha_Aprobacion', models.DateField(blank=True, null=True)),
+                ('Fecha_Desembolso', models.DateField(blank=True, null=True)),
+                ('Fecha_Finalizacion', models.DateField(blank=True, null=True)),
+                ('Monto_Pagar', models.DecimalField(decimal_places=2, max_digits=10)),
+                ('razon_rechazo', models.TextField(blank=True, null=True)),
+                ('fecha_creacion', models.DateTimeField()),
+                ('fecha_actualizacion', models.DateTimeField()),
+                ('fecha_archivado', models.DateTimeField(auto_now_add=True)),
+                ('cliente', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, to='app_Cliente.cliente')),
+                ('empresa', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, to='app_Empresa.empresa')),
+                ('tipo_credito', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, to='app_Credito.tipo_credito')),
+                ('usuario', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, to=settings.AUTH_USER_MODEL)),
+            ],
+        ),
+        migrations.CreateModel(
+            name='GananciaCreditoArchivada',
+            fields=[
+                ('id', models.BigIntegerField(primary_key=True, serialize=False)),
+                ('monto_prestado', models.DecimalField(decimal_places=2, max_digits=10)),
+                ('tasa_interes', models.DecimalField(decimal_places=2, max_digits=5)),
+                ('duracion_meses', models.IntegerField()),
+                ('ganacia_esperada', models.DecimalField(decimal_places=2, max_digits=10)),
+                ('Cliente', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, to='app_Cliente.cliente')),
+                ('Credito', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, to='app_Credito.creditoarchivado')),
+            ],
+        ),
+        migrations.CreateModel(
+            name='HistoricoCreditoArchivado',
+            fields=[
+                ('id', models.BigIntegerField(primary_key=True, serialize=False)),
+                ('fase_anterior', models.CharField(blank=True, choices=[('FASE_1_SOLICITUD', 'Datos de la solicitud'), ('FASE_2_DOCUMENTACION', 'Documentación personal'), ('FASE_3_LABORAL', 'Información laboral'), ('FASE_4_DOMICILIO', 'Domicilio'), ('FASE_5_GARANTE', 'Datos del garante'), ('FASE_6_REVISION', 'Revisión y aprobación'), ('FASE_7_DESEMBOLSO', 'Desembolso del crédito'), ('FASE_8_FINALIZADO', 'Crédito finalizado')], max_length=30, null=True)),
+                ('fase_nueva', models.CharField(choices=[('FASE_1_SOLICITUD', 'Datos de la solicitud'), ('FASE_2_DOCUMENTACION', 'Documentación personal'), ('FASE_3_LABORAL', 'Información laboral'), ('FASE_4_DOMICILIO', 'Domicilio'), ('FASE_5_GARANTE', 'Datos del garante'), ('FASE_6_REVISION', 'Revisión y aprobación'), ('FASE_7_DESEMBOLSO', 'Desembolso del crédito'), ('FASE_8_FINALIZADO', 'Crédito finalizado')], max_length=30)),
+                ('fecha_cambio', models.DateTimeField()),
+                ('descripcion', models.TextField(blank=True, null=True)),
+                ('datos_agregados', models.JSONField(blank=True, default=dict)),
+                ('credito', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='historico', to='app_Credito.creditoarchivado')),
+                ('usuario_cambio', models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.SET_NULL, to=settings.AUTH_USER_MODEL)),
+            ],
+            options={
+                'ordering': ['-fecha_cambio'],
+            },
+        ),
+        migrations.AddIndex(
+            model_name='creditoarchivado',
+            index=models.Index(fields=['empresa', 'id'], name='credito_arch_emp_id_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='historicocreditoarchivado',
+            index=models.Index(fields=['credito', '-fecha_cambio', '-id'], name='hist_arch_credito_fecha_idx'),
+        ),
+    ]
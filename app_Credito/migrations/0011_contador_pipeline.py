@@ -0,0 +1,37 @@
+# Generated by Django 5.2.7 on 2026-10-18 19:15
+
+import django.db.models.deletion
+from django.db import migrations, models
+from django.db.models import Count
+
+
+def poblar_contadores(apps, schema_editor):
+    Credito = apps.get_model('app_Credito', 'Credito')
+    ContadorPipeline = apps.get_model('app_Credito', 'ContadorPipeline')
+    filas = Credito.objects.values('empresa_id', 'fase_actual', 'enum_estado').annotate(total=Count('id')).order_by()
+    ContadorPipeline.objects.bulk_create([ContadorPipeline(**fila) for fila in filas], batch_size=500)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('app_Credito', '0010_creditos_archivados'),
+        ('app_Empresa', '0002_alter_on_premise_fecha_de_compra'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='ContadorPipeline',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('fase_actual', models.CharField(choices=[('FASE_1_SOLICITUD', 'Datos de la solicitud'), ('FASE_2_DOCUMENTACION', 'Documentación personal'), ('FASE_3_LABORAL', 'Información laboral'), ('FASE_4_DOMICILIO', 'Domicilio'), ('FASE_5_GARANTE', 'Datos del garante'), ('FASE_6_REVISION', 'Revisión y aprobación'), ('FASE_7_DESEMBOLSO', 'Desembolso del crédito'), ('FASE_8_FINALIZADO', 'Crédito finalizado')], max_length=30)),
+                ('enum_estado', models.CharField(choices=[('Pendiente', 'Pendiente'), ('Aprobado', 'Aprobado'), ('Rechazado', 'Rechazado'), ('SOLICITADO', 'SOLICITADO'), ('DESENBOLSADO', 'DESENBOLSADO'), ('FINALIZADO', 'FINALIZADO')], max_length=20)),
+                ('total', models.IntegerField(default=0)),
+                ('empresa', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, to='app_Empresa.empresa')),
+            ],
+            options={
+                'constraints': [models.UniqueConstraint(fields=('empresa', 'fase_actual', 'enum_estado'), name='contador_pipeline_unico')],
+            },
+        ),
+        migrations.RunPython(poblar_contadores, migrations.RunPython.noop),
+    ]
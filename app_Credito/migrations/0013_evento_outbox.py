@@ -0,0 +1,32 @@
+# Generated by Django 5.2.7 on 2026-10-18 19:17
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('app_Credito', '0012_duracion_fase'),
+        ('app_Empresa', '0002_alter_on_premise_fecha_de_compra'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='EventoOutbox',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('tipo', models.CharField(max_length=50)),
+                ('id_credito', models.BigIntegerField()),
+                ('payload', models.JSONField(blank=True, default=dict)),
+                ('fecha_creacion', models.DateTimeField(auto_now_add=True)),
+                ('procesado', models.DateTimeField(blank=True, null=True)),
+                ('intentos', models.IntegerField(default=0)),
+                ('error', models.TextField(blank=True, null=True)),
+                ('empresa', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, to='app_Empresa.empresa')),
+            ],
+            options={
+                'indexes': [models.Index(condition=models.Q(('procesado__isnull', True)), fields=['id'], name='outbox_pendiente_idx')],
+            },
+        ),
+    ]
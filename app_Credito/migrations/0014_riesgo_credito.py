@@ -0,0 +1,35 @@
+# Generated by Django 5.2.7 on 2026-10-18 19:19
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('app_Credito', '0013_evento_outbox'),
+        ('app_Empresa', '0002_alter_on_premise_fecha_de_compra'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='RiesgoCredito',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('salario', models.DecimalField(blank=True, decimal_places=2, max_digits=10, null=True)),
+                ('cuota', models.DecimalField(decimal_places=2, max_digits=10)),
+                ('cuotas_vigentes', models.DecimalField(decimal_places=2, default=0, max_digits=12)),
+                ('exposicion', models.DecimalField(decimal_places=2, default=0, max_digits=12)),
+                ('carga_cuota', models.DecimalField(blank=True, decimal_places=4, max_digits=8, null=True)),
+                ('deuda_ingreso', models.DecimalField(blank=True, decimal_places=4, max_digits=8, null=True)),
+                ('puntaje', models.DecimalField(blank=True, decimal_places=2, max_digits=5, null=True)),
+                ('categoria', models.CharField(max_length=10)),
+                ('fecha_calculo', models.DateTimeField(auto_now=True)),
+                ('credito', models.OneToOneField(on_delete=django.db.models.deletion.CASCADE, related_name='riesgo', to='app_Credito.credito')),
+                ('empresa', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, to='app_Empresa.empresa')),
+            ],
+            options={
+                'indexes': [models.Index(fields=['empresa', 'puntaje'], name='riesgo_emp_puntaje_idx')],
+            },
+        ),
+    ]
@@ -0,0 +1,50 @@
+# Generated by Django 5.2.7 on 2026-10-18 19:20
+
+import django.db.models.deletion
+import django.utils.timezone
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('app_Cliente', '0005_tenant_idx'),
+        ('app_Credito', '0014_riesgo_credito'),
+        ('app_Empresa', '0002_alter_on_premise_fecha_de_compra'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='AsignacionRevision',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('fecha_asignacion', models.DateTimeField(default=django.utils.timezone.now)),
+                ('vence', models.DateTimeField()),
+            ],
+        ),
+        migrations.AddIndex(
+            model_name='credito',
+            index=models.Index(fields=['empresa', 'fase_actual', 'fecha_actualizacion'], name='credito_emp_fase_act_idx'),
+        ),
+        migrations.AddField(
+            model_name='asignacionrevision',
+            name='analista',
+            field=models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, to=settings.AUTH_USER_MODEL),
+        ),
+        migrations.AddField(
+            model_name='asignacionrevision',
+            name='credito',
+            field=models.OneToOneField(on_delete=django.db.models.deletion.CASCADE, related_name='asignacion_revision', to='app_Credito.credito'),
+        ),
+        migrations.AddField(
+            model_name='asignacionrevision',
+            name='empresa',
+            field=models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, to='app_Empresa.empresa'),
+        ),
+        migrations.AddIndex(
+            model_name='asignacionrevision',
+            index=models.Index(fields=['analista', 'vence'], name='asignacion_analista_vence_idx'),
+        ),
+    ]
@@ -0,0 +1,33 @@
+# Generated by Django 5.2.7 on 2026-10-18 19:39
+
+from django.db import migrations, models
+
+
+def quitar_marcas_duplicadas(apps, schema_editor):
+    # Sin la restricción pudieron crearse varias marcas globales del mismo proceso:
+    # se conserva la más antigua, que a lo sumo hace reprocesar algunos créditos
+    MarcaProceso = apps.get_model('app_Credito', 'MarcaProceso')
+    vistos = set()
+    duplicadas = []
+    globales = MarcaProceso.objects.filter(empresa__isnull=True).order_by('proceso', models.F('marca').asc(nulls_first=True), 'id')
+    for marca in globales:
+        if marca.proceso in vistos:
+            duplicadas.append(marca.id)
+        vistos.add(marca.proceso)
+    MarcaProceso.objects.filter(id__in=duplicadas).delete()
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('app_Credito', '0016_respuesta_idempotente'),
+        ('app_Empresa', '0002_alter_on_premise_fecha_de_compra'),
+    ]
+
+    operations = [
+        migrations.RunPython(quitar_marcas_duplicadas, migrations.RunPython.noop),
+        migrations.AddConstraint(
+            model_name='marcaproceso',
+            constraint=models.UniqueConstraint(condition=models.Q(('empresa__isnull', True)), fields=('proceso',), name='marca_proceso_global_unica'),
+        ),
+    ]
@@ -0,0 +1,70 @@
+# Generated by Django 5.2.7 on 2026-10-18 19:58
+
+import django.db.models.deletion
+import math
+from collections import Counter, defaultdict
+
+from django.db import migrations, models
+
+
+# Copia congelada de app_Credito/analitica.py al crear la migración
+AGRUPACIONES = {
+    'empresa': None,
+    'tipo_credito': 'tipo_credito_id',
+    'analista': 'usuario_id',
+}
+RAZON_CUBETAS = 1.1
+
+
+def cubeta(segundos):
+    return math.floor(math.log(max(segundos, 1.0), RAZON_CUBETAS))
+
+
+def resumir_duraciones(apps, schema_editor):
+    # Arma el resumen de los intervalos ya guardados; los siguientes los suma el handler del outbox
+    DuracionFase = apps.get_model('app_Credito', 'DuracionFase')
+    ResumenDuracionFase = apps.get_model('app_Credito', 'ResumenDuracionFase')
+
+    sumas = defaultdict(lambda: [0, 0.0, Counter()])
+    for duracion in DuracionFase.objects.order_by().iterator(chunk_size=5000):
+        for agrupar, columna in AGRUPACIONES.items():
+            grupo = (getattr(duracion, columna) or 0) if columna else duracion.empresa_id
+            suma = sumas[(duracion.empresa_id, agrupar, grupo, duracion.fase)]
+            suma[0] += 1
+            suma[1] += duracion.segundos
+            suma[2][str(cubeta(duracion.segundos))] += 1
+    ResumenDuracionFase.objects.bulk_create([
+        ResumenDuracionFase(
+            empresa_id=empresa_id, agrupacion=agrupar, grupo=grupo, fase=fase,
+            cantidad=cantidad, suma_segundos=segundos, histograma=dict(histograma),
+        )
+        for (empresa_id, agrupar, grupo, fase), (cantidad, segundos, histograma) in sumas.items()
+    ], batch_size=500)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('app_Credito', '0017_marca_proceso_global_unica'),
+        ('app_Empresa', '0002_alter_on_premise_fecha_de_compra'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='ResumenDuracionFase',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('agrupacion', models.CharField(max_length=20)),
+                ('grupo', models.BigIntegerField(default=0)),
+                ('fase', models.CharField(choices=[('FASE_1_SOLICITUD', 'Datos de la solicitud'), ('FASE_2_DOCUMENTACION', 'Documentación personal'), ('FASE_3_LABORAL', 'Información laboral'), ('FASE_4_DOMICILIO', 'Domicilio'), ('FASE_5_GARANTE', 'Datos del garante'), ('FASE_6_REVISION', 'Revisión y aprobación'), ('FASE_7_DESEMBOLSO', 'Desembolso del crédito'), ('FASE_8_FINALIZADO', 'Crédito finalizado')], max_length=30)),
+                ('cantidad', models.IntegerField(default=0)),
+                ('suma_segundos', models.FloatField(default=0)),
+                ('histograma', models.JSONField(blank=True, default=dict)),
+                ('empresa', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, to='app_Empresa.empresa')),
+            ],
+            options={
+                'constraints': [models.UniqueConstraint(fields=('empresa', 'agrupacion', 'grupo', 'fase'), name='resumen_duracion_unico')],
+            },
+        ),
+        migrations.RunPython(resumir_duraciones, migrations.RunPython.noop),
+    ]
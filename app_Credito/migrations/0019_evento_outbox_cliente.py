@@ -0,0 +1,25 @@
+# Generated by Django 5.2.7 on 2026-10-18 20:00
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('app_Credito', '0018_resumen_duracion_fase'),
+        ('app_Empresa', '0002_alter_on_premise_fecha_de_compra'),
+    ]
+
+    operations = [
+        migrations.AlterField(
+            model_name='eventooutbox',
+            name='empresa',
+            field=models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.CASCADE, to='app_Empresa.empresa'),
+        ),
+        migrations.AlterField(
+            model_name='eventooutbox',
+            name='id_credito',
+            field=models.BigIntegerField(blank=True, null=True),
+        ),
+    ]
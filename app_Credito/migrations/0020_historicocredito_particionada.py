@@ -0,0 +1,104 @@
+import datetime
+
+from django.db import migrations
+
+
+TABLA = 'app_Credito_historicocredito'
+TABLA_DEFAULT = f'{TABLA}_default'
+TABLA_LEGACY = f'{TABLA}_legacy'
+SECUENCIA = f'{TABLA}_particionada_id_seq'
+MESES_ADELANTE = 3
+
+
+def _sumar_mes(mes):
+    return datetime.date(mes.year + mes.month // 12, mes.month % 12 + 1, 1)
+
+
+def particionar_si_falta(apps, schema_editor):
+    """
+    Particiona la tabla en las bases donde 0009 no lo hizo (copia congelada de
+    la conversión de app_Credito/particiones.py); si ya está particionada, no
+    hace nada
+    """
+    conexion = schema_editor.connection
+    if conexion.vendor != 'postgresql':
+        return
+    q = conexion.ops.quote_name
+    with conexion.cursor() as cursor:
+        cursor.execute(
+            "SELECT EXISTS (SELECT 1 FROM pg_partitioned_table pt "
+            "JOIN pg_class c ON c.oid = pt.partrelid WHERE c.relname = %s AND pg_table_is_visible(c.oid))",
+            [TABLA],
+        )
+        if cursor.fetchone()[0]:
+            return
+
+        cursor.execute("SET CONSTRAINTS ALL IMMEDIATE")
+        cursor.execute(f"LOCK TABLE {q(TABLA)} IN ACCESS EXCLUSIVE MODE")
+        cursor.execute(f"ALTER TABLE {q(TABLA)} RENAME TO {q(TABLA_LEGACY)}")
+
+        cursor.execute(
+            "SELECT pg_get_indexdef(ix.indexrelid) FROM pg_index ix "
+            "WHERE ix.indrelid = %s::regclass AND NOT ix.indisunique",
+            [q(TABLA_LEGACY)],
+        )
+        indices = [fila[0] for fila in cursor.fetchall()]
+        cursor.execute(
+            "SELECT conname, pg_get_constraintdef(oid) FROM pg_constraint "
+            "WHERE conrelid = %s::regclass AND contype = 'f'",
+            [q(TABLA_LEGACY)],
+        )
+        foraneas = cursor.fetchall()
+
+        cursor.execute(
+            f"CREATE TABLE {q(TABLA)} (LIKE {q(TABLA_LEGACY)} INCLUDING DEFAULTS) PARTITION BY RANGE (fecha_cambio)"
+        )
+        cursor.execute(f"CREATE TABLE {q(TABLA_DEFAULT)} PARTITION OF {q(TABLA)} DEFAULT")
+
+        # Particiones vacías de cada mes con datos y de los próximos meses, antes de copiar
+        cursor.execute(f"SELECT MIN(fecha_cambio) FROM {q(TABLA_LEGACY)}")
+        primera = cursor.fetchone()[0]
+        hoy = datetime.date.today()
+        actual = datetime.date(hoy.year, hoy.month, 1)
+        mes = datetime.date(primera.year, primera.month, 1) if primera else actual
+        ultimo = actual
+        for _ in range(MESES_ADELANTE):
+            ultimo = _sumar_mes(ultimo)
+        while mes <= ultimo:
+            cursor.execute(
+                f"CREATE TABLE {q(f'{TABLA}_p{mes:%Y_%m}')} PARTITION OF {q(TABLA)} FOR VALUES FROM (%s) TO (%s)",
+                [mes.isoformat(), _sumar_mes(mes).isoformat()],
+            )
+            mes = _sumar_mes(mes)
+
+        cursor.execute(f"INSERT INTO {q(TABLA)} SELECT * FROM {q(TABLA_LEGACY)}")
+
+        cursor.execute(f"CREATE SEQUENCE {q(SECUENCIA)}")
+        cursor.execute(
+            f"SELECT setval(%s, COALESCE((SELECT MAX(id) FROM {q(TABLA)}), 0) + 1, false)", [q(SECUENCIA)],
+        )
+        cursor.execute(f"ALTER TABLE {q(TABLA)} ALTER COLUMN id SET DEFAULT nextval(%s::regclass)", [q(SECUENCIA)])
+        cursor.execute(f"ALTER SEQUENCE {q(SECUENCIA)} OWNED BY {q(TABLA)}.id")
+
+        cursor.execute(f"DROP TABLE {q(TABLA_LEGACY)}")
+        cursor.execute(f"ALTER TABLE {q(TABLA)} ADD PRIMARY KEY (id, fecha_cambio)")
+        for definicion in indices:
+            cursor.execute(definicion.replace(' ON ONLY ', ' ON ').replace(q(TABLA_LEGACY), q(TABLA)))
+        for nombre, definicion in foraneas:
+            cursor.execute(f"ALTER TABLE {q(TABLA)} ADD CONSTRAINT {q(nombre)} {definicion}")
+
+
+class Migration(migrations.Migration):
+    """
+    Deja particionada app_Credito_historicocredito en PostgreSQL también en
+    las bases que aplicaron 0009 mientras no convertía la tabla. La reversa
+    no hace nada: la de 0009 vuelve a la tabla simple.
+    """
+
+    dependencies = [
+        ('app_Credito', '0019_evento_outbox_cliente'),
+    ]
+
+    operations = [
+        migrations.RunPython(particionar_si_falta, migrations.RunPython.noop),
+    ]
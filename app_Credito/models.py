@@ -1,4 +1,6 @@
 from django.db import models
+from django.core.serializers.json import DjangoJSONEncoder
+from django.utils import timezone
 from django.contrib.auth.models import User
 from app_Cliente.models import Cliente
 from app_User.models import Perfiluser
@@ -32,6 +34,11 @@ class Tipo_Credito(models.Model):
     monto_maximo = models.DecimalField(max_digits=10, decimal_places=2)
     empresa = models.ForeignKey(Empresa, on_delete=models.CASCADE, null=True, blank=True)
 
+    class Meta:
+        indexes = [
+            models.Index(fields=['empresa', 'id'], name='tipo_credito_emp_id_idx'),
+        ]
+
     def __str__(self):
         return self.nombre
     
@@ -56,6 +63,18 @@ class Credito(models.Model):
     fecha_creacion = models.DateTimeField(auto_now_add=True)
     fecha_actualizacion = models.DateTimeField(auto_now=True)
 
+    class Meta:
+        # Todas las consultas filtran por empresa: los índices empiezan por ella
+        indexes = [
+            models.Index(fields=['empresa', 'fecha_creacion', 'id'], name='credito_emp_fecha_idx'),
+            models.Index(fields=['empresa', 'id'], name='credito_emp_id_idx'),
+            models.Index(fields=['empresa', 'fase_actual', 'fecha_creacion'], name='credito_emp_fase_fecha_idx'),
+            models.Index(fields=['empresa', 'enum_estado', 'fecha_creacion'], name='credito_emp_estado_fecha_idx'),
+            models.Index(fields=['empresa', 'Monto_Solicitado'], name='credito_emp_monto_idx'),
+            # Cola de revisión: los más antiguos de la fase primero
+            models.Index(fields=['empresa', 'fase_actual', 'fecha_actualizacion'], name='credito_emp_fase_act_idx'),
+        ]
+
     def __str__(self):
         return f"Crédito {self.id} - Cliente: {self.cliente.nombre} - Monto Solicitado: {self.Monto_Solicitado} {self.Moneda}"
     
@@ -72,6 +91,10 @@ class HistoricoCredito(models.Model):
     
     class Meta:
         ordering = ['-fecha_cambio']
+        indexes = [
+            # Línea de tiempo por crédito paginada por keyset (fecha_cambio, id)
+            models.Index(fields=['credito', '-fecha_cambio', '-id'], name='hist_credito_fecha_idx'),
+        ]
     
     def __str__(self):
         return f"Crédito {self.credito.id} - {self.fase_anterior} → {self.fase_nueva} - {self.fecha_cambio}"
@@ -86,6 +109,252 @@ class Ganancia_Credito(models.Model):
 
     def __str__(self):
         return f"Ganancia Crédito {self.Credito.id} - Cliente: {self.Cliente.nombre}"
-       
 
 
+class MarcaProceso(models.Model):
+    """Marca de agua de procesos por lote: hasta qué fecha_actualizacion se procesó"""
+    proceso = models.CharField(max_length=50)
+    empresa = models.ForeignKey(Empresa, on_delete=models.CASCADE, null=True, blank=True)
+    marca = models.DateTimeField(null=True, blank=True)
+    fecha_ejecucion = models.DateTimeField(auto_now=True)
+
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(fields=['proceso', 'empresa'], name='marca_proceso_empresa_unica'),
+            # NULL no choca con NULL en la restricción anterior: una sola marca global por proceso
+            models.UniqueConstraint(
+                fields=['proceso'], condition=models.Q(empresa__isnull=True), name='marca_proceso_global_unica',
+            ),
+        ]
+
+    def __str__(self):
+        return f"{self.proceso} - {self.empresa_id or 'todas'} - {self.marca}"
+
+
+class CreditoArchivado(models.Model):
+    """Crédito finalizado movido fuera de Credito (ver app_Credito/archivo.py); conserva el id original"""
+    id = models.BigIntegerField(primary_key=True)
+    Monto_Solicitado = models.DecimalField(max_digits=10, decimal_places=2)
+    enum_estado = models.CharField(max_length=20, choices=ENUM_ESTADO_CREDITO)
+    fase_actual = models.CharField(max_length=30, choices=ENUM_FASE_CREDITO)
+    Numero_Cuotas = models.IntegerField()
+    Monto_Cuota = models.DecimalField(max_digits=10, decimal_places=2)
+    Moneda = models.CharField(max_length=10)
+    Tasa_Interes = models.DecimalField(max_digits=5, decimal_places=2)
+    Fecha_Aprobacion = models.DateField(null=True, blank=True)
+    Fecha_Desembolso = models.DateField(null=True, blank=True)
+    Fecha_Finalizacion = models.DateField(null=True, blank=True)
+    Monto_Pagar = models.DecimalField(max_digits=10, decimal_places=2)
+    razon_rechazo = models.TextField(null=True, blank=True)
+    empresa = models.ForeignKey(Empresa, on_delete=models.CASCADE)
+    usuario = models.ForeignKey(User, on_delete=models.CASCADE)
+    cliente = models.ForeignKey(Cliente, on_delete=models.CASCADE)
+    tipo_credito = models.ForeignKey(Tipo_Credito, on_delete=models.CASCADE)
+    fecha_creacion = models.DateTimeField()
+    fecha_actualizacion = models.DateTimeField()
+    fecha_archivado = models.DateTimeField(auto_now_add=True)
+
+    class Meta:
+        indexes = [
+            models.Index(fields=['empresa', 'id'], name='credito_arch_emp_id_idx'),
+        ]
+
+    def __str__(self):
+        return f"Crédito archivado {self.id} - Monto Solicitado: {self.Monto_Solicitado} {self.Moneda}"
+
+
+class HistoricoCreditoArchivado(models.Model):
+    """HistoricoCredito de un crédito archivado"""
+    id = models.BigIntegerField(primary_key=True)
+    credito = models.ForeignKey(CreditoArchivado, on_delete=models.CASCADE, related_name='historico')
+    fase_anterior = models.CharField(max_length=30, choices=ENUM_FASE_CREDITO, null=True, blank=True)
+    fase_nueva = models.CharField(max_length=30, choices=ENUM_FASE_CREDITO)
+    fecha_cambio = models.DateTimeField()
+    usuario_cambio = models.ForeignKey(User, on_delete=models.SET_NULL, null=True, blank=True)
+    descripcion = models.TextField(null=True, blank=True)
+    datos_agregados = models.JSONField(default=dict, blank=True)
+
+    class Meta:
+        ordering = ['-fecha_cambio']
+        indexes = [
+            models.Index(fields=['credito', '-fecha_cambio', '-id'], name='hist_arch_credito_fecha_idx'),
+        ]
+
+    def __str__(self):
+        return f"Crédito archivado {self.credito_id} - {self.fase_anterior} → {self.fase_nueva} - {self.fecha_cambio}"
+
+
+class GananciaCreditoArchivada(models.Model):
+    """Ganancia_Credito de un crédito archivado"""
+    id = models.BigIntegerField(primary_key=True)
+    monto_prestado = models.DecimalField(max_digits=10, decimal_places=2)
+    tasa_interes = models.DecimalField(max_digits=5, decimal_places=2)
+    duracion_meses = models.IntegerField()
+    ganacia_esperada = models.DecimalField(max_digits=10, decimal_places=2)
+    Cliente = models.ForeignKey(Cliente, on_delete=models.CASCADE)
+    Credito = models.ForeignKey(CreditoArchivado, on_delete=models.CASCADE)
+
+    def __str__(self):
+        return f"Ganancia Crédito archivado {self.Credito_id}"
+
+
+class ContadorPipeline(models.Model):
+    """Cantidad de créditos por empresa, fase y estado, mantenida por app_Credito/pipeline.py"""
+    empresa = models.ForeignKey(Empresa, on_delete=models.CASCADE)
+    fase_actual = models.CharField(max_length=30, choices=ENUM_FASE_CREDITO)
+    enum_estado = models.CharField(max_length=20, choices=ENUM_ESTADO_CREDITO)
+    total = models.IntegerField(default=0)
+
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(fields=['empresa', 'fase_actual', 'enum_estado'], name='contador_pipeline_unico'),
+        ]
+
+    def __str__(self):
+        return f"{self.empresa_id} - {self.fase_actual} / {self.enum_estado}: {self.total}"
+
+
+class DuracionFase(models.Model):
+    """
+    Tiempo que un crédito estuvo en una fase, calculado desde HistoricoCredito
+    (ver app_Credito/analitica.py). Guarda ids planos del crédito y del evento
+    para sobrevivir al archivo de créditos.
+    """
+    id_historico = models.BigIntegerField(unique=True)  # Evento con el que el crédito entró a la fase
+    id_credito = models.BigIntegerField()
+    empresa = models.ForeignKey(Empresa, on_delete=models.CASCADE)
+    tipo_credito = models.ForeignKey(Tipo_Credito, on_delete=models.SET_NULL, null=True, blank=True)
+    usuario = models.ForeignKey(User, on_delete=models.SET_NULL, null=True, blank=True)  # Quien cerró la fase
+    fase = models.CharField(max_length=30, choices=ENUM_FASE_CREDITO)
+    inicio = models.DateTimeField()
+    fin = models.DateTimeField()
+    segundos = models.FloatField()
+
+    class Meta:
+        indexes = [
+            models.Index(fields=['empresa', 'fase'], name='duracion_fase_emp_fase_idx'),
+        ]
+
+    def __str__(self):
+        return f"Crédito {self.id_credito} - {self.fase}: {self.segundos}s"
+
+
+class ResumenDuracionFase(models.Model):
+    """
+    Agregado de DuracionFase por empresa, agrupación, grupo y fase: cantidad,
+    suma de segundos e histograma logarítmico de duraciones (ver
+    app_Credito/analitica.py). Lo lee el dashboard sin recorrer DuracionFase.
+    """
+    empresa = models.ForeignKey(Empresa, on_delete=models.CASCADE)
+    agrupacion = models.CharField(max_length=20)  # 'empresa', 'tipo_credito' o 'analista'
+    grupo = models.BigIntegerField(default=0)  # id del grupo; 0 = sin tipo de crédito / analista
+    fase = models.CharField(max_length=30, choices=ENUM_FASE_CREDITO)
+    cantidad = models.IntegerField(default=0)
+    suma_segundos = models.FloatField(default=0)
+    histograma = models.JSONField(default=dict, blank=True)  # cubeta -> cantidad
+
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(fields=['empresa', 'agrupacion', 'grupo', 'fase'], name='resumen_duracion_unico'),
+        ]
+
+    def __str__(self):
+        return f"{self.empresa_id} - {self.agrupacion} {self.grupo} - {self.fase}: {self.cantidad}"
+
+
+class EventoOutbox(models.Model):
+    """
+    Evento del workflow escrito en la misma transacción que el cambio que lo
+    origina; lo consume el comando procesar_outbox (ver app_Credito/outbox.py)
+    """
+    tipo = models.CharField(max_length=50)
+    # Nulos en los eventos de cliente (recalcular riesgo), que pueden no tener empresa ni crédito
+    empresa = models.ForeignKey(Empresa, on_delete=models.CASCADE, null=True, blank=True)
+    id_credito = models.BigIntegerField(null=True, blank=True)
+    payload = models.JSONField(default=dict, blank=True)
+    fecha_creacion = models.DateTimeField(auto_now_add=True)
+    procesado = models.DateTimeField(null=True, blank=True)
+    intentos = models.IntegerField(default=0)
+    error = models.TextField(null=True, blank=True)
+
+    class Meta:
+        indexes = [
+            # Solo los pendientes, en el orden en que los toma el consumidor
+            models.Index(fields=['id'], condition=models.Q(procesado__isnull=True), name='outbox_pendiente_idx'),
+        ]
+
+    def __str__(self):
+        return f"{self.tipo} - Crédito {self.id_credito} - {'procesado' if self.procesado else 'pendiente'}"
+
+
+class RiesgoCredito(models.Model):
+    """
+    Capacidad de pago precalculada de una solicitud (ver app_Credito/riesgo.py),
+    para ordenar la cola de revisión sin calcular por fila
+    """
+    credito = models.OneToOneField(Credito, on_delete=models.CASCADE, related_name='riesgo')
+    empresa = models.ForeignKey(Empresa, on_delete=models.CASCADE)
+    salario = models.DecimalField(max_digits=10, decimal_places=2, null=True, blank=True)
+    cuota = models.DecimalField(max_digits=10, decimal_places=2)
+    cuotas_vigentes = models.DecimalField(max_digits=12, decimal_places=2, default=0)  # Otras cuotas activas del cliente
+    exposicion = models.DecimalField(max_digits=12, decimal_places=2, default=0)  # Monto_Pagar de sus créditos activos
+    carga_cuota = models.DecimalField(max_digits=8, decimal_places=4, null=True, blank=True)  # cuota / salario
+    deuda_ingreso = models.DecimalField(max_digits=8, decimal_places=4, null=True, blank=True)  # (cuota + vigentes) / salario
+    puntaje = models.DecimalField(max_digits=5, decimal_places=2, null=True, blank=True)  # 0 (peor) a 100
+    categoria = models.CharField(max_length=10)
+    fecha_calculo = models.DateTimeField(auto_now=True)
+
+    class Meta:
+        indexes = [
+            models.Index(fields=['empresa', 'puntaje'], name='riesgo_emp_puntaje_idx'),
+        ]
+
+    def __str__(self):
+        return f"Crédito {self.credito_id} - {self.categoria} ({self.puntaje})"
+
+
+class AsignacionRevision(models.Model):
+    """
+    Crédito en FASE_6_REVISION reservado por un analista hasta `vence`
+    (ver app_Credito/cola_revision.py). Vencida, otro analista puede tomarlo.
+    """
+    credito = models.OneToOneField(Credito, on_delete=models.CASCADE, related_name='asignacion_revision')
+    empresa = models.ForeignKey(Empresa, on_delete=models.CASCADE)
+    analista = models.ForeignKey(User, on_delete=models.CASCADE)
+    fecha_asignacion = models.DateTimeField(default=timezone.now)
+    vence = models.DateTimeField()
+
+    class Meta:
+        indexes = [
+            models.Index(fields=['analista', 'vence'], name='asignacion_analista_vence_idx'),
+        ]
+
+    def __str__(self):
+        return f"Crédito {self.credito_id} - {self.analista_id} hasta {self.vence}"
+
+
+class RespuestaIdempotente(models.Model):
+    """
+    Respuesta grabada de una acción con header Idempotency-Key, para
+    devolverla tal cual en los reintentos (ver app_Credito/idempotencia.py).
+    estado_http nulo indica que la primera petición todavía se está procesando.
+    """
+    usuario = models.ForeignKey(User, on_delete=models.CASCADE)
+    clave = models.CharField(max_length=255)
+    metodo = models.CharField(max_length=10)
+    ruta = models.CharField(max_length=255)
+    estado_http = models.PositiveSmallIntegerField(null=True, blank=True)
+    cuerpo = models.JSONField(null=True, blank=True, encoder=DjangoJSONEncoder)
+    fecha_creacion = models.DateTimeField(auto_now_add=True)
+    vence = models.DateTimeField()
+
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(fields=['usuario', 'clave'], name='respuesta_idempotente_unica'),
+        ]
+        indexes = [
+            models.Index(fields=['vence'], name='respuesta_idem_vence_idx'),
+        ]
+
+    def __str__(self):
+        return f"{self.usuario_id} - {self.clave} - {self.estado_http or 'en proceso'}"
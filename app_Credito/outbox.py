@@ -0,0 +1,172 @@
+"""
+Outbox transaccional de eventos del workflow de créditos
+
+cambiar_fase y cambiar_fase_lote escriben un EventoOutbox junto con cada
+HistoricoCredito, en la misma transacción, y todo cambio de Credito o Trabajo
+escribe uno para recalcular el riesgo del cliente (ver app_Credito/riesgo.py). El comando procesar_outbox toma
+los pendientes por lotes (SELECT ... FOR UPDATE SKIP LOCKED, así varios
+consumidores pueden correr a la vez) y llama a los handlers registrados con
+todos los eventos del lote de cada tipo. En PostgreSQL, además, se avisa por
+NOTIFY en CANAL_EVENTOS al confirmar la transacción (lo escucha el stream SSE,
+ver app_Credito/eventos.py).
+
+Registrar un handler:
+
+    @registrar_handler(EVENTO_FASE_CAMBIADA)
+    def notificar(eventos):
+        ...  # eventos: lista de EventoOutbox
+"""
+import datetime
+import logging
+from collections import defaultdict
+
+from django.conf import settings
+from django.db import connection, transaction
+from django.utils import timezone
+
+from .models import EventoOutbox
+
+
+logger = logging.getLogger(__name__)
+
+EVENTO_FASE_CAMBIADA = 'credito.fase_cambiada'
+EVENTO_RIESGO_CLIENTE = 'cliente.recalcular_riesgo'
+
+CANAL_EVENTOS = 'credito_eventos'
+
+_handlers = defaultdict(list)
+
+
+def registrar_handler(tipo):
+    """Decorador que registra una función handler(eventos) para un tipo de evento"""
+    def decorador(funcion):
+        if funcion not in _handlers[tipo]:
+            _handlers[tipo].append(funcion)
+        return funcion
+    return decorador
+
+
+def evento_fase(credito, historico, estado_anterior, estado_nuevo):
+    """Arma (sin guardar) el EventoOutbox de un cambio de fase"""
+    return EventoOutbox(
+        tipo=EVENTO_FASE_CAMBIADA,
+        empresa_id=credito.empresa_id,
+        id_credito=credito.pk,
+        payload={
+            'historico_id': historico.pk,
+            'fase_anterior': historico.fase_anterior,
+            'fase_nueva': historico.fase_nueva,
+            'estado_anterior': estado_anterior,
+            'estado': estado_nuevo,
+            'usuario_id': historico.usuario_cambio_id,
+        },
+    )
+
+
+def evento_riesgo(cliente_id, empresa_id, credito_id=None):
+    """Arma (sin guardar) el EventoOutbox que pide recalcular el riesgo de un cliente"""
+    return EventoOutbox(
+        tipo=EVENTO_RIESGO_CLIENTE,
+        empresa_id=empresa_id,
+        id_credito=credito_id,
+        payload={'cliente_id': cliente_id},
+    )
+
+
+def notificar_eventos(empresa_ids):
+    """
+    NOTIFY de eventos nuevos por empresa (solo PostgreSQL)
+
+    Se llama dentro de la transacción que inserta los eventos: PostgreSQL
+    entrega la notificación recién al confirmarla, y nunca si se revierte.
+    """
+    if connection.vendor != 'postgresql':
+        return
+    with connection.cursor() as cursor:
+        for empresa_id in sorted(set(empresa_ids)):
+            cursor.execute("SELECT pg_notify(%s, %s)", [CANAL_EVENTOS, str(empresa_id)])
+
+
+def _ejecutar(tipo, eventos):
+    """Corre los handlers del tipo en un savepoint: si alguno falla, sus efectos se deshacen"""
+    with transaction.atomic():
+        for handler in _handlers.get(tipo, []):
+            handler(eventos)
+
+
+def procesar_lote(lote=None, excluir=()):
+    """
+    Procesa hasta `lote` eventos pendientes, salvo los de ids en `excluir`
+
+    Los handlers reciben juntos los eventos del lote de cada tipo. Si fallan,
+    se deshacen sus efectos y cada evento del grupo se reintenta solo: los que
+    pasan quedan procesados, y solo los que vuelven a fallar suman un intento
+    y quedan pendientes. Al llegar a OUTBOX_MAX_INTENTOS se marcan como
+    procesados conservando el error.
+
+    Returns:
+        Dict con la cantidad de eventos tomados, procesados y fallidos, y en
+        'ids_fallidos' los ids de los que fallaron
+    """
+    lote = lote or getattr(settings, 'OUTBOX_LOTE', 100)
+    max_intentos = getattr(settings, 'OUTBOX_MAX_INTENTOS', 5)
+    resumen = {'tomados': 0, 'procesados': 0, 'fallidos': 0, 'ids_fallidos': []}
+
+    with transaction.atomic():
+        pendientes = EventoOutbox.objects.select_for_update(skip_locked=True).filter(procesado__isnull=True)
+        if excluir:
+            pendientes = pendientes.exclude(id__in=excluir)
+        eventos = list(pendientes.order_by('id')[:lote])
+        if not eventos:
+            return resumen
+        resumen['tomados'] = len(eventos)
+
+        por_tipo = defaultdict(list)
+        for evento in eventos:
+            por_tipo[evento.tipo].append(evento)
+
+        ahora = timezone.now()
+        procesados = []
+        for tipo, grupo in por_tipo.items():
+            try:
+                _ejecutar(tipo, grupo)
+            except Exception as e:
+                if len(grupo) == 1:
+                    logger.exception("Error procesando el evento %s del outbox", grupo[0].id)
+                    fallidos = [(grupo[0], e)]
+                else:
+                    logger.warning("Error procesando eventos %s del outbox; se reintentan de a uno", tipo)
+                    fallidos = []
+                    for evento in grupo:
+                        try:
+                            _ejecutar(tipo, [evento])
+                        except Exception as error:
+                            logger.exception("Error procesando el evento %s del outbox", evento.id)
+                            fallidos.append((evento, error))
+                        else:
+                            procesados.append(evento)
+                for evento, error in fallidos:
+                    evento.intentos += 1
+                    evento.error = str(error)
+                    if evento.intentos >= max_intentos:
+                        evento.procesado = ahora
+                resumen['fallidos'] += len(fallidos)
+                resumen['ids_fallidos'] += [evento.id for evento, _ in fallidos]
+                continue
+            procesados.extend(grupo)
+
+        for evento in procesados:
+            evento.procesado = ahora
+            evento.error = None
+        resumen['procesados'] = len(procesados)
+
+        EventoOutbox.objects.bulk_update(eventos, ['procesado', 'intentos', 'error'], batch_size=500)
+
+    return resumen
+
+
+def purgar_procesados(dias):
+    """Borra los eventos procesados sin error hace más de `dias` días"""
+    limite = timezone.now() - datetime.timedelta(days=dias)
+    borrados, _ = EventoOutbox.objects.filter(procesado__lt=limite, error__isnull=True).delete()
+    return borrados
@@ -0,0 +1,13 @@
+from rest_framework.pagination import CursorPagination
+
+
+class CreditoCursorPagination(CursorPagination):
+    """
+    Paginación por cursor del listado de créditos, ordenada por (fecha_creacion, id)
+
+    El cursor es opaco (parámetro 'cursor'); el tamaño de página se elige con 'limit'.
+    """
+    ordering = ('fecha_creacion', 'id')
+    page_size = 50
+    page_size_query_param = 'limit'
+    max_page_size = 500
@@ -0,0 +1,312 @@
+"""
+Particionado mensual de HistoricoCredito por fecha_cambio (solo PostgreSQL)
+
+La tabla es append-only y se lee por crédito ordenada por -fecha_cambio. Con
+particiones por mes:
+- crear_particiones: crea las particiones de los próximos meses y mueve a su
+  partición las filas que hayan caído en la partición por defecto. No hay
+  creación al insertar: el comando particiones_historial tiene que correr a
+  diario (cron); si no corre, las filas nuevas van a la partición por defecto
+  hasta la siguiente ejecución, que las mueve
+- archivar_particiones: desacopla (DETACH) las particiones viejas que ya no
+  tienen histórico de créditos vivos y las mueve al esquema de archivo
+- convertir_a_particionada / convertir_a_tabla_simple: conversión de la tabla
+  existente y su reversa, las que usa la migración 0009 (la 0020 tiene una
+  copia congelada). particiones_historial --convertir / --revertir las corre
+  a mano
+
+En otros motores (sqlite en desarrollo) todas las funciones son no-op.
+"""
+import datetime
+
+from django.conf import settings
+from django.db import connection, transaction
+
+from .amortizacion import sumar_meses
+from .models import Credito
+
+
+TABLA = 'app_Credito_historicocredito'
+TABLA_DEFAULT = f'{TABLA}_default'
+TABLA_LEGACY = f'{TABLA}_legacy'
+SECUENCIA = f'{TABLA}_particionada_id_seq'
+
+
+def es_postgres(conexion=None):
+    return (conexion or connection).vendor == 'postgresql'
+
+
+def _q(nombre):
+    return connection.ops.quote_name(nombre)
+
+
+def inicio_mes(fecha):
+    return datetime.date(fecha.year, fecha.month, 1)
+
+
+def nombre_particion(mes):
+    return f'{TABLA}_p{mes:%Y_%m}'
+
+
+def esta_particionada(cursor):
+    cursor.execute(
+        "SELECT EXISTS (SELECT 1 FROM pg_partitioned_table pt "
+        "JOIN pg_class c ON c.oid = pt.partrelid WHERE c.relname = %s AND pg_table_is_visible(c.oid))",
+        [TABLA],
+    )
+    return cursor.fetchone()[0]
+
+
+def listar_particiones(cursor):
+    """Particiones mensuales adjuntas, como lista ordenada de (nombre, mes)"""
+    cursor.execute(
+        "SELECT c.relname FROM pg_inherits i "
+        "JOIN pg_class c ON c.oid = i.inhrelid "
+        "JOIN pg_class p ON p.oid = i.inhparent "
+        "WHERE p.relname = %s AND pg_table_is_visible(p.oid)",
+        [TABLA],
+    )
+    particiones = []
+    prefijo = f'{TABLA}_p'
+    for (nombre,) in cursor.fetchall():
+        if nombre.startswith(prefijo):
+            mes = datetime.datetime.strptime(nombre[len(prefijo):], '%Y_%m').date()
+            particiones.append((nombre, mes))
+    return sorted(particiones, key=lambda p: p[1])
+
+
+def _crear_particion(cursor, mes):
+    """
+    Crea la partición del mes si no existe
+
+    Si la partición por defecto tiene filas de ese mes, la partición se arma
+    como tabla suelta, se le mueven esas filas y recién después se adjunta
+    (PostgreSQL no permite crearla directamente en ese caso).
+    """
+    nombre = nombre_particion(mes)
+    desde = mes.isoformat()
+    hasta = sumar_meses(mes, 1).isoformat()
+
+    cursor.execute("SELECT to_regclass(%s) IS NOT NULL", [_q(nombre)])
+    if cursor.fetchone()[0]:
+        return False
+
+    cursor.execute(
+        f"SELECT EXISTS (SELECT 1 FROM {_q(TABLA_DEFAULT)} WHERE fecha_cambio >= %s AND fecha_cambio < %s)",
+        [desde, hasta],
+    )
+    if not cursor.fetchone()[0]:
+        cursor.execute(
+            f"CREATE TABLE {_q(nombre)} PARTITION OF {_q(TABLA)} FOR VALUES FROM (%s) TO (%s)",
+            [desde, hasta],
+        )
+        return True
+
+    cursor.execute(f"CREATE TABLE {_q(nombre)} (LIKE {_q(TABLA)} INCLUDING DEFAULTS INCLUDING CONSTRAINTS)")
+    cursor.execute(
+        f"WITH movidas AS (DELETE FROM {_q(TABLA_DEFAULT)} WHERE fecha_cambio >= %s AND fecha_cambio < %s RETURNING *) "
+        f"INSERT INTO {_q(nombre)} SELECT * FROM movidas",
+        [desde, hasta],
+    )
+    cursor.execute(
+        f"ALTER TABLE {_q(TABLA)} ATTACH PARTITION {_q(nombre)} FOR VALUES FROM (%s) TO (%s)",
+        [desde, hasta],
+    )
+    return True
+
+
+def crear_particiones(desde=None, meses_adelante=None):
+    """
+    Asegura que existan las particiones desde el mes de `desde` hasta
+    `meses_adelante` meses después del actual
+
+    Returns:
+        Lista con los nombres de las particiones creadas
+    """
+    if not es_postgres():
+        return []
+    if meses_adelante is None:
+        meses_adelante = getattr(settings, 'HISTORIAL_PARTICIONES_MESES_ADELANTE', 3)
+
+    actual = inicio_mes(datetime.date.today())
+    mes = inicio_mes(desde) if desde else actual
+    ultimo = sumar_meses(actual, meses_adelante)
+
+    creadas = []
+    with transaction.atomic(), connection.cursor() as cursor:
+        if not esta_particionada(cursor):
+            return []
+        while mes <= ultimo:
+            if _crear_particion(cursor, mes):
+                creadas.append(nombre_particion(mes))
+            mes = sumar_meses(mes, 1)
+    return creadas
+
+
+def _tiene_creditos_vivos(cursor, particion):
+    cursor.execute(
+        f"SELECT EXISTS (SELECT 1 FROM {_q(particion)} h "
+        f"JOIN {_q(Credito._meta.db_table)} c ON c.id = h.credito_id)"
+    )
+    return cursor.fetchone()[0]
+
+
+def archivar_particiones(antes_de, esquema=None):
+    """
+    Desacopla las particiones de meses anteriores a `antes_de` y las mueve al
+    esquema de archivo
+
+    Solo se archiva un mes cuando todos sus créditos ya pasaron por
+    archivar_creditos (que mueve su histórico a HistoricoCreditoArchivado): una
+    partición con histórico de algún crédito vivo queda adjunta, para que la
+    línea de tiempo de ese crédito siga completa.
+
+    Returns:
+        Tupla (archivadas, retenidas) con los nombres de las particiones
+    """
+    if not es_postgres():
+        return [], []
+    esquema = esquema or getattr(settings, 'HISTORIAL_ARCHIVO_SCHEMA', 'archivo')
+    limite = inicio_mes(antes_de)
+
+    archivadas = []
+    retenidas = []
+    with transaction.atomic(), connection.cursor() as cursor:
+        if not esta_particionada(cursor):
+            return [], []
+        cursor.execute(f"CREATE SCHEMA IF NOT EXISTS {_q(esquema)}")
+        # Bloquea inserciones y borrados mientras se revisa cada mes
+        cursor.execute(f"LOCK TABLE {_q(TABLA)} IN SHARE ROW EXCLUSIVE MODE")
+        for nombre, mes in listar_particiones(cursor):
+            if mes >= limite:
+                break
+            if _tiene_creditos_vivos(cursor, nombre):
+                retenidas.append(nombre)
+                continue
+            cursor.execute(f"ALTER TABLE {_q(TABLA)} DETACH PARTITION {_q(nombre)}")
+            cursor.execute(f"ALTER TABLE {_q(nombre)} SET SCHEMA {_q(esquema)}")
+            archivadas.append(nombre)
+    return archivadas, retenidas
+
+
+def _definiciones_legacy(cursor):
+    """Índices (no únicos) y claves foráneas de la tabla original, para recrearlos"""
+    cursor.execute(
+        "SELECT i.relname, pg_get_indexdef(ix.indexrelid) FROM pg_index ix "
+        "JOIN pg_class i ON i.oid = ix.indexrelid "
+        "WHERE ix.indrelid = %s::regclass AND NOT ix.indisunique",
+        [_q(TABLA_LEGACY)],
+    )
+    indices = cursor.fetchall()
+    cursor.execute(
+        "SELECT conname, pg_get_constraintdef(oid) FROM pg_constraint "
+        "WHERE conrelid = %s::regclass AND contype = 'f'",
+        [_q(TABLA_LEGACY)],
+    )
+    foraneas = cursor.fetchall()
+    return indices, foraneas
+
+
+def _recrear_definiciones(cursor, indices, foraneas):
+    for _, definicion in indices:
+        # Los índices de una tabla particionada se informan como "ON ONLY tabla"
+        cursor.execute(definicion.replace(' ON ONLY ', ' ON ').replace(_q(TABLA_LEGACY), _q(TABLA)))
+    for nombre, definicion in foraneas:
+        cursor.execute(f"ALTER TABLE {_q(TABLA)} ADD CONSTRAINT {_q(nombre)} {definicion}")
+
+
+def convertir_a_particionada(conexion=None):
+    """
+    Convierte la tabla existente en una tabla particionada por mes de fecha_cambio
+
+    Crea las particiones de todos los meses con datos más los próximos meses y
+    una partición por defecto, copia las filas y recrea índices y claves
+    foráneas con sus nombres originales. La clave primaria pasa a ser
+    (id, fecha_cambio), como exige PostgreSQL; id sigue siendo único por secuencia.
+
+    Todo corre en una transacción con la tabla bloqueada: las escrituras al
+    histórico esperan hasta que termina la copia.
+
+    Returns:
+        True si convirtió la tabla, False si ya estaba particionada
+    """
+    conexion = conexion or connection
+    with transaction.atomic(using=conexion.alias), conexion.cursor() as cursor:
+        if esta_particionada(cursor):
+            return False
+
+        # Las FK de Django son diferidas: con verificaciones pendientes no se puede borrar la tabla
+        cursor.execute("SET CONSTRAINTS ALL IMMEDIATE")
+        cursor.execute(f"LOCK TABLE {_q(TABLA)} IN ACCESS EXCLUSIVE MODE")
+
+        cursor.execute(f"ALTER TABLE {_q(TABLA)} RENAME TO {_q(TABLA_LEGACY)}")
+        indices, foraneas = _definiciones_legacy(cursor)
+
+        cursor.execute(
+            f"CREATE TABLE {_q(TABLA)} (LIKE {_q(TABLA_LEGACY)} INCLUDING DEFAULTS) "
+            f"PARTITION BY RANGE (fecha_cambio)"
+        )
+        cursor.execute(f"CREATE TABLE {_q(TABLA_DEFAULT)} PARTITION OF {_q(TABLA)} DEFAULT")
+
+        cursor.execute(f"SELECT MIN(fecha_cambio) FROM {_q(TABLA_LEGACY)}")
+        primera = cursor.fetchone()[0]
+        actual = inicio_mes(datetime.date.today())
+        mes = inicio_mes(primera.date()) if primera else actual
+        ultimo = sumar_meses(actual, getattr(settings, 'HISTORIAL_PARTICIONES_MESES_ADELANTE', 3))
+        while mes <= ultimo:
+            _crear_particion(cursor, mes)
+            mes = sumar_meses(mes, 1)
+
+        cursor.execute(f"INSERT INTO {_q(TABLA)} SELECT * FROM {_q(TABLA_LEGACY)}")
+
+        # id deja de ser identity: se alimenta de una secuencia propia
+        cursor.execute(f"CREATE SEQUENCE {_q(SECUENCIA)}")
+        cursor.execute(
+            f"SELECT setval(%s, COALESCE((SELECT MAX(id) FROM {_q(TABLA)}), 0) + 1, false)",
+            [_q(SECUENCIA)],
+        )
+        cursor.execute(f"ALTER TABLE {_q(TABLA)} ALTER COLUMN id SET DEFAULT nextval(%s::regclass)", [_q(SECUENCIA)])
+        cursor.execute(f"ALTER SEQUENCE {_q(SECUENCIA)} OWNED BY {_q(TABLA)}.id")
+
+        # Borrar la tabla original antes de recrear PK e índices con los mismos nombres
+        cursor.execute(f"DROP TABLE {_q(TABLA_LEGACY)}")
+        cursor.execute(f"ALTER TABLE {_q(TABLA)} ADD PRIMARY KEY (id, fecha_cambio)")
+        _recrear_definiciones(cursor, indices, foraneas)
+    return True
+
+
+def convertir_a_tabla_simple(conexion=None):
+    """
+    Revierte convertir_a_particionada: vuelve a una tabla simple con PK en id
+
+    Las particiones ya archivadas (en el esquema de archivo) no se tocan.
+
+    Returns:
+        True si convirtió la tabla, False si no estaba particionada
+    """
+    conexion = conexion or connection
+    with transaction.atomic(using=conexion.alias), conexion.cursor() as cursor:
+        if not esta_particionada(cursor):
+            return False
+
+        # Las FK de Django son diferidas: con verificaciones pendientes no se puede borrar la tabla
+        cursor.execute("SET CONSTRAINTS ALL IMMEDIATE")
+        cursor.execute(f"LOCK TABLE {_q(TABLA)} IN ACCESS EXCLUSIVE MODE")
+
+        cursor.execute(f"ALTER TABLE {_q(TABLA)} RENAME TO {_q(TABLA_LEGACY)}")
+        indices, foraneas = _definiciones_legacy(cursor)
+
+        cursor.execute(f"CREATE TABLE {_q(TABLA)} (LIKE {_q(TABLA_LEGACY)} INCLUDING DEFAULTS)")
+        cursor.execute(f"INSERT INTO {_q(TABLA)} SELECT * FROM {_q(TABLA_LEGACY)}")
+        cursor.execute(f"ALTER TABLE {_q(TABLA)} ALTER COLUMN id DROP DEFAULT")
+
+        # Borra también las particiones y la secuencia propia
+        cursor.execute(f"DROP TABLE {_q(TABLA_LEGACY)}")
+        cursor.execute(f"ALTER TABLE {_q(TABLA)} ADD PRIMARY KEY (id)")
+        cursor.execute(f"ALTER TABLE {_q(TABLA)} ALTER COLUMN id ADD GENERATED BY DEFAULT AS IDENTITY")
+        cursor.execute(
+            f"SELECT setval(pg_get_serial_sequence(%s, 'id'), COALESCE((SELECT MAX(id) FROM {_q(TABLA)}), 0) + 1, false)",
+            [_q(TABLA)],
+        )
+        _recrear_definiciones(cursor, indices, foraneas)
+    return True
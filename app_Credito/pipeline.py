@@ -0,0 +1,121 @@
+"""
+Contadores de créditos por empresa, fase_actual y enum_estado
+
+Se ajustan en la misma transacción que el cambio que los mueve:
+- cambios de fase: cambiar_fase y cambiar_fase_lote, junto a su UPDATE
+- alta y baja de Credito: señales en app_Credito/signals.py
+- cambios de enum_estado por la API: CreditoViewSet.perform_update
+Un save() que cambie enum_estado por otro camino (admin, shell) no los ajusta:
+reconciliar_contadores recalcula los totales desde Credito y corrige desvíos.
+"""
+from collections import Counter
+
+from django.db import transaction
+from django.db.models import Count, F
+
+from .models import Credito, ContadorPipeline
+
+
+def ajustar_contadores(deltas):
+    """
+    Aplica variaciones a los contadores
+
+    Args:
+        deltas: Dict o Counter {(empresa_id, fase_actual, enum_estado): variación}
+    """
+    # Orden fijo de claves para que transacciones concurrentes no se bloqueen en cruz
+    for (empresa_id, fase, estado), delta in sorted(deltas.items()):
+        if not delta:
+            continue
+        filtro = {'empresa_id': empresa_id, 'fase_actual': fase, 'enum_estado': estado}
+        if ContadorPipeline.objects.filter(**filtro).update(total=F('total') + delta):
+            continue
+        ContadorPipeline.objects.bulk_create([ContadorPipeline(**filtro, total=0)], ignore_conflicts=True)
+        ContadorPipeline.objects.filter(**filtro).update(total=F('total') + delta)
+
+
+def registrar_cambio(empresa_id, anterior, nuevo, deltas=None):
+    """
+    Suma a `deltas` el paso de un crédito de `anterior` a `nuevo` (tuplas (fase, estado))
+
+    Returns:
+        El Counter de deltas
+    """
+    deltas = Counter() if deltas is None else deltas
+    if anterior != nuevo:
+        if anterior is not None:
+            deltas[(empresa_id, *anterior)] -= 1
+        if nuevo is not None:
+            deltas[(empresa_id, *nuevo)] += 1
+    return deltas
+
+
+def obtener_pipeline(empresa_id):
+    """Totales de la empresa por fase, por estado y por combinación fase/estado"""
+    detalle = list(
+        ContadorPipeline.objects.filter(empresa_id=empresa_id, total__gt=0)
+        .order_by('fase_actual', 'enum_estado')
+        .values('fase_actual', 'enum_estado', 'total')
+    )
+    por_fase = Counter()
+    por_estado = Counter()
+    for fila in detalle:
+        por_fase[fila['fase_actual']] += fila['total']
+        por_estado[fila['enum_estado']] += fila['total']
+    return {
+        'total': sum(por_fase.values()),
+        'por_fase': dict(sorted(por_fase.items())),
+        'por_estado': dict(sorted(por_estado.items())),
+        'detalle': detalle,
+    }
+
+
+def reconciliar_contadores(empresa_id=None):
+    """
+    Recalcula los contadores desde Credito y corrige los que se desviaron
+
+    Bloquea los contadores de la(s) empresa(s) mientras cuenta, para que los
+    cambios concurrentes esperen en lugar de perderse.
+
+    Returns:
+        Lista de dict {empresa_id, fase_actual, enum_estado, antes, despues} corregidos
+    """
+    creditos = Credito.objects.all()
+    contadores = ContadorPipeline.objects.all()
+    if empresa_id is not None:
+        creditos = creditos.filter(empresa_id=empresa_id)
+        contadores = contadores.filter(empresa_id=empresa_id)
+
+    correcciones = []
+    with transaction.atomic():
+        actuales = {
+            (c.empresa_id, c.fase_actual, c.enum_estado): c
+            for c in contadores.select_for_update().order_by('empresa_id', 'fase_actual', 'enum_estado')
+        }
+        reales = {
+            (fila['empresa_id'], fila['fase_actual'], fila['enum_estado']): fila['total']
+            for fila in creditos.values('empresa_id', 'fase_actual', 'enum_estado').annotate(total=Count('id')).order_by()
+        }
+
+        nuevos = []
+        modificados = []
+        for clave in sorted(set(actuales) | set(reales)):
+            real = reales.get(clave, 0)
+            contador = actuales.get(clave)
+            antes = contador.total if contador else 0
+            if antes == real:
+                continue
+            if contador is None:
+                nuevos.append(ContadorPipeline(empresa_id=clave[0], fase_actual=clave[1], enum_estado=clave[2], total=real))
+            else:
+                contador.total = real
+                modificados.append(contador)
+            correcciones.append({
+                'empresa_id': clave[0], 'fase_actual': clave[1], 'enum_estado': clave[2],
+                'antes': antes, 'despues': real,
+            })
+
+        ContadorPipeline.objects.bulk_create(nuevos, batch_size=500)
+        ContadorPipeline.objects.bulk_update(modificados, ['total'], batch_size=500)
+
+    return correcciones
@@ -0,0 +1,175 @@
+"""
+Puntaje de capacidad de pago de las solicitudes de crédito
+
+Para cada crédito calcula, a partir de Trabajo.salario del cliente:
+- carga_cuota: Monto_Cuota / salario
+- deuda_ingreso: (Monto_Cuota + cuotas de los otros créditos activos del cliente) / salario
+- exposicion: Monto_Pagar de los créditos activos del cliente
+y un puntaje de 0 a 100 que baja linealmente con deuda_ingreso. El resultado
+se guarda en RiesgoCredito.
+
+Se recalcula en lote para FASE_6_REVISION (comando calcular_riesgo) y de forma
+incremental por cliente en el consumidor del outbox: al cambiar de fase y al
+guardar o borrar Trabajo o Credito (las señales publican EVENTO_RIESGO_CLIENTE).
+"""
+from collections import defaultdict
+from decimal import Decimal
+
+from django.conf import settings
+from django.db.models import Sum
+
+from app_Cliente.models import Trabajo
+from .models import Credito, RiesgoCredito
+from .outbox import registrar_handler, EVENTO_FASE_CAMBIADA, EVENTO_RIESGO_CLIENTE
+
+
+FASE_REVISION = 'FASE_6_REVISION'
+
+# Estados que generan cuotas para el cliente (los mismos que la cartera vigente)
+ESTADOS_ACTIVOS = ('Aprobado', 'DESENBOLSADO')
+
+CAMPOS_RIESGO = [
+    'empresa', 'salario', 'cuota', 'cuotas_vigentes', 'exposicion',
+    'carga_cuota', 'deuda_ingreso', 'puntaje', 'categoria', 'fecha_calculo',
+]
+
+CUATRO_DECIMALES = Decimal('0.0001')
+DOS_DECIMALES = Decimal('0.01')
+
+
+def puntuar(salario, cuota, cuotas_vigentes):
+    """
+    Calcula carga_cuota, deuda_ingreso, puntaje y categoría
+
+    Sin salario (o salario <= 0) no hay base de comparación: categoría SIN_DATOS.
+    Las categorías usan RIESGO_DTI_BAJO / RIESGO_DTI_ALTO y el puntaje llega a 0
+    en RIESGO_DTI_MAXIMO.
+    """
+    if not salario or salario <= 0:
+        return {'carga_cuota': None, 'deuda_ingreso': None, 'puntaje': None, 'categoria': 'SIN_DATOS'}
+
+    bajo = Decimal(str(getattr(settings, 'RIESGO_DTI_BAJO', 0.30)))
+    alto = Decimal(str(getattr(settings, 'RIESGO_DTI_ALTO', 0.45)))
+    maximo = Decimal(str(getattr(settings, 'RIESGO_DTI_MAXIMO', 0.60)))
+
+    carga_cuota = cuota / salario
+    deuda_ingreso = (cuota + cuotas_vigentes) / salario
+    puntaje = max(Decimal('0'), 1 - deuda_ingreso / maximo) * 100
+
+    if deuda_ingreso <= bajo:
+        categoria = 'BAJO'
+    elif deuda_ingreso <= alto:
+        categoria = 'MEDIO'
+    else:
+        categoria = 'ALTO'
+
+    return {
+        # Topes para que ratios absurdos (salarios mínimos cargados a mano) entren en la columna
+        'carga_cuota': min(carga_cuota, Decimal('9999')).quantize(CUATRO_DECIMALES),
+        'deuda_ingreso': min(deuda_ingreso, Decimal('9999')).quantize(CUATRO_DECIMALES),
+        'puntaje': puntaje.quantize(DOS_DECIMALES),
+        'categoria': categoria,
+    }
+
+
+def _calcular_lote(filas):
+    """Arma y guarda (upsert) los RiesgoCredito de un lote de créditos"""
+    clientes = {fila['cliente_id'] for fila in filas}
+    salarios = dict(
+        Trabajo.objects.filter(id_cliente_id__in=clientes).values_list('id_cliente_id', 'salario')
+    )
+
+    # Cuotas y exposición de los créditos activos de cada cliente, en una sola consulta
+    activos = defaultdict(lambda: (Decimal('0'), Decimal('0')))
+    totales = (
+        Credito.objects.filter(cliente_id__in=clientes, enum_estado__in=ESTADOS_ACTIVOS)
+        .values('cliente_id')
+        .annotate(cuotas=Sum('Monto_Cuota'), pagar=Sum('Monto_Pagar'))
+        .order_by()
+    )
+    for total in totales:
+        activos[total['cliente_id']] = (total['cuotas'], total['pagar'])
+
+    riesgos = []
+    for fila in filas:
+        cuotas, exposicion = activos[fila['cliente_id']]
+        # La cuota del propio crédito no cuenta como deuda existente
+        if fila['enum_estado'] in ESTADOS_ACTIVOS:
+            cuotas -= fila['Monto_Cuota']
+        salario = salarios.get(fila['cliente_id'])
+        riesgos.append(RiesgoCredito(
+            credito_id=fila['id'],
+            empresa_id=fila['empresa_id'],
+            salario=salario,
+            cuota=fila['Monto_Cuota'],
+            cuotas_vigentes=cuotas,
+            exposicion=exposicion,
+            **puntuar(salario, fila['Monto_Cuota'], cuotas),
+        ))
+
+    RiesgoCredito.objects.bulk_create(
+        riesgos, update_conflicts=True, unique_fields=['credito'], update_fields=CAMPOS_RIESGO,
+    )
+    return len(riesgos)
+
+
+def calcular_riesgo(creditos, lote=500):
+    """
+    Recalcula y guarda el riesgo de los créditos del queryset, por lotes de id
+
+    Returns:
+        Cantidad de créditos puntuados
+    """
+    creditos = creditos.order_by('id').values('id', 'empresa_id', 'cliente_id', 'Monto_Cuota', 'enum_estado')
+    calculados = 0
+    ultimo = 0
+    while True:
+        filas = list(creditos.filter(id__gt=ultimo)[:lote])
+        if not filas:
+            break
+        calculados += _calcular_lote(filas)
+        ultimo = filas[-1]['id']
+    return calculados
+
+
+def recalcular_revision(empresa_id=None, lote=500):
+    """Recalcula todos los créditos en FASE_6_REVISION (de una empresa o de todas)"""
+    creditos = Credito.objects.filter(fase_actual=FASE_REVISION)
+    if empresa_id is not None:
+        creditos = creditos.filter(empresa_id=empresa_id)
+    return calcular_riesgo(creditos, lote=lote)
+
+
+def recalcular_clientes(cliente_ids):
+    """
+    Recalcula los créditos en revisión de los clientes indicados
+
+    Un cambio en el salario o en cualquier crédito de un cliente altera el
+    riesgo de todas sus solicitudes en revisión, no solo la del crédito tocado.
+    """
+    cliente_ids = {cliente_id for cliente_id in cliente_ids if cliente_id is not None}
+    if not cliente_ids:
+        return 0
+    return calcular_riesgo(Credito.objects.filter(fase_actual=FASE_REVISION, cliente_id__in=cliente_ids))
+
+
+@registrar_handler(EVENTO_FASE_CAMBIADA)
+def recalcular_eventos(eventos):
+    """Handler del outbox: los cambios de fase no disparan señales de Credito"""
+    ids = {evento.id_credito for evento in eventos}
+    recalcular_clientes(Credito.objects.filter(id__in=ids).values_list('cliente_id', flat=True))
+
+
+@registrar_handler(EVENTO_RIESGO_CLIENTE)
+def recalcular_eventos_cliente(eventos):
+    """Handler del outbox: un solo recálculo por cliente aunque el lote traiga varios cambios suyos"""
+    recalcular_clientes({evento.payload.get('cliente_id') for evento in eventos})
+
+
+def obtener_riesgo(credito):
+    """RiesgoCredito del crédito, calculándolo si todavía no existe"""
+    riesgo = RiesgoCredito.objects.filter(credito_id=credito.pk).first()
+    if riesgo is None:
+        calcular_riesgo(Credito.objects.filter(pk=credito.pk))
+        riesgo = RiesgoCredito.objects.get(credito_id=credito.pk)
+    return riesgo
@@ -1,14 +1,37 @@
 from rest_framework.serializers import ModelSerializer
-from .models import Credito, Tipo_Credito, HistoricoCredito
+from .models import Credito, Tipo_Credito, HistoricoCredito, RiesgoCredito
 
 
-class CreditoSerializer(ModelSerializer):
+class CamposDinamicosMixin:
+    """
+    Limita los campos del serializer a los recibidos en context['fields']
+    (lista de nombres, p. ej. a partir de ?fields=id,Monto_Solicitado)
+    """
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        campos = self.context.get('fields')
+        if campos:
+            for nombre in set(self.fields) - set(campos):
+                self.fields.pop(nombre)
+
+
+class CreditoSerializer(CamposDinamicosMixin, ModelSerializer):
     class Meta:
         model = Credito
         fields = '__all__'
         read_only_fields = ('empresa', 'usuario', 'fecha_creacion', 'fecha_actualizacion', 'fase_actual')
 
 
+class CreditoListSerializer(CamposDinamicosMixin, ModelSerializer):
+    """Representación liviana para el listado de créditos"""
+    class Meta:
+        model = Credito
+        fields = (
+            'id', 'cliente', 'tipo_credito', 'Monto_Solicitado', 'Moneda',
+            'enum_estado', 'fase_actual', 'fecha_creacion',
+        )
+
+
 class TipoCreditoSerializer(ModelSerializer):
     class Meta:
         model = Tipo_Credito
@@ -63,3 +86,10 @@ class RevisarCreditoSerializer(ModelSerializer):
     class Meta:
         model = Credito
         fields = ('razon_rechazo',)
+
+
+class RiesgoCreditoSerializer(ModelSerializer):
+    """Puntaje de capacidad de pago precalculado (ver app_Credito/riesgo.py)"""
+    class Meta:
+        model = RiesgoCredito
+        exclude = ('id', 'empresa')
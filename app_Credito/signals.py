@@ -0,0 +1,74 @@
+"""
+Señales que ajustan los contadores del pipeline con el alta y la baja de
+Credito, en la misma transacción (ver app_Credito/pipeline.py), y publican en el
+outbox el pedido de recalcular el riesgo del cliente al guardar o borrar Credito
+o Trabajo (ver app_Credito/riesgo.py).
+
+Dentro de archivando() no hacen nada: archivar_creditos ajusta los contadores
+una vez por lote, y los créditos archivados (finalizados) no cuentan en el
+riesgo de sus clientes.
+"""
+from contextlib import contextmanager
+from contextvars import ContextVar
+
+from django.db.models.signals import post_save, post_delete
+from django.dispatch import receiver
+
+from app_Cliente.models import Trabajo
+from app_Empresa.models import Empresa
+from .models import Credito
+from .outbox import evento_riesgo
+from .pipeline import ajustar_contadores, registrar_cambio
+
+
+_archivando = ContextVar('archivando_creditos', default=False)
+
+
+@contextmanager
+def archivando():
+    """Desactiva las señales de Credito mientras se borran los créditos archivados"""
+    marca = _archivando.set(True)
+    try:
+        yield
+    finally:
+        _archivando.reset(marca)
+
+
+def _borrando_empresa(origin):
+    """Al borrar la empresa se borran también sus contadores y sus eventos: no hay nada que ajustar ni publicar"""
+    return isinstance(origin, Empresa) or getattr(origin, 'model', None) is Empresa
+
+
+@receiver(post_save, sender=Credito)
+def contar_alta(sender, instance, created, **kwargs):
+    """Suma el alta; los cambios de fase y estado ajustan los contadores donde ocurren (ver pipeline.py)"""
+    if created:
+        ajustar_contadores(registrar_cambio(
+            instance.empresa_id, None, (instance.fase_actual, instance.enum_estado),
+        ))
+
+
+@receiver(post_delete, sender=Credito)
+def contar_baja(sender, instance, origin=None, **kwargs):
+    if _archivando.get() or _borrando_empresa(origin):
+        return
+    ajustar_contadores(registrar_cambio(
+        instance.empresa_id, (instance.fase_actual, instance.enum_estado), None,
+    ))
+
+
+@receiver(post_save, sender=Credito)
+@receiver(post_delete, sender=Credito)
+@receiver(post_save, sender=Trabajo)
+@receiver(post_delete, sender=Trabajo)
+def recalcular_riesgo_cliente(sender, instance, origin=None, **kwargs):
+    """Pide el recálculo en la misma transacción; el consumidor lo agrupa por cliente"""
+    if _archivando.get() or _borrando_empresa(origin):
+        return
+    if sender is Credito:
+        evento = evento_riesgo(instance.cliente_id, instance.empresa_id, instance.pk)
+    elif instance.id_cliente_id is not None:
+        evento = evento_riesgo(instance.id_cliente_id, instance.empresa_rel_id)
+    else:
+        return
+    evento.save()
@@ -0,0 +1,322 @@
+"""
+Simulación de estrés de la cartera de créditos
+
+- simular_escenario: valores esperados de un escenario (shock de tasa + tasa de mora)
+- simular_montecarlo: distribución del resultado de la cartera con moras aleatorias
+  y shocks de tasa por simulación, repartida en el pool de procesos compartido
+  del worker si la cartera es grande
+
+créditos x simulaciones está acotado por SIMULACION_MAX_PRODUCTO, así que una
+petición no puede ocupar el pool más allá de ese trabajo.
+
+Trabaja sobre las columnas de amortizacion.columnas_cartera (float) con fórmulas
+cerradas del saldo y del interés acumulado, sin armar tablas de cuotas.
+"""
+import hashlib
+import json
+import math
+import random
+import threading
+from concurrent.futures import ProcessPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+
+from django.conf import settings
+from django.db.models import Count, Max
+from rest_framework.exceptions import ValidationError
+
+from app_User.cache import LRUCache
+from .amortizacion import validar_sistema, cuota_francesa, columnas_cartera, CAMPOS_CARTERA
+
+
+SIMULACIONES_MAX = 20000
+
+# Percentiles informados del resultado neto
+PERCENTILES = (5, 25, 50, 75, 95)
+
+# Corridas ya calculadas, por empresa + parámetros + versión de la cartera
+simulacion_cache = LRUCache(
+    'simulacion_cartera',
+    maxsize=getattr(settings, 'SIMULACION_CACHE_MAXSIZE', 256),
+    timeout=getattr(settings, 'SIMULACION_CACHE_TIMEOUT', 900),
+    use_django_cache=getattr(settings, 'SIMULACION_CACHE_USE_DJANGO_CACHE', False),
+)
+
+
+# Pool de procesos del worker, compartido por todas las peticiones
+_pool = None
+_pool_lock = threading.Lock()
+
+
+def validar_parametros(shock_tasa=0.0, tasa_default=0.0, recuperacion=0.0, volatilidad_tasa=0.0,
+                       simulaciones=1000):
+    for nombre, valor in (('shock_tasa', shock_tasa), ('tasa_default', tasa_default),
+                          ('recuperacion', recuperacion), ('volatilidad_tasa', volatilidad_tasa)):
+        if not math.isfinite(valor):
+            raise ValidationError(f"{nombre} debe ser un número finito")
+    if not 0 <= tasa_default <= 1:
+        raise ValidationError("tasa_default debe estar entre 0 y 1")
+    if not 0 <= recuperacion <= 1:
+        raise ValidationError("recuperacion debe estar entre 0 y 1")
+    if volatilidad_tasa < 0:
+        raise ValidationError("volatilidad_tasa no puede ser negativa")
+    if not 1 <= simulaciones <= SIMULACIONES_MAX:
+        raise ValidationError(f"simulaciones debe estar entre 1 y {SIMULACIONES_MAX}")
+    if shock_tasa < -100:
+        raise ValidationError("shock_tasa no puede dejar tasas menores a -100%")
+
+
+def validar_tamano(creditos, simulaciones):
+    """Rechaza las corridas con créditos x simulaciones mayor a SIMULACION_MAX_PRODUCTO"""
+    maximo = getattr(settings, 'SIMULACION_MAX_PRODUCTO', 20_000_000)
+    if creditos * simulaciones > maximo:
+        raise ValidationError(
+            f"La cartera tiene {creditos} créditos: simulaciones no puede superar {max(maximo // max(creditos, 1), 1)}"
+        )
+
+
+def obtener_pool():
+    """Pool de procesos compartido; se crea la primera vez que se necesita"""
+    global _pool
+    with _pool_lock:
+        if _pool is None:
+            _pool = ProcessPoolExecutor(max_workers=getattr(settings, 'SIMULACION_MAX_WORKERS', 4))
+        return _pool
+
+
+def _descartar_pool(pool):
+    """Quita el pool roto (un proceso murió) para que la próxima corrida cree otro"""
+    global _pool
+    with _pool_lock:
+        if _pool is pool:
+            _pool = None
+    pool.shutdown(wait=False, cancel_futures=True)
+
+
+def riesgo_mensual(tasa_default):
+    """Probabilidad mensual de mora equivalente a una probabilidad anual"""
+    return 1 - (1 - tasa_default) ** (1 / 12)
+
+
+def _tasas_con_shock(tasas, shock_tasa):
+    """Aplica un shock en puntos porcentuales anuales a tasas mensuales (sin bajar de 0)"""
+    delta = shock_tasa / 100 / 12
+    return [max(r + delta, 0.0) for r in tasas]
+
+
+def _saldo_e_interes(monto, r, n, k, sistema, cuota):
+    """Saldo tras k cuotas e interés cobrado en esas k cuotas"""
+    if sistema == 'frances':
+        if r == 0:
+            saldo = monto * (1 - k / n)
+        else:
+            factor_n = (1 + r) ** n
+            saldo = monto * (factor_n - (1 + r) ** k) / (factor_n - 1)
+        return saldo, cuota * k - (monto - saldo)
+    # Alemán: capital fijo, interés sobre saldo que baja linealmente
+    return monto * (1 - k / n), monto * r * (k - k * (k - 1) / (2 * n))
+
+
+def simular_escenario(columnas, shock_tasa=0.0, tasa_default=0.0, recuperacion=0.0, sistema='frances'):
+    """
+    Valores esperados de la cartera bajo un escenario determinístico
+
+    Args:
+        columnas: Tupla (montos, tasas_mensuales, plazos, ...) de columnas_cartera
+        shock_tasa: Puntos porcentuales sumados a la tasa anual de cada crédito
+        tasa_default: Probabilidad anual de mora de cada crédito
+        recuperacion: Fracción del saldo recuperada cuando hay mora
+        sistema: 'frances' o 'aleman'
+
+    Returns:
+        Dict con interés esperado, pérdida esperada y resultado neto
+    """
+    validar_sistema(sistema)
+    validar_parametros(shock_tasa, tasa_default, recuperacion)
+    montos, tasas, plazos = columnas[0], _tasas_con_shock(columnas[1], shock_tasa), columnas[2]
+    h = riesgo_mensual(tasa_default)
+
+    interes_esperado = 0.0
+    perdida_esperada = 0.0
+    for monto, r, n in zip(montos, tasas, plazos):
+        cuota = cuota_francesa(monto, r, n)
+        supervivencia = 1.0
+        saldo = monto
+        for k in range(1, n + 1):
+            # Mora en el período k: se pierde el saldo pendiente antes de la cuota
+            perdida_esperada += supervivencia * h * saldo * (1 - recuperacion)
+            supervivencia *= 1 - h
+            saldo_k, _ = _saldo_e_interes(monto, r, n, k, sistema, cuota)
+            interes_esperado += supervivencia * (saldo * r)
+            saldo = saldo_k
+
+    return {
+        'sistema': sistema,
+        'shock_tasa': shock_tasa,
+        'tasa_default': tasa_default,
+        'recuperacion': recuperacion,
+        'total_creditos': len(montos),
+        'total_capital': round(sum(montos), 2),
+        'interes_esperado': round(interes_esperado, 2),
+        'perdida_esperada': round(perdida_esperada, 2),
+        'resultado_esperado': round(interes_esperado - perdida_esperada, 2),
+    }
+
+
+def _simular_bloque(montos, tasas, plazos, sistema, shock_tasa, volatilidad_tasa, h, recuperacion,
+                    simulaciones, semilla):
+    """Corre un bloque de simulaciones; se ejecuta en un proceso del pool"""
+    rng = random.Random(semilla)
+    log_supervivencia = math.log(1 - h) if 0 < h < 1 else None
+    resultados = []
+
+    for _ in range(simulaciones):
+        shock = rng.gauss(shock_tasa, volatilidad_tasa) if volatilidad_tasa else shock_tasa
+        delta = shock / 100 / 12
+        interes = 0.0
+        perdida = 0.0
+        moras = 0
+        for monto, r, n in zip(montos, tasas, plazos):
+            r = max(r + delta, 0.0)
+            cuota = cuota_francesa(monto, r, n) if sistema == 'frances' else 0.0
+            # Mes de mora con distribución geométrica (n + 1 = sin mora)
+            if log_supervivencia is None:
+                mes_mora = 1 if h >= 1 else n + 1
+            else:
+                mes_mora = int(math.log(1 - rng.random()) / log_supervivencia) + 1
+            if mes_mora > n:
+                _, interes_credito = _saldo_e_interes(monto, r, n, n, sistema, cuota)
+                interes += interes_credito
+                continue
+            saldo, interes_credito = _saldo_e_interes(monto, r, n, mes_mora - 1, sistema, cuota)
+            interes += interes_credito
+            perdida += saldo * (1 - recuperacion)
+            moras += 1
+        resultados.append((interes, perdida, moras))
+
+    return resultados
+
+
+def _percentil(valores_ordenados, p):
+    if not valores_ordenados:
+        return 0.0
+    indice = (len(valores_ordenados) - 1) * p / 100
+    inferior = math.floor(indice)
+    superior = math.ceil(indice)
+    fraccion = indice - inferior
+    return valores_ordenados[inferior] * (1 - fraccion) + valores_ordenados[superior] * fraccion
+
+
+def simular_montecarlo(columnas, shock_tasa=0.0, volatilidad_tasa=0.0, tasa_default=0.0, recuperacion=0.0,
+                       simulaciones=1000, semilla=None, sistema='frances'):
+    """
+    Simulación Monte Carlo del resultado de la cartera
+
+    En cada simulación se sortea un shock de tasa N(shock_tasa, volatilidad_tasa)
+    común a toda la cartera y un mes de mora por crédito. Si créditos x
+    simulaciones supera SIMULACION_UMBRAL_POOL, las simulaciones se reparten en
+    SIMULACION_MAX_WORKERS bloques en el pool compartido: las peticiones
+    simultáneas hacen cola en él en lugar de lanzar cada una sus procesos. Con
+    la misma semilla y el mismo número de bloques el resultado es reproducible.
+
+    Raises:
+        ValidationError si los parámetros son inválidos o créditos x
+        simulaciones supera SIMULACION_MAX_PRODUCTO
+
+    Returns:
+        Dict con media y percentiles de interés, pérdida y resultado neto
+    """
+    validar_sistema(sistema)
+    validar_parametros(shock_tasa, tasa_default, recuperacion, volatilidad_tasa, simulaciones)
+    montos, tasas, plazos = columnas[0], columnas[1], columnas[2]
+    validar_tamano(len(montos), simulaciones)
+    h = riesgo_mensual(tasa_default)
+    semilla = random.randrange(2 ** 32) if semilla is None else semilla
+
+    workers = getattr(settings, 'SIMULACION_MAX_WORKERS', 4)
+    umbral = getattr(settings, 'SIMULACION_UMBRAL_POOL', 2_000_000)
+    bloques = workers if workers > 1 and len(montos) * simulaciones >= umbral else 1
+    tamanos = [simulaciones // bloques + (1 if i < simulaciones % bloques else 0) for i in range(bloques)]
+    argumentos = [
+        (montos, tasas, plazos, sistema, shock_tasa, volatilidad_tasa, h, recuperacion, tamano, semilla + i)
+        for i, tamano in enumerate(tamanos) if tamano
+    ]
+
+    if len(argumentos) > 1:
+        pool = obtener_pool()
+        try:
+            partes = list(pool.map(_simular_bloque, *zip(*argumentos)))
+        except BrokenProcessPool:
+            _descartar_pool(pool)
+            raise
+    else:
+        partes = [_simular_bloque(*argumentos[0])]
+    resultados = [r for parte in partes for r in parte]
+
+    intereses = sorted(r[0] for r in resultados)
+    perdidas = sorted(r[1] for r in resultados)
+    netos = sorted(r[0] - r[1] for r in resultados)
+
+    def resumen(valores):
+        return {
+            'media': round(sum(valores) / len(valores), 2),
+            **{f'p{p}': round(_percentil(valores, p), 2) for p in PERCENTILES},
+        }
+
+    return {
+        'sistema': sistema,
+        'shock_tasa': shock_tasa,
+        'volatilidad_tasa': volatilidad_tasa,
+        'tasa_default': tasa_default,
+        'recuperacion': recuperacion,
+        'simulaciones': simulaciones,
+        'semilla': semilla,
+        'procesos': len(argumentos),
+        'total_creditos': len(montos),
+        'total_capital': round(sum(montos), 2),
+        'moras_promedio': round(sum(r[2] for r in resultados) / len(resultados), 2),
+        'interes': resumen(intereses),
+        'perdida': resumen(perdidas),
+        'resultado_neto': resumen(netos),
+    }
+
+
+def simular_cartera(queryset, empresa_id, modo='escenario', **parametros):
+    """
+    Corre un escenario o una simulación Monte Carlo sobre los créditos del
+    queryset, reutilizando la corrida cacheada si la empresa, los parámetros y
+    la cartera (cantidad y última fecha_actualizacion) no cambiaron.
+
+    Args:
+        queryset: Créditos de la cartera (ya filtrados por empresa y estado)
+        empresa_id: ID de la empresa, parte de la clave del caché
+        modo: 'escenario' o 'montecarlo'
+        parametros: Argumentos de simular_escenario / simular_montecarlo
+
+    Returns:
+        Dict con el resultado y 'cacheado' indicando si se reutilizó
+    """
+    if modo not in ('escenario', 'montecarlo'):
+        raise ValidationError("modo debe ser 'escenario' o 'montecarlo'")
+
+    version = queryset.aggregate(total=Count('id'), ultima=Max('fecha_actualizacion'))
+    if modo == 'montecarlo':
+        # Antes de leer la cartera: el tamaño ya se conoce por el conteo
+        validar_tamano(version['total'], parametros.get('simulaciones', 1000))
+    clave = hashlib.sha1(json.dumps(
+        [empresa_id, modo, sorted(parametros.items()), version['total'], str(version['ultima'])],
+        default=str,
+    ).encode()).hexdigest()
+
+    encontrado, resultado = simulacion_cache.get(clave)
+    if encontrado:
+        resultado['cacheado'] = True
+        return resultado
+
+    columnas = columnas_cartera(queryset.values(*CAMPOS_CARTERA).iterator(chunk_size=2000))
+    if modo == 'escenario':
+        resultado = simular_escenario(columnas, **parametros)
+    else:
+        resultado = simular_montecarlo(columnas, **parametros)
+    simulacion_cache.set(clave, resultado)
+    resultado['cacheado'] = False
+    return resultado
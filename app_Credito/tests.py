@@ -1,3 +1,1232 @@
-from django.test import TestCase
+import datetime
+import json
+import threading
+from importlib import import_module
+from decimal import Decimal
+from io import StringIO
+from unittest import skipUnless
 
-# Create your tests here.
+from asgiref.sync import async_to_sync, sync_to_async
+from django.contrib.auth.models import User
+from django.core.cache import cache as django_cache
+from django.core.management import call_command
+from django.db import IntegrityError, connection, transaction
+from django.test import AsyncClient, TestCase, TransactionTestCase, override_settings
+from django.test.utils import CaptureQueriesContext
+from django.utils import timezone
+from rest_framework.authtoken.models import Token
+from rest_framework.exceptions import ValidationError
+from rest_framework.test import APIClient
+
+from app_Cliente.models import Cliente, Documentacion, Domicilio, Garante, Trabajo
+from app_Empresa.models import Empresa
+from app_User.models import Perfiluser
+from app_User.signed_tokens import emitir_token, revocar_token, verificar_token
+from .amortizacion import intereses_totales, proyectar_cartera, tabla_amortizacion
+from .analitica import actualizar_duraciones
+from .archivo import archivar_creditos
+from .cola_revision import reclamar
+from .eventos import CIERRE_CREDENCIALES, usuario_de_token_stream, verificar_token_stream
+from .ganancias import PROCESO_GANANCIAS, recalcular_ganancias
+from .outbox import procesar_lote
+from .pipeline import obtener_pipeline, reconciliar_contadores
+from . import outbox, particiones, simulacion
+from .management.commands.benchmark_indices import cargar_filas, medir
+from .models import (
+    AsignacionRevision, ContadorPipeline, Credito, CreditoArchivado, EventoOutbox, Ganancia_Credito, HistoricoCredito,
+    HistoricoCreditoArchivado, MarcaProceso, RespuestaIdempotente, ResumenDuracionFase, RiesgoCredito, Tipo_Credito,
+)
+from .workflow import ConflictoFase, cambiar_fase, cambiar_fase_lote, obtener_estado_actual
+
+
+# En los tests un LocMemCache hace de caché compartido: cuenta solo las consultas a la base
+CACHE_EN_MEMORIA = {'default': {'BACKEND': 'django.core.cache.backends.locmem.LocMemCache'}}
+
+
+def plan_de_consulta(sql):
+    """Plan de ejecución de una consulta capturada, como texto"""
+    with connection.cursor() as cursor:
+        if connection.vendor == 'postgresql':
+            # Con las pocas filas de un test el planificador prefiere recorrer la tabla
+            cursor.execute('SET LOCAL enable_seqscan = off')
+            cursor.execute(f'EXPLAIN {sql}')
+        else:
+            cursor.execute(f'EXPLAIN QUERY PLAN {sql}')
+        return '\n'.join(str(fila) for fila in cursor.fetchall())
+
+
+class DatosCredito:
+    """Empresa con un analista, un cliente y un tipo de crédito"""
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.empresa = Empresa.objects.create(razon_social='Financiera', email_contacto='f@f.com')
+        cls.usuario = User.objects.create(username='analista')
+        cls.perfil = Perfiluser.objects.create(usuario=cls.usuario, empresa=cls.empresa)
+        cls.cliente = Cliente.objects.create(nombre='Ana', apellido='Rojas', telefono='700', empresa=cls.empresa)
+        cls.tipo = Tipo_Credito.objects.create(
+            nombre='Consumo', descripcion='-', monto_minimo=0, monto_maximo=100000, empresa=cls.empresa,
+        )
+
+    @classmethod
+    def crear_credito(cls, **campos):
+        datos = {
+            'Monto_Solicitado': Decimal('10000'), 'Numero_Cuotas': 12, 'Monto_Cuota': Decimal('900'),
+            'Tasa_Interes': Decimal('12'), 'Monto_Pagar': Decimal('10800'),
+            'empresa': cls.empresa, 'usuario': cls.usuario, 'cliente': cls.cliente, 'tipo_credito': cls.tipo,
+        }
+        datos.update(campos)
+        return Credito.objects.create(**datos)
+
+
+@override_settings(CACHES=CACHE_EN_MEMORIA)
+class EstadoActualTests(DatosCredito, TestCase):
+    def test_agregado_completo_en_una_consulta(self):
+        Documentacion.objects.create(ci='123', id_cliente=self.cliente, empresa=self.empresa)
+        Trabajo.objects.create(cargo='Cajera', empresa='Tienda', salario=Decimal('3000'), id_cliente=self.cliente)
+        domicilio = Domicilio.objects.create(
+            descripcion='Calle 1', es_propietario=True, numero_ref='9', id_cliente=self.cliente,
+        )
+        Garante.objects.create(nombrecompleto='Luis Paz', ci='456', telefono='701', id_domicilio=domicilio)
+        credito = self.crear_credito()
+
+        with self.assertNumQueries(1):
+            estado = obtener_estado_actual(credito)
+        self.assertEqual(estado['documentacion']['ci'], '123')
+        self.assertEqual(estado['laboral']['salario'], '3000.00')
+        self.assertEqual(estado['domicilio']['numero_ref'], '9')
+        self.assertEqual(estado['garante']['ci'], '456')
+
+    def test_cliente_sin_datos_en_una_consulta(self):
+        credito = self.crear_credito()
+        with self.assertNumQueries(1):
+            estado = obtener_estado_actual(credito)
+        self.assertEqual(estado['laboral'], {})
+        self.assertEqual(estado['garante'], {})
+
+
+@override_settings(CACHES=CACHE_EN_MEMORIA)
+class LineaTiempoTests(DatosCredito, TestCase):
+    def setUp(self):
+        django_cache.clear()
+        self.api = APIClient()
+        self.api.force_authenticate(self.usuario)
+        self.credito = self.crear_credito()
+        HistoricoCredito.objects.filter(credito=self.credito).delete()
+        # Cinco cambios, los tres primeros con la misma fecha_cambio
+        fecha = timezone.now() - datetime.timedelta(days=1)
+        self.ids = []
+        for i in range(5):
+            evento = HistoricoCredito.objects.create(credito=self.credito, fase_nueva='FASE_1_SOLICITUD')
+            HistoricoCredito.objects.filter(pk=evento.pk).update(
+                fecha_cambio=fecha + datetime.timedelta(minutes=max(i - 2, 0)),
+            )
+            self.ids.append(evento.pk)
+
+    def pagina(self, **params):
+        respuesta = self.api.get(f'/api/Creditos/creditos/{self.credito.id}/linea-tiempo/', params)
+        self.assertEqual(respuesta.status_code, 200)
+        return respuesta.json()
+
+    def test_recorre_todas_las_paginas_sin_repetir_empates(self):
+        vistos, cursor = [], None
+        while True:
+            params = {'limit': 2, 'fields': 'id'}
+            if cursor:
+                params['cursor'] = cursor
+            pagina = self.pagina(**params)
+            self.assertEqual(pagina['total_cambios'], 5)
+            vistos += [evento['id'] for evento in pagina['linea_tiempo']]
+            cursor = pagina['siguiente_cursor']
+            if cursor is None:
+                break
+        # Más reciente primero; entre empates de fecha_cambio, por id descendente
+        self.assertEqual(vistos, list(reversed(self.ids)))
+
+    def test_ultima_pagina_exacta_no_tiene_cursor(self):
+        pagina = self.pagina(limit=5)
+        self.assertEqual(len(pagina['linea_tiempo']), 5)
+        self.assertIsNone(pagina['siguiente_cursor'])
+
+    def test_cursor_invalido(self):
+        respuesta = self.api.get(f'/api/Creditos/creditos/{self.credito.id}/linea-tiempo/', {'cursor': 'x'})
+        self.assertEqual(respuesta.status_code, 400)
+
+
+@override_settings(CACHES=CACHE_EN_MEMORIA)
+class HistorialCreditoTests(DatosCredito, TestCase):
+    URL = '/api/Creditos/historial/'
+
+    def setUp(self):
+        django_cache.clear()
+        self.api = APIClient()
+        self.api.force_authenticate(self.usuario)
+        self.ids = [self.crear_credito(Monto_Solicitado=Decimal(1000 * (i + 1))).id for i in range(5)]
+
+    def test_ndjson(self):
+        respuesta = self.api.get(self.URL, {'stream': 'ndjson'})
+        self.assertEqual(respuesta['Content-Type'], 'application/x-ndjson')
+        filas = [json.loads(linea) for linea in b''.join(respuesta.streaming_content).decode().splitlines()]
+        self.assertEqual([fila['monto_prestamo'] for fila in filas], [1000, 2000, 3000, 4000, 5000])
+
+    def test_json_igual_a_la_lista_completa(self):
+        respuesta = self.api.get(self.URL, {'stream': 'json'})
+        self.assertEqual(json.loads(b''.join(respuesta.streaming_content)), self.api.get(self.URL).json())
+
+    def test_stream_invalido(self):
+        self.assertEqual(self.api.get(self.URL, {'stream': 'csv'}).status_code, 400)
+
+    def test_asgi_entrega_un_iterador_asincrono(self):
+        token = Token.objects.create(user=self.usuario)
+
+        async def leer():
+            respuesta = await AsyncClient().get(
+                self.URL, {'stream': 'ndjson'}, headers={'Authorization': f'Token {token.key}'},
+            )
+            self.assertTrue(respuesta.is_async)
+            return [parte async for parte in respuesta.streaming_content]
+
+        partes = async_to_sync(leer)()
+        self.assertEqual(len(b''.join(partes).decode().splitlines()), 5)
+
+    def test_paginas_por_cursor(self):
+        vistos, cursor = [], None
+        while True:
+            params = {'limit': 2}
+            if cursor:
+                params['cursor'] = cursor
+            pagina = self.api.get(self.URL, params).json()
+            vistos += [fila['monto_prestamo'] for fila in pagina['resultados']]
+            cursor = pagina['siguiente_cursor']
+            if cursor is None:
+                break
+        self.assertEqual(vistos, [1000, 2000, 3000, 4000, 5000])
+
+    def test_cursor_invalido(self):
+        self.assertEqual(self.api.get(self.URL, {'limit': 2, 'cursor': 'x'}).status_code, 400)
+
+
+class AmortizacionTests(TestCase):
+    def test_frances(self):
+        tabla = tabla_amortizacion(Decimal('10000'), Decimal('12'), 12, fecha_inicio=datetime.date(2025, 1, 31))
+        cuotas = tabla['cuotas']
+        self.assertEqual(tabla['cuota_inicial'], Decimal('888.49'))
+        self.assertEqual({c['cuota'] for c in cuotas[:-1]}, {Decimal('888.49')})
+        # La última cuota absorbe el redondeo
+        self.assertEqual(cuotas[-1]['cuota'], Decimal('888.47'))
+        self.assertEqual(cuotas[-1]['saldo'], Decimal('0'))
+        self.assertEqual(sum(c['capital'] for c in cuotas), Decimal('10000'))
+        self.assertEqual(tabla['total_interes'], Decimal('661.86'))
+        self.assertEqual(tabla['total_pagar'], Decimal('10661.86'))
+        self.assertEqual(cuotas[0]['fecha_vencimiento'], datetime.date(2025, 2, 28))
+
+    def test_aleman(self):
+        tabla = tabla_amortizacion(Decimal('10000'), Decimal('12'), 12, sistema='aleman')
+        cuotas = tabla['cuotas']
+        self.assertEqual({c['capital'] for c in cuotas[:-1]}, {Decimal('833.33')})
+        self.assertEqual(cuotas[-1]['capital'], Decimal('833.37'))
+        self.assertEqual(cuotas[-1]['saldo'], Decimal('0'))
+        self.assertEqual(tabla['cuota_inicial'], Decimal('933.33'))
+        self.assertEqual(tabla['total_interes'], Decimal('650.00'))
+        self.assertEqual(intereses_totales([10000], [12], [12], 'aleman'), [Decimal('650.00')])
+
+    def test_tasa_cero_y_entradas_invalidas(self):
+        self.assertEqual(tabla_amortizacion(Decimal('1000'), 0, 3)['total_pagar'], Decimal('1000'))
+        with self.assertRaises(ValidationError):
+            tabla_amortizacion(Decimal('1000'), 12, 0)
+        with self.assertRaises(ValidationError):
+            tabla_amortizacion(Decimal('1000'), 12, 12, sistema='americano')
+
+    def test_cartera_coincide_con_las_tablas(self):
+        filas = [
+            {'id': 1, 'Monto_Solicitado': Decimal('10000'), 'Tasa_Interes': Decimal('12'), 'Numero_Cuotas': 12,
+             'Fecha_Desembolso': datetime.date(2025, 1, 31), 'fecha_creacion': None},
+            {'id': 2, 'Monto_Solicitado': Decimal('5000'), 'Tasa_Interes': Decimal('24'), 'Numero_Cuotas': 6,
+             'Fecha_Desembolso': None, 'fecha_creacion': timezone.make_aware(datetime.datetime(2025, 3, 15))},
+            # Sin cuotas: se descarta
+            {'id': 3, 'Monto_Solicitado': Decimal('900'), 'Tasa_Interes': Decimal('12'), 'Numero_Cuotas': 0,
+             'Fecha_Desembolso': datetime.date(2025, 1, 1), 'fecha_creacion': None},
+        ]
+        for sistema in ('frances', 'aleman'):
+            proyeccion = proyectar_cartera(filas, sistema)
+            self.assertEqual(proyeccion['total_creditos'], 2)
+            self.assertEqual(proyeccion['total_capital'], 15000)
+
+            esperado = {}
+            for fila in filas[:2]:
+                inicio = fila['Fecha_Desembolso'] or fila['fecha_creacion'].date()
+                tabla = tabla_amortizacion(
+                    fila['Monto_Solicitado'], fila['Tasa_Interes'], fila['Numero_Cuotas'], sistema, inicio,
+                )
+                for cuota in tabla['cuotas']:
+                    mes = cuota['fecha_vencimiento'].strftime('%Y-%m')
+                    capital, creditos = esperado.get(mes, (0, 0))
+                    esperado[mes] = (capital + cuota['capital'], creditos + 1)
+
+            self.assertEqual([m['mes'] for m in proyeccion['meses']], sorted(esperado))
+            for mes in proyeccion['meses']:
+                capital, creditos = esperado[mes['mes']]
+                self.assertEqual(mes['creditos'], creditos)
+                # La tabla redondea cada cuota a centavos; la proyección no
+                self.assertAlmostEqual(mes['capital'], float(capital), delta=0.05)
+            self.assertAlmostEqual(sum(m['capital'] for m in proyeccion['meses']), 15000, delta=0.05)
+
+
+@override_settings(CACHES=CACHE_EN_MEMORIA)
+class AmortizacionEndpointsTests(DatosCredito, TestCase):
+    def setUp(self):
+        django_cache.clear()
+        self.api = APIClient()
+        self.api.force_authenticate(self.usuario)
+
+    def test_tabla_del_credito(self):
+        credito = self.crear_credito(Monto_Pagar=Decimal('10661.86'), Monto_Cuota=Decimal('888.49'))
+        datos = self.api.get(f'/api/Creditos/creditos/{credito.id}/amortizacion/').json()
+        self.assertEqual(len(datos['cuotas']), 12)
+        self.assertEqual(Decimal(str(datos['diferencia_cuota'])), 0)
+        self.assertEqual(Decimal(str(datos['diferencia_total_pagar'])), 0)
+        respuesta = self.api.get(f'/api/Creditos/creditos/{credito.id}/amortizacion/', {'sistema': 'x'})
+        self.assertEqual(respuesta.status_code, 400)
+
+    def test_proyeccion_de_la_cartera(self):
+        self.crear_credito(enum_estado='Aprobado', Fecha_Desembolso=datetime.date(2025, 1, 10))
+        self.crear_credito(enum_estado='Aprobado', Numero_Cuotas=6, Fecha_Desembolso=datetime.date(2025, 1, 10))
+        self.crear_credito(enum_estado='Rechazado')
+        otra = Empresa.objects.create(razon_social='Otra', email_contacto='o@o.com')
+        self.crear_credito(enum_estado='Aprobado', empresa=otra)
+
+        datos = self.api.get('/api/Creditos/creditos/proyeccion-flujo/').json()
+        self.assertEqual(datos['total_creditos'], 2)
+        self.assertEqual(datos['total_capital'], 20000)
+        self.assertEqual(datos['meses'][0], {**datos['meses'][0], 'mes': '2025-02', 'creditos': 2})
+        self.assertEqual(datos['meses'][-1]['mes'], '2026-01')
+        self.assertEqual(
+            self.api.get('/api/Creditos/creditos/proyeccion-flujo/', {'estado': 'Rechazado'}).json()['total_creditos'], 1,
+        )
+
+
+class GananciasIncrementalesTests(DatosCredito, TestCase):
+    def test_solo_procesa_lo_modificado(self):
+        credito = self.crear_credito()
+        self.crear_credito(Monto_Solicitado=Decimal('5000'))
+
+        self.assertEqual(recalcular_ganancias()['creados'], 2)
+        # Relee el margen de solapamiento sin escribir nada
+        resumen = recalcular_ganancias()
+        self.assertEqual((resumen['creados'], resumen['actualizados']), (0, 0))
+
+        credito.Tasa_Interes = Decimal('24')
+        credito.save()
+        Credito.objects.exclude(pk=credito.pk).update(fecha_actualizacion=timezone.now() - datetime.timedelta(days=1))
+        resumen = recalcular_ganancias()
+        self.assertEqual((resumen['leidos'], resumen['actualizados']), (1, 1))
+        self.assertEqual(Ganancia_Credito.objects.count(), 2)
+        self.assertEqual(Ganancia_Credito.objects.get(Credito=credito).tasa_interes, Decimal('24'))
+
+    def test_credito_confirmado_tarde_se_procesa(self):
+        self.crear_credito()
+        recalcular_ganancias()
+        marca = MarcaProceso.objects.get(proceso=PROCESO_GANANCIAS, empresa=None).marca
+
+        # Confirmado después de la lectura anterior, con una fecha anterior a la marca
+        tarde = self.crear_credito(Monto_Solicitado=Decimal('5000'))
+        Credito.objects.filter(pk=tarde.pk).update(fecha_actualizacion=marca - datetime.timedelta(minutes=1))
+
+        self.assertEqual(recalcular_ganancias()['creados'], 1)
+        self.assertTrue(Ganancia_Credito.objects.filter(Credito=tarde).exists())
+        self.assertEqual(MarcaProceso.objects.get(proceso=PROCESO_GANANCIAS, empresa=None).marca, marca)
+
+    def test_completo_no_duplica(self):
+        self.crear_credito()
+        recalcular_ganancias()
+        resumen = recalcular_ganancias(completo=True)
+        self.assertEqual((resumen['leidos'], resumen['sin_cambios']), (1, 1))
+        self.assertEqual(Ganancia_Credito.objects.count(), 1)
+
+    def test_marca_global_unica(self):
+        recalcular_ganancias()
+        recalcular_ganancias(empresa_id=self.empresa.id)
+        self.assertEqual(MarcaProceso.objects.filter(proceso=PROCESO_GANANCIAS, empresa__isnull=True).count(), 1)
+        with self.assertRaises(IntegrityError), transaction.atomic():
+            MarcaProceso.objects.create(proceso=PROCESO_GANANCIAS, empresa=None)
+
+
+@override_settings(CACHES=CACHE_EN_MEMORIA)
+class SimulacionTests(DatosCredito, TestCase):
+    COLUMNAS = ([10000.0, 5000.0], [0.01, 0.02], [12, 24])
+
+    def test_rechaza_valores_no_finitos(self):
+        for parametro in ('shock_tasa', 'tasa_default', 'recuperacion', 'volatilidad_tasa'):
+            for valor in (float('nan'), float('inf')):
+                with self.subTest(parametro=parametro, valor=valor), self.assertRaises(ValidationError):
+                    simulacion.validar_parametros(**{parametro: valor})
+
+    def test_api_rechaza_nan(self):
+        self.crear_credito(enum_estado='Aprobado')
+        api = APIClient()
+        api.force_authenticate(self.usuario)
+        respuesta = api.get('/api/Creditos/creditos/simulacion/', {'modo': 'montecarlo', 'tasa_default': 'nan'})
+        self.assertEqual(respuesta.status_code, 400)
+
+    @override_settings(SIMULACION_MAX_PRODUCTO=100)
+    def test_limite_creditos_por_simulaciones(self):
+        with self.assertRaises(ValidationError):
+            simulacion.simular_montecarlo(self.COLUMNAS, simulaciones=51)
+        self.assertEqual(simulacion.simular_montecarlo(self.COLUMNAS, simulaciones=50)['simulaciones'], 50)
+
+    @override_settings(SIMULACION_MAX_PRODUCTO=100)
+    def test_limite_antes_de_leer_la_cartera(self):
+        for _ in range(3):
+            self.crear_credito(enum_estado='Aprobado')
+        creditos = Credito.objects.filter(empresa=self.empresa)
+        with self.assertNumQueries(1), self.assertRaises(ValidationError):
+            simulacion.simular_cartera(creditos, self.empresa.id, modo='montecarlo', simulaciones=40)
+
+    @override_settings(SIMULACION_UMBRAL_POOL=1, SIMULACION_MAX_WORKERS=2)
+    def test_pool_compartido_entre_corridas(self):
+        primera = simulacion.simular_montecarlo(self.COLUMNAS, simulaciones=20, semilla=1)
+        pool = simulacion._pool
+        segunda = simulacion.simular_montecarlo(self.COLUMNAS, simulaciones=20, semilla=1)
+        self.assertEqual(primera['procesos'], 2)
+        self.assertIs(simulacion._pool, pool)
+        self.assertEqual(primera['resultado_neto'], segunda['resultado_neto'])
+
+
+@override_settings(CACHES=CACHE_EN_MEMORIA)
+class FiltrosListadoTests(DatosCredito, TestCase):
+    URL = '/api/Creditos/creditos/'
+
+    def setUp(self):
+        django_cache.clear()
+        self.api = APIClient()
+        self.api.force_authenticate(self.usuario)
+        self.revision = self.crear_credito(fase_actual='FASE_6_REVISION', Monto_Solicitado=Decimal('20000'))
+        self.crear_credito(fase_actual='FASE_1_SOLICITUD')
+
+    def listar(self, **filtros):
+        respuesta = self.api.get(self.URL, filtros)
+        self.assertEqual(respuesta.status_code, 200)
+        return [credito['id'] for credito in respuesta.json()['results']]
+
+    def consulta_listado(self, **filtros):
+        with CaptureQueriesContext(connection) as consultas:
+            self.listar(**filtros)
+        return next(c['sql'] for c in consultas if 'FROM "app_Credito_credito"' in c['sql'])
+
+    def test_filtros(self):
+        self.assertEqual(self.listar(fase_actual='FASE_6_REVISION'), [self.revision.id])
+        self.assertEqual(self.listar(monto_min='15000'), [self.revision.id])
+        self.assertEqual(len(self.listar(fecha_desde=self.revision.fecha_creacion.date().isoformat())), 2)
+        self.assertEqual(self.api.get(self.URL, {'fecha_desde': '2024-13-01'}).status_code, 400)
+
+    def test_consultas_constantes(self):
+        self.listar()
+        for _ in range(5):
+            self.crear_credito(fase_actual='FASE_6_REVISION')
+        # Perfil cacheado: solo la consulta del listado
+        with self.assertNumQueries(1):
+            self.assertEqual(len(self.listar(fase_actual='FASE_6_REVISION', monto_min='1')), 6)
+
+    def test_filtro_de_fase_usa_indice(self):
+        sql = self.consulta_listado(fase_actual='FASE_6_REVISION')
+        self.assertIn('credito_emp_fase_fecha_idx', plan_de_consulta(sql))
+
+    def test_filtro_de_estado_usa_indice(self):
+        sql = self.consulta_listado(enum_estado='Aprobado')
+        self.assertIn('credito_emp_estado_fecha_idx', plan_de_consulta(sql))
+
+
+@override_settings(CACHES=CACHE_EN_MEMORIA)
+class ListadoCursorTests(DatosCredito, TestCase):
+    URL = '/api/Creditos/creditos/'
+
+    def setUp(self):
+        django_cache.clear()
+        self.api = APIClient()
+        self.api.force_authenticate(self.usuario)
+        self.ids = [self.crear_credito().id for _ in range(5)]
+
+    def recorrer(self, **params):
+        vistos, respuesta = [], self.api.get(self.URL, params)
+        while True:
+            self.assertEqual(respuesta.status_code, 200)
+            datos = respuesta.json()
+            vistos += [credito['id'] for credito in datos['results']]
+            if datos['next'] is None:
+                return vistos
+            respuesta = self.api.get(datos['next'])
+
+    def test_recorre_todas_las_paginas(self):
+        self.assertEqual(self.recorrer(limit=2), self.ids)
+
+    def test_empates_de_fecha_creacion(self):
+        Credito.objects.filter(id__in=self.ids).update(fecha_creacion=timezone.now())
+        self.assertEqual(self.recorrer(limit=2), self.ids)
+
+    def test_campo_desconocido(self):
+        respuesta = self.api.get(self.URL, {'fields': 'id,contraseña'})
+        self.assertEqual(respuesta.status_code, 400)
+        self.assertIn('contraseña', str(respuesta.json()['fields']))
+
+    def test_campos_parciales(self):
+        with CaptureQueriesContext(connection) as consultas:
+            respuesta = self.api.get(self.URL, {'fields': 'id,Monto_Solicitado', 'limit': 2})
+        self.assertEqual(set(respuesta.json()['results'][0]), {'id', 'Monto_Solicitado'})
+        # Solo las columnas pedidas más las del cursor
+        sql = next(c['sql'] for c in consultas if 'FROM "app_Credito_credito"' in c['sql'])
+        columnas = sql.split(' FROM ')[0]
+        self.assertIn('"Monto_Solicitado"', columnas)
+        self.assertIn('"fecha_creacion"', columnas)
+        self.assertNotIn('"Tasa_Interes"', columnas)
+
+        siguiente = self.api.get(respuesta.json()['next']).json()
+        self.assertEqual([c['id'] for c in siguiente['results']], self.ids[2:4])
+        self.assertEqual(set(siguiente['results'][0]), {'id', 'Monto_Solicitado'})
+
+    def test_campos_en_el_detalle(self):
+        datos = self.api.get(f'{self.URL}{self.ids[0]}/', {'fields': 'enum_estado'}).json()
+        self.assertEqual(datos, {'enum_estado': 'SOLICITADO'})
+
+
+@skipUnless(connection.vendor == 'postgresql', "El benchmark necesita PostgreSQL")
+class BenchmarkIndicesTests(TestCase):
+    # Listados ordenados por fecha: sin el índice compuesto habría que ordenar
+    INDICES = {
+        'Cliente': 'cliente_emp_fecha_idx',
+        'Documentacion': 'documentacion_emp_fecha_idx',
+        'Credito': 'credito_emp_fecha_idx',
+        'Credito (fase)': 'credito_emp_fase_fecha_idx',
+        'Conversacion': 'conversacion_emp_usr_idx',
+        'ConsultaSQL': 'consulta_sql_emp_fecha_idx',
+    }
+
+    def test_listados_por_indice_sin_ordenar(self):
+        empresa, usuario = cargar_filas(50000, 50)
+        for resultado in medir(empresa, usuario):
+            with self.subTest(consulta=resultado['consulta']):
+                # Los ordenados por id pueden recorrer la clave primaria a esta escala
+                self.assertEqual(
+                    resultado['indice'], self.INDICES.get(resultado['consulta'], resultado['indice']),
+                )
+                self.assertIsNotNone(resultado['indice'])
+                self.assertFalse(resultado['ordena'])
+                self.assertLess(resultado['ms'], resultado['ms_sin_indices'])
+
+    def test_comando_revierte_los_datos(self):
+        call_command('benchmark_indices', filas=100, empresas=2, stdout=StringIO())
+        self.assertFalse(Cliente.objects.exists())
+        self.assertFalse(Empresa.objects.exists())
+
+
+@override_settings(CACHES=CACHE_EN_MEMORIA)
+class ContadoresPipelineTests(DatosCredito, TestCase):
+    def totales(self):
+        return {(f['fase_actual'], f['enum_estado']): f['total'] for f in obtener_pipeline(self.empresa.id)['detalle']}
+
+    def test_se_ajustan_en_la_transaccion_del_cambio(self):
+        credito = self.crear_credito()
+        self.assertEqual(self.totales(), {('FASE_1_SOLICITUD', 'SOLICITADO'): 1})
+
+        cambiar_fase(credito, 'FASE_2_DOCUMENTACION', self.usuario, campos={'enum_estado': 'Aprobado'})
+        self.assertEqual(self.totales(), {('FASE_2_DOCUMENTACION', 'Aprobado'): 1})
+
+        credito.delete()
+        self.assertEqual(self.totales(), {})
+
+    def test_se_revierten_con_la_transaccion(self):
+        credito = self.crear_credito()
+        with self.assertRaises(IntegrityError), transaction.atomic():
+            cambiar_fase(credito, 'FASE_2_DOCUMENTACION', self.usuario)
+            raise IntegrityError
+        self.assertEqual(self.totales(), {('FASE_1_SOLICITUD', 'SOLICITADO'): 1})
+
+    def test_cambio_por_lote(self):
+        creditos = [self.crear_credito(fase_actual='FASE_7_DESEMBOLSO', enum_estado='Aprobado') for _ in range(3)]
+        cambiar_fase_lote(
+            Credito.objects.filter(empresa=self.empresa), [c.id for c in creditos[:2]],
+            'FASE_7_DESEMBOLSO', 'FASE_8_FINALIZADO', self.usuario, campos={'enum_estado': 'DESENBOLSADO'},
+        )
+        self.assertEqual(self.totales(), {
+            ('FASE_7_DESEMBOLSO', 'Aprobado'): 1,
+            ('FASE_8_FINALIZADO', 'DESENBOLSADO'): 2,
+        })
+
+    def test_conflicto_si_cambio_el_estado(self):
+        credito = self.crear_credito()
+        Credito.objects.filter(pk=credito.pk).update(enum_estado='Rechazado')
+        with self.assertRaises(ConflictoFase):
+            cambiar_fase(credito, 'FASE_2_DOCUMENTACION', self.usuario)
+
+    def test_cambio_de_estado_por_la_api(self):
+        credito = self.crear_credito()
+        api = APIClient()
+        api.force_authenticate(self.usuario)
+        respuesta = api.patch(f'/api/Creditos/creditos/{credito.id}/', {'enum_estado': 'Aprobado'}, format='json')
+        self.assertEqual(respuesta.status_code, 200)
+        self.assertEqual(self.totales(), {('FASE_1_SOLICITUD', 'Aprobado'): 1})
+
+    def test_borrar_la_empresa_no_publica_bajas(self):
+        self.crear_credito()
+        Empresa.objects.filter(pk=self.empresa.pk).delete()
+        connection.check_constraints()
+        self.assertFalse(Credito.objects.exists())
+
+    def test_reconciliar_corrige_desvios(self):
+        self.crear_credito()
+        ContadorPipeline.objects.filter(empresa=self.empresa).update(total=5)
+        correcciones = reconciliar_contadores(self.empresa.id)
+        self.assertEqual([(c['antes'], c['despues']) for c in correcciones], [(5, 1)])
+        self.assertEqual(reconciliar_contadores(self.empresa.id), [])
+
+
+@override_settings(CACHES=CACHE_EN_MEMORIA)
+class DuracionFasesTests(DatosCredito, TestCase):
+    URL = '/api/Creditos/creditos/duracion-fases/'
+
+    def setUp(self):
+        django_cache.clear()
+        self.api = APIClient()
+        self.api.force_authenticate(self.usuario)
+        credito = self.crear_credito()
+        entrada = cambiar_fase(credito, 'FASE_2_DOCUMENTACION', self.usuario)
+        salida = cambiar_fase(credito, 'FASE_3_LABORAL', self.usuario)
+        ahora = timezone.now()
+        HistoricoCredito.objects.filter(pk=entrada.pk).update(fecha_cambio=ahora - datetime.timedelta(hours=10))
+        HistoricoCredito.objects.filter(pk=salida.pk).update(fecha_cambio=ahora - datetime.timedelta(hours=2))
+
+    def fases(self):
+        respuesta = self.api.get(self.URL)
+        self.assertEqual(respuesta.status_code, 200)
+        grupos = respuesta.json()['grupos']
+        return {fase['fase']: fase for fase in grupos[0]['fases']} if grupos else {}
+
+    def test_consulta_solo_lee_el_resumen(self):
+        with CaptureQueriesContext(connection) as consultas:
+            self.assertEqual(self.fases(), {})
+        self.assertFalse([c for c in consultas if '"app_Credito_duracionfase"' in c['sql'] or 'historicocredito' in c['sql']])
+        self.assertFalse(MarcaProceso.objects.exists())
+
+        procesar_lote()
+        django_cache.clear()
+        with CaptureQueriesContext(connection) as consultas:
+            fase = self.fases()['FASE_2_DOCUMENTACION']
+        self.assertFalse([c for c in consultas if '"app_Credito_duracionfase"' in c['sql'] or 'historicocredito' in c['sql']])
+        self.assertEqual((fase['cantidad'], fase['promedio_horas']), (1, 8.0))
+        self.assertAlmostEqual(fase['mediana_horas'], 8.0, delta=8.0 * 0.05)
+
+    def test_intervalos_repetidos_no_se_suman(self):
+        procesar_lote()
+        MarcaProceso.objects.filter(proceso='duracion_fases').update(marca=None)
+        actualizar_duraciones(self.empresa.id)
+        resumen = ResumenDuracionFase.objects.get(
+            empresa=self.empresa, agrupacion='empresa', fase='FASE_2_DOCUMENTACION',
+        )
+        self.assertEqual(resumen.cantidad, 1)
+
+
+class OutboxTests(DatosCredito, TestCase):
+    TIPO = 'test.evento'
+
+    def setUp(self):
+        self.manejados = []
+        outbox.registrar_handler(self.TIPO)(self.manejar)
+        self.addCleanup(outbox._handlers.pop, self.TIPO)
+
+    def manejar(self, eventos):
+        for evento in eventos:
+            if evento.payload.get('veneno'):
+                raise ValueError('evento inválido')
+        self.manejados.extend(evento.id for evento in eventos)
+
+    def evento(self, **payload):
+        return EventoOutbox.objects.create(tipo=self.TIPO, empresa=self.empresa, id_credito=0, payload=payload)
+
+    @override_settings(OUTBOX_MAX_INTENTOS=2)
+    def test_un_evento_fallido_no_arrastra_al_grupo(self):
+        sanos = [self.evento(), self.evento()]
+        veneno = self.evento(veneno=True)
+
+        for _ in range(2):
+            resumen = procesar_lote()
+        self.assertEqual(resumen['fallidos'], 1)
+        self.assertEqual(sorted(self.manejados), [e.id for e in sanos])
+        for evento in sanos:
+            evento.refresh_from_db()
+            self.assertEqual((evento.intentos, evento.error), (0, None))
+            self.assertIsNotNone(evento.procesado)
+        veneno.refresh_from_db()
+        self.assertEqual((veneno.intentos, veneno.error), (2, 'evento inválido'))
+        self.assertIsNotNone(veneno.procesado)
+
+    def test_el_comando_sigue_despues_de_un_fallido(self):
+        veneno = self.evento(veneno=True)
+        sanos = [self.evento() for _ in range(3)]
+
+        salida = StringIO()
+        call_command('procesar_outbox', lote=1, stdout=salida)
+        self.assertIn('3 eventos procesados, 1 fallidos', salida.getvalue())
+        self.assertEqual(self.manejados, [e.id for e in sanos])
+        veneno.refresh_from_db()
+        self.assertEqual(veneno.intentos, 1)
+        self.assertIsNone(veneno.procesado)
+
+
+class RiesgoPorOutboxTests(DatosCredito, TestCase):
+    def test_guardar_publica_y_el_consumidor_recalcula(self):
+        with self.captureOnCommitCallbacks() as callbacks:
+            credito = self.crear_credito(fase_actual='FASE_6_REVISION', Monto_Cuota=Decimal('900'))
+            Trabajo.objects.create(cargo='Cajera', empresa='Tienda', salario=Decimal('3000'), id_cliente=self.cliente)
+        self.assertEqual(callbacks, [])
+        self.assertFalse(RiesgoCredito.objects.exists())
+        self.assertEqual(EventoOutbox.objects.filter(tipo=outbox.EVENTO_RIESGO_CLIENTE).count(), 2)
+
+        procesar_lote()
+        riesgo = RiesgoCredito.objects.get(credito=credito)
+        self.assertEqual(riesgo.salario, Decimal('3000'))
+        self.assertEqual(riesgo.carga_cuota, Decimal('0.3'))
+
+
+@override_settings(CACHES=CACHE_EN_MEMORIA)
+class RevisarLoteTests(DatosCredito, TestCase):
+    URL = '/api/Creditos/creditos/revisar-lote/'
+
+    def setUp(self):
+        self.api = APIClient()
+        self.api.force_authenticate(self.usuario)
+        self.otro = User.objects.create(username='otro')
+
+    def revisar(self, cantidad):
+        ids = [self.crear_credito(fase_actual='FASE_6_REVISION').id for _ in range(cantidad)]
+        AsignacionRevision.objects.create(
+            credito_id=ids[0], empresa=self.empresa, analista=self.otro,
+            fecha_asignacion=timezone.now(), vence=timezone.now() + datetime.timedelta(minutes=15),
+        )
+        with CaptureQueriesContext(connection) as consultas:
+            respuesta = self.api.post(self.URL, {'ids': ids, 'aprobado': False, 'razon': '-'}, format='json')
+        self.assertEqual(respuesta.status_code, 200)
+        self.assertEqual(respuesta.json()['fallidos'], 1)
+        self.assertIn('otro', respuesta.json()['resultados'][0]['error'])
+        return len(consultas)
+
+    def test_asignaciones_en_una_consulta(self):
+        self.revisar(2)  # Deja el perfil en caché y crea las filas de los contadores
+        self.assertEqual(self.revisar(2), self.revisar(8))
+
+
+@override_settings(CACHES=CACHE_EN_MEMORIA)
+class AccionesLoteTests(DatosCredito, TestCase):
+    def setUp(self):
+        django_cache.clear()
+        self.api = APIClient()
+        self.api.force_authenticate(self.usuario)
+
+    def post(self, accion, datos):
+        return self.api.post(f'/api/Creditos/creditos/{accion}/', datos, format='json')
+
+    def assertCambioRegistrado(self, ids, fase_anterior, fase_nueva):
+        self.assertEqual(
+            HistoricoCredito.objects.filter(credito_id__in=ids, fase_anterior=fase_anterior, fase_nueva=fase_nueva).count(),
+            len(ids),
+        )
+        eventos = EventoOutbox.objects.filter(tipo=outbox.EVENTO_FASE_CAMBIADA, id_credito__in=ids)
+        self.assertEqual(sorted(e.id_credito for e in eventos), sorted(ids))
+        self.assertTrue(all(e.payload['fase_nueva'] == fase_nueva for e in eventos))
+
+    def test_desembolsar_lote(self):
+        ids = [self.crear_credito(fase_actual='FASE_7_DESEMBOLSO', enum_estado='Aprobado').id for _ in range(3)]
+
+        respuesta = self.post('desembolsar-lote', {'ids': ids})
+        self.assertEqual(respuesta.json()['procesados'], 3)
+        for credito in Credito.objects.filter(id__in=ids):
+            self.assertEqual((credito.fase_actual, credito.enum_estado), ('FASE_8_FINALIZADO', 'DESENBOLSADO'))
+            self.assertIsNotNone(credito.Fecha_Desembolso)
+        self.assertCambioRegistrado(ids, 'FASE_7_DESEMBOLSO', 'FASE_8_FINALIZADO')
+
+    def test_aprobar_lote(self):
+        ids = [self.crear_credito(fase_actual='FASE_6_REVISION').id for _ in range(2)]
+
+        self.assertEqual(self.post('revisar-lote', {'ids': ids, 'aprobado': True}).json()['procesados'], 2)
+        self.assertEqual(
+            set(Credito.objects.filter(id__in=ids).values_list('fase_actual', 'enum_estado')),
+            {('FASE_7_DESEMBOLSO', 'Aprobado')},
+        )
+        self.assertCambioRegistrado(ids, 'FASE_6_REVISION', 'FASE_7_DESEMBOLSO')
+
+    def test_rechaza_ajenos_inexistentes_e_invalidos_sin_tocarlos(self):
+        otra = Empresa.objects.create(razon_social='Otra', email_contacto='o@o.com')
+        ajeno = self.crear_credito(fase_actual='FASE_7_DESEMBOLSO', enum_estado='Aprobado', empresa=otra)
+        sin_aprobar = self.crear_credito(fase_actual='FASE_7_DESEMBOLSO')
+        otra_fase = self.crear_credito(fase_actual='FASE_6_REVISION', enum_estado='Aprobado')
+        valido = self.crear_credito(fase_actual='FASE_7_DESEMBOLSO', enum_estado='Aprobado')
+        ids = [ajeno.id, 999999, sin_aprobar.id, otra_fase.id, valido.id]
+
+        datos = self.post('desembolsar-lote', {'ids': ids}).json()
+        self.assertEqual((datos['procesados'], datos['fallidos']), (1, 4))
+        self.assertEqual([r['id'] for r in datos['resultados']], ids)
+        self.assertEqual([r['ok'] for r in datos['resultados']], [False, False, False, False, True])
+        self.assertEqual(datos['resultados'][0]['error'], 'Crédito no encontrado')
+
+        for credito in (ajeno, sin_aprobar, otra_fase):
+            fase = Credito.objects.values_list('fase_actual', flat=True).get(pk=credito.pk)
+            self.assertEqual(fase, credito.fase_actual)
+        self.assertCambioRegistrado([valido.id], 'FASE_7_DESEMBOLSO', 'FASE_8_FINALIZADO')
+        self.assertFalse(EventoOutbox.objects.filter(
+            tipo=outbox.EVENTO_FASE_CAMBIADA, id_credito__in=[ajeno.id, sin_aprobar.id, otra_fase.id],
+        ).exists())
+
+    def test_body_invalido(self):
+        self.assertEqual(self.post('desembolsar-lote', {'ids': []}).status_code, 400)
+        self.assertEqual(self.post('desembolsar-lote', {'ids': ['x']}).status_code, 400)
+        self.assertEqual(self.post('revisar-lote', {'ids': [1]}).status_code, 400)
+
+
+@override_settings(CACHES=CACHE_EN_MEMORIA)
+class GetCondicionalTests(DatosCredito, TestCase):
+    def setUp(self):
+        django_cache.clear()
+        self.api = APIClient()
+        self.api.force_authenticate(self.usuario)
+        self.credito = self.crear_credito()
+        self.url = f'/api/Creditos/creditos/{self.credito.id}/estado-actual/'
+
+    def test_emite_etag_y_last_modified(self):
+        respuesta = self.api.get(self.url)
+        self.assertEqual(respuesta.status_code, 200)
+        self.assertTrue(respuesta['ETag'].startswith('"'))
+        self.assertIn('Last-Modified', respuesta)
+        self.assertIn('no-cache', respuesta['Cache-Control'])
+        self.assertIn('private', respuesta['Cache-Control'])
+
+    def test_304_sin_armar_el_agregado(self):
+        etag = self.api.get(self.url)['ETag']
+        with CaptureQueriesContext(connection) as consultas:
+            respuesta = self.api.get(self.url, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(respuesta.status_code, 304)
+        self.assertEqual(respuesta['ETag'], etag)
+        self.assertEqual(respuesta.content, b'')
+        self.assertFalse([c for c in consultas if 'app_Cliente_cliente' in c['sql']])
+
+    def test_etag_cambia_con_cambiar_fase(self):
+        etag = self.api.get(self.url)['ETag']
+        cambiar_fase(self.credito, 'FASE_2_DOCUMENTACION', self.usuario)
+        respuesta = self.api.get(self.url, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(respuesta.status_code, 200)
+        self.assertNotEqual(respuesta['ETag'], etag)
+        self.assertEqual(respuesta.json()['fase_actual'], 'FASE_2_DOCUMENTACION')
+
+    def test_etag_depende_de_la_consulta(self):
+        url = f'/api/Creditos/creditos/{self.credito.id}/linea-tiempo/'
+        cambiar_fase(self.credito, 'FASE_2_DOCUMENTACION', self.usuario)
+        etag = self.api.get(url, {'limit': 1})['ETag']
+        self.assertEqual(self.api.get(url, {'limit': 1}, HTTP_IF_NONE_MATCH=etag).status_code, 304)
+        self.assertEqual(self.api.get(url, {'limit': 2}, HTTP_IF_NONE_MATCH=etag).status_code, 200)
+
+    def test_credito_ajeno_da_404_sin_etag(self):
+        otra = Empresa.objects.create(razon_social='Otra', email_contacto='o@o.com')
+        usuario = User.objects.create(username='ajeno')
+        Perfiluser.objects.create(usuario=usuario, empresa=otra)
+        self.api.force_authenticate(usuario)
+        respuesta = self.api.get(self.url)
+        self.assertEqual(respuesta.status_code, 404)
+        self.assertNotIn('ETag', respuesta)
+
+
+@override_settings(CACHES=CACHE_EN_MEMORIA)
+class ColaRevisionTests(DatosCredito, TestCase):
+    URL = '/api/Creditos/creditos/'
+
+    def setUp(self):
+        django_cache.clear()
+        self.otro = User.objects.create(username='otro')
+        Perfiluser.objects.create(usuario=self.otro, empresa=self.empresa)
+        self.ids = [self.crear_credito(fase_actual='FASE_6_REVISION').id for _ in range(3)]
+        self.crear_credito(fase_actual='FASE_6_REVISION', enum_estado='Rechazado')
+        self.crear_credito(fase_actual='FASE_5_GARANTE')
+
+    def reclamar(self, usuario, cantidad):
+        api = APIClient()
+        api.force_authenticate(usuario)
+        respuesta = api.post(f'{self.URL}cola-revision/', {'cantidad': cantidad}, format='json')
+        self.assertEqual(respuesta.status_code, 200)
+        return respuesta.json()
+
+    def test_dos_analistas_no_reciben_el_mismo_credito(self):
+        primero = self.reclamar(self.usuario, 2)
+        segundo = self.reclamar(self.otro, 2)
+        self.assertEqual(primero['asignados'], 2)
+        self.assertEqual([c['id'] for c in primero['creditos']], self.ids[:2])
+        self.assertEqual(segundo['asignados'], 1)
+        self.assertEqual([c['id'] for c in segundo['creditos']], self.ids[2:])
+
+    def test_reclamar_de_nuevo_renueva_sin_duplicar(self):
+        self.reclamar(self.usuario, 2)
+        AsignacionRevision.objects.update(vence=timezone.now() + datetime.timedelta(minutes=1))
+        datos = self.reclamar(self.usuario, 2)
+        self.assertEqual(datos['asignados'], 0)
+        self.assertEqual(AsignacionRevision.objects.count(), 2)
+        self.assertGreater(
+            AsignacionRevision.objects.earliest('vence').vence, timezone.now() + datetime.timedelta(minutes=10),
+        )
+
+    def test_lease_vencido_vuelve_a_la_cola(self):
+        self.reclamar(self.usuario, 3)
+        AsignacionRevision.objects.filter(credito_id=self.ids[0]).update(vence=timezone.now() - datetime.timedelta(seconds=1))
+
+        datos = self.reclamar(self.otro, 3)
+        self.assertEqual([c['id'] for c in datos['creditos']], self.ids[:1])
+        self.assertEqual(AsignacionRevision.objects.get(credito_id=self.ids[0]).analista, self.otro)
+
+        api = APIClient()
+        api.force_authenticate(self.usuario)
+        cola = api.get(f'{self.URL}cola-revision/').json()['creditos']
+        self.assertEqual([c['id'] for c in cola], self.ids[1:])
+
+    def test_liberar(self):
+        self.reclamar(self.usuario, 1)
+        api = APIClient()
+        api.force_authenticate(self.otro)
+        url = f'{self.URL}{self.ids[0]}/liberar-revision/'
+        self.assertEqual(api.post(url).status_code, 400)
+
+        api.force_authenticate(self.usuario)
+        self.assertEqual(api.post(url).status_code, 200)
+        self.assertFalse(AsignacionRevision.objects.exists())
+        self.assertEqual([c['id'] for c in self.reclamar(self.otro, 1)['creditos']], self.ids[:1])
+
+    def test_cantidad_invalida(self):
+        api = APIClient()
+        api.force_authenticate(self.usuario)
+        for cantidad in (0, 101, 'diez'):
+            respuesta = api.post(f'{self.URL}cola-revision/', {'cantidad': cantidad}, format='json')
+            self.assertEqual(respuesta.status_code, 400)
+
+
+@skipUnless(connection.vendor == 'postgresql', "SKIP LOCKED necesita PostgreSQL")
+class ColaRevisionConcurrenteTests(DatosCredito, TransactionTestCase):
+    def setUp(self):
+        self.setUpTestData()
+        self.otro = User.objects.create(username='otro')
+        self.ids = [self.crear_credito(fase_actual='FASE_6_REVISION').id for _ in range(3)]
+
+    def test_reclamos_simultaneos_no_se_pisan(self):
+        creditos = Credito.objects.filter(empresa=self.empresa)
+        tomado, seguir = threading.Event(), threading.Event()
+
+        def reclamar_y_esperar():
+            # Mantiene bloqueadas las filas que reclamó hasta que el otro analista termine
+            try:
+                with transaction.atomic():
+                    reclamar(creditos, self.usuario, 2)
+                    tomado.set()
+                    seguir.wait(10)
+            finally:
+                connection.close()
+
+        hilo = threading.Thread(target=reclamar_y_esperar)
+        hilo.start()
+        try:
+            self.assertTrue(tomado.wait(10))
+            self.assertEqual(reclamar(creditos, self.otro, 2), 1)
+        finally:
+            seguir.set()
+            hilo.join()
+
+        asignaciones = dict(AsignacionRevision.objects.values_list('credito_id', 'analista_id'))
+        self.assertEqual(asignaciones, {
+            self.ids[0]: self.usuario.id, self.ids[1]: self.usuario.id, self.ids[2]: self.otro.id,
+        })
+
+
+@override_settings(CACHES=CACHE_EN_MEMORIA, IDEMPOTENCIA_BLOQUEO_SEGUNDOS=60)
+class IdempotenciaTests(DatosCredito, TestCase):
+    URL = '/api/Creditos/creditos/revisar-lote/'
+
+    def setUp(self):
+        self.api = APIClient()
+        self.api.force_authenticate(self.usuario)
+        self.credito = self.crear_credito(fase_actual='FASE_6_REVISION')
+
+    def en_curso(self, hace):
+        reserva = RespuestaIdempotente.objects.create(
+            usuario=self.usuario, clave='k1', metodo='POST', ruta=self.URL,
+            vence=timezone.now() + datetime.timedelta(hours=1),
+        )
+        RespuestaIdempotente.objects.filter(pk=reserva.pk).update(fecha_creacion=timezone.now() - hace)
+
+    def revisar(self):
+        return self.api.post(
+            self.URL, {'ids': [self.credito.id], 'aprobado': False, 'razon': '-'},
+            format='json', headers={'Idempotency-Key': 'k1'},
+        )
+
+    def test_reserva_en_curso_devuelve_409(self):
+        self.en_curso(datetime.timedelta(seconds=10))
+        self.assertEqual(self.revisar().status_code, 409)
+
+    def test_reserva_abandonada_se_toma(self):
+        self.en_curso(datetime.timedelta(seconds=90))
+        self.assertEqual(self.revisar().json()['procesados'], 1)
+
+        repetida = self.revisar()
+        self.assertEqual(repetida.headers['Idempotent-Replayed'], 'true')
+        self.assertEqual(RespuestaIdempotente.objects.get().estado_http, 200)
+
+
+@override_settings(CACHES=CACHE_EN_MEMORIA, SSE_LATIDO=0.05, SSE_INTERVALO_SONDEO=0.05)
+class EventosCreditoTests(DatosCredito, TestCase):
+    URL = '/api/Creditos/eventos/'
+
+    def setUp(self):
+        django_cache.clear()
+        self.token_api = emitir_token(self.usuario, self.empresa.id)
+
+    def token_stream(self, token_api):
+        api = APIClient()
+        api.credentials(HTTP_AUTHORIZATION=f'Token {token_api}')
+        return api.post('/api/Creditos/creditos/token-eventos/').json()['token']
+
+    def leer(self, url, al_conectar=None, maximo=20):
+        """Status y mensajes del stream; al_conectar corre después del primer mensaje"""
+        async def leer():
+            respuesta = await AsyncClient().get(url)
+            if not respuesta.streaming:
+                return respuesta.status_code, []
+            mensajes = []
+            async for parte in respuesta.streaming_content:
+                mensajes.append(parte.decode())
+                if len(mensajes) == 1 and al_conectar is not None:
+                    await sync_to_async(al_conectar)()
+                if len(mensajes) >= maximo:
+                    break
+            return respuesta.status_code, mensajes
+        return async_to_sync(leer)()
+
+    def test_con_wsgi_responde_501(self):
+        respuesta = self.client.get(f'{self.URL}?token={self.token_stream(self.token_api)}')
+        self.assertEqual(respuesta.status_code, 501)
+        self.assertFalse(respuesta.streaming)
+        self.assertIn('estado-actual', respuesta.json()['alternativa'])
+
+    def test_token_de_la_api_en_la_url_se_rechaza(self):
+        estado, _ = self.leer(f'{self.URL}?token={self.token_api}')
+        self.assertEqual(estado, 401)
+
+    @override_settings(SSE_TOKEN_MAX_AGE=-1)
+    def test_token_de_stream_vencido_se_rechaza(self):
+        estado, _ = self.leer(f'{self.URL}?token={self.token_stream(self.token_api)}')
+        self.assertEqual(estado, 401)
+
+    def test_revocar_el_token_cierra_el_stream(self):
+        estado, mensajes = self.leer(
+            f'{self.URL}?token={self.token_stream(self.token_api)}',
+            al_conectar=lambda: revocar_token(verificar_token(self.token_api)),
+        )
+        self.assertEqual(estado, 200)
+        self.assertTrue(mensajes[0].startswith('retry:'))
+        self.assertEqual(mensajes[-1], CIERRE_CREDENCIALES)
+
+    def test_cambiar_de_empresa_cierra_el_stream(self):
+        otra = Empresa.objects.create(razon_social='Otra', email_contacto='o@o.com')
+        token_api = emitir_token(self.usuario)
+
+        def mover():
+            self.perfil.empresa = otra
+            self.perfil.save()
+
+        _, mensajes = self.leer(f'{self.URL}?token={self.token_stream(token_api)}', al_conectar=mover)
+        self.assertEqual(mensajes[-1], CIERRE_CREDENCIALES)
+
+    def test_borrar_el_token_de_drf_invalida_el_token_de_stream(self):
+        token = Token.objects.create(user=self.usuario)
+        payload = verificar_token_stream(self.token_stream(token.key))
+        self.assertNotIn(token.key, str(payload))
+        self.assertEqual(usuario_de_token_stream(payload)[0], self.usuario)
+
+        token.delete()
+        self.assertEqual(usuario_de_token_stream(payload), (None, None))
+
+
+class ArchivoCreditosTests(DatosCredito, TestCase):
+    def test_contadores_una_vez_por_lote_sin_recalcular_riesgo(self):
+        for _ in range(3):
+            self.crear_credito(
+                fase_actual='FASE_8_FINALIZADO', enum_estado='FINALIZADO', Fecha_Finalizacion=datetime.date(2024, 2, 10),
+            )
+        vivo = self.crear_credito()
+        procesar_lote()
+        contador = ContadorPipeline.objects.get(
+            empresa=self.empresa, fase_actual='FASE_8_FINALIZADO', enum_estado='FINALIZADO',
+        )
+        self.assertEqual(contador.total, 3)
+
+        with self.captureOnCommitCallbacks() as callbacks, CaptureQueriesContext(connection) as consultas:
+            resumen = archivar_creditos(meses=1, empresa_id=self.empresa.id)
+        self.assertEqual(resumen['creditos'], 3)
+        self.assertEqual(callbacks, [])
+        actualizaciones = [c for c in consultas if c['sql'].startswith('UPDATE "app_Credito_contadorpipeline"')]
+        self.assertEqual(len(actualizaciones), 1)
+
+        contador.refresh_from_db()
+        self.assertEqual(contador.total, 0)
+        self.assertEqual(CreditoArchivado.objects.count(), 3)
+        self.assertEqual(list(Credito.objects.values_list('id', flat=True)), [vivo.id])
+
+
+@override_settings(CACHES=CACHE_EN_MEMORIA)
+class ConsultaArchivadosTests(DatosCredito, TestCase):
+    URL = '/api/Creditos/creditos/'
+
+    def setUp(self):
+        django_cache.clear()
+        self.api = APIClient()
+        self.api.force_authenticate(self.usuario)
+        self.primero = self.crear_credito()
+        self.archivado = self.crear_credito(fase_actual='FASE_8_FINALIZADO', enum_estado='DESENBOLSADO')
+        self.ultimo = self.crear_credito()
+        self.assertEqual(self.api.patch(f'{self.URL}{self.archivado.id}/finalizar/').status_code, 200)
+        Credito.objects.filter(pk=self.archivado.pk).update(Fecha_Finalizacion=datetime.date(2024, 2, 10))
+        self.assertEqual(archivar_creditos(meses=1, empresa_id=self.empresa.id)['creditos'], 1)
+
+    def recorrer(self, **params):
+        vistos, respuesta = [], self.api.get(self.URL, params)
+        while True:
+            self.assertEqual(respuesta.status_code, 200)
+            datos = respuesta.json()
+            vistos += [credito['id'] for credito in datos['results']]
+            if datos['next'] is None:
+                return vistos
+            respuesta = self.api.get(datos['next'])
+
+    def test_finalizar_solo_desembolsados(self):
+        respuesta = self.api.patch(f'{self.URL}{self.primero.id}/finalizar/')
+        self.assertEqual(respuesta.status_code, 400)
+        self.assertEqual(
+            HistoricoCreditoArchivado.objects.get(credito_id=self.archivado.id).fase_nueva, 'FASE_8_FINALIZADO',
+        )
+        self.assertEqual(CreditoArchivado.objects.get(pk=self.archivado.id).enum_estado, 'FINALIZADO')
+
+    def test_listado_mezcla_por_cursor(self):
+        vivos = [self.primero.id, self.ultimo.id]
+        todos = [self.primero.id, self.archivado.id, self.ultimo.id]
+        self.assertEqual(self.recorrer(limit=1), vivos)
+        self.assertEqual(self.recorrer(limit=1, incluir_archivados='true'), todos)
+        self.assertEqual(self.recorrer(limit=2, incluir_archivados='true', fields='id,enum_estado'), todos)
+
+    def test_listado_mezcla_con_empates(self):
+        ahora = timezone.now()
+        Credito.objects.update(fecha_creacion=ahora)
+        CreditoArchivado.objects.update(fecha_creacion=ahora)
+        todos = [self.primero.id, self.archivado.id, self.ultimo.id]
+        self.assertEqual(self.recorrer(limit=1, incluir_archivados='true'), todos)
+
+    def test_detalle(self):
+        url = f'{self.URL}{self.archivado.id}/'
+        self.assertEqual(self.api.get(url).status_code, 404)
+        datos = self.api.get(url, {'incluir_archivados': 'true'}).json()
+        self.assertEqual(datos['id'], self.archivado.id)
+        self.assertEqual(datos['enum_estado'], 'FINALIZADO')
+
+    def test_linea_tiempo_y_estado_actual(self):
+        url = f'{self.URL}{self.archivado.id}/'
+        self.assertEqual(self.api.get(f'{url}linea-tiempo/').status_code, 404)
+        linea = self.api.get(f'{url}linea-tiempo/', {'incluir_archivados': 'true'}).json()
+        self.assertEqual(linea['total_cambios'], 1)
+        self.assertEqual(linea['linea_tiempo'][0]['descripcion'], 'Crédito finalizado')
+
+        estado = self.api.get(f'{url}estado-actual/', {'incluir_archivados': 'true'}).json()
+        self.assertEqual(estado['estado'], 'FINALIZADO')
+        self.assertEqual(estado['cliente']['nombre'], 'Ana')
+
+    def test_acciones_de_escritura_no_ven_archivados(self):
+        respuesta = self.api.patch(f'{self.URL}{self.archivado.id}/finalizar/?incluir_archivados=true')
+        self.assertEqual(respuesta.status_code, 404)
+
+    def test_archivados_de_otra_empresa(self):
+        otra = Empresa.objects.create(razon_social='Otra', email_contacto='o@o.com')
+        usuario = User.objects.create(username='ajeno')
+        Perfiluser.objects.create(usuario=usuario, empresa=otra)
+        self.api.force_authenticate(usuario)
+        respuesta = self.api.get(f'{self.URL}{self.archivado.id}/', {'incluir_archivados': 'true'})
+        self.assertEqual(respuesta.status_code, 404)
+        self.assertEqual(self.recorrer(incluir_archivados='true'), [])
+
+
+@skipUnless(connection.vendor == 'postgresql', "El particionado necesita PostgreSQL")
+class ParticionesHistorialTests(DatosCredito, TestCase):
+    def setUp(self):
+        self.vivo = self.crear_credito()
+        self.finalizado = self.crear_credito(
+            fase_actual='FASE_8_FINALIZADO', enum_estado='FINALIZADO', Fecha_Finalizacion=datetime.date(2024, 2, 10),
+        )
+        HistoricoCredito.objects.all().delete()
+        self.historicos = [
+            self.historico(self.vivo, datetime.datetime(2024, 1, 15)),
+            self.historico(self.finalizado, datetime.datetime(2024, 2, 15)),
+        ]
+
+    def historico(self, credito, fecha):
+        fila = HistoricoCredito.objects.create(credito=credito, fase_nueva='FASE_1_SOLICITUD')
+        HistoricoCredito.objects.filter(id=fila.id).update(fecha_cambio=timezone.make_aware(fecha))
+        return fila.id
+
+    def particionada(self):
+        with connection.cursor() as cursor:
+            return particiones.esta_particionada(cursor)
+
+    def convertir(self):
+        call_command('particiones_historial', convertir=True, stdout=StringIO())
+        self.assertTrue(self.particionada())
+
+    def test_migrate_deja_la_tabla_particionada(self):
+        self.assertTrue(self.particionada())
+
+    def test_convertir_conserva_filas_e_ids(self):
+        particiones.convertir_a_tabla_simple()
+        self.convertir()
+        self.assertFalse(particiones.convertir_a_particionada())
+        self.assertEqual(sorted(HistoricoCredito.objects.values_list('id', flat=True)), self.historicos)
+        nuevo = HistoricoCredito.objects.create(credito=self.vivo, fase_nueva='FASE_2_DOCUMENTACION')
+        self.assertGreater(nuevo.id, max(self.historicos))
+
+        self.vivo.delete()
+        self.assertFalse(HistoricoCredito.objects.filter(credito_id=self.vivo.id).exists())
+
+    def test_revertir(self):
+        self.convertir()
+        call_command('particiones_historial', revertir=True, stdout=StringIO())
+        self.assertFalse(self.particionada())
+        self.assertEqual(sorted(HistoricoCredito.objects.values_list('id', flat=True)), self.historicos)
+        nuevo = HistoricoCredito.objects.create(credito=self.vivo, fase_nueva='FASE_2_DOCUMENTACION')
+        self.assertGreater(nuevo.id, max(self.historicos))
+
+    def test_migracion_0020_particiona_la_tabla_simple(self):
+        particiones.convertir_a_tabla_simple()
+        migracion = import_module('app_Credito.migrations.0020_historicocredito_particionada')
+        with connection.schema_editor() as schema_editor:
+            migracion.particionar_si_falta(None, schema_editor)
+            migracion.particionar_si_falta(None, schema_editor)
+        self.assertTrue(self.particionada())
+        self.assertEqual(sorted(HistoricoCredito.objects.values_list('id', flat=True)), self.historicos)
+        self.assertIn(particiones.nombre_particion(datetime.date(2024, 1, 1)), dict(self.listar()))
+        nuevo = HistoricoCredito.objects.create(credito=self.vivo, fase_nueva='FASE_2_DOCUMENTACION')
+        self.assertGreater(nuevo.id, max(self.historicos))
+
+    def listar(self):
+        with connection.cursor() as cursor:
+            return particiones.listar_particiones(cursor)
+
+    def test_archiva_solo_meses_sin_creditos_vivos(self):
+        # Las filas de meses sin partición están en la de defecto: crear_particiones las mueve
+        self.assertIn(
+            particiones.nombre_particion(datetime.date(2024, 1, 1)),
+            particiones.crear_particiones(desde=datetime.date(2024, 1, 1)),
+        )
+        enero = particiones.nombre_particion(datetime.date(2024, 1, 1))
+        febrero = particiones.nombre_particion(datetime.date(2024, 2, 1))
+        # El crédito finalizado todavía no se archivó: ningún mes se desacopla
+        self.assertEqual(particiones.archivar_particiones(datetime.date(2024, 3, 1)), ([], [enero, febrero]))
+
+        archivar_creditos(meses=1, empresa_id=self.empresa.id)
+        self.assertTrue(HistoricoCreditoArchivado.objects.filter(credito_id=self.finalizado.id).exists())
+        self.assertEqual(particiones.archivar_particiones(datetime.date(2024, 3, 1)), ([febrero], [enero]))
+        self.assertEqual(list(self.vivo.historico.values_list('id', flat=True)), self.historicos[:1])
@@ -3,6 +3,7 @@ from rest_framework.routers import DefaultRouter
 from .api_rest import CreditoViewSet, TipoCreditoViewSet
 from .api import HistorialCreditoView, HistorialCreditoCIView , EstadoCreditoCIView
 from .api_test import test_tipo_credito
+from .views import eventos_credito
 
 router = DefaultRouter()
 router.register(r'creditos', CreditoViewSet, basename='credito')
@@ -13,5 +14,6 @@ urlpatterns = [
     path('historial/', HistorialCreditoView.as_view(), name='historial-credito'),
     path('historial/<str:ci>/', HistorialCreditoCIView.as_view(), name='historial-credito-ci'),
     path('estado-credito/<str:ci>/', EstadoCreditoCIView.as_view(), name='estado-credito-ci'),
+    path('eventos/', eventos_credito, name='eventos-credito'),
     path('test/tipos/', test_tipo_credito, name='test-tipos-credito'),
 ]
@@ -1,3 +1,102 @@
-from django.shortcuts import render
+from asgiref.sync import sync_to_async
+from django.core import signing
+from django.core.handlers.asgi import ASGIRequest
+from django.http import JsonResponse, StreamingHttpResponse
+from django.views.decorators.http import require_GET
+from rest_framework import exceptions
 
-# Create your views here.
+from app_User.authentication import SignedTokenAuthentication
+from app_User.tenant import perfil_de_token, resolver_perfil
+from .eventos import stream_eventos, usuario_de_token_stream, verificar_token_stream
+
+
+def _sin_credencial():
+    return None, None
+
+
+def _credencial(request):
+    """
+    Función sin argumentos que valida la credencial de la conexión y devuelve
+    (usuario, auth), o (None, None) si no vale; se vuelve a llamar durante el
+    stream para revalidarla
+
+    La credencial es el token del header Authorization o un token de stream en
+    ?token= (EventSource del navegador no permite enviar headers). Un token de
+    la API en ?token= se rechaza: quedaría en los logs de acceso.
+    """
+    palabra, _, token = request.headers.get('Authorization', '').partition(' ')
+    token = token.strip()
+    if palabra == SignedTokenAuthentication.keyword and token:
+        def validar():
+            try:
+                return SignedTokenAuthentication().authenticate_credentials(token)
+            except exceptions.AuthenticationFailed:
+                return None, None
+        return validar
+
+    try:
+        # La vigencia del token de stream solo cuenta para conectarse
+        payload = verificar_token_stream(request.GET.get('token', '').strip())
+    except signing.BadSignature:
+        return _sin_credencial
+    return lambda: usuario_de_token_stream(payload)
+
+
+def _resolver(validar):
+    """(usuario, perfil) de la credencial; perfil None si no tiene o no es el de la empresa del token"""
+    usuario, auth = validar()
+    if usuario is None:
+        return None, None
+    perfil = resolver_perfil(usuario)
+    if perfil is None or not perfil_de_token(perfil, auth):
+        return usuario, None
+    return usuario, perfil
+
+
+@require_GET
+async def eventos_credito(request):
+    """
+    Stream SSE de los cambios de fase de los créditos de la empresa del usuario
+
+    Vista asíncrona: debe servirse con un servidor ASGI (Raiz_Project/asgi.py)
+    para que cada conexión abierta no ocupe un thread. Con WSGI responde 501:
+    el stream no termina nunca y Django lo acumularía entero antes de enviarlo.
+    La credencial y el perfil se revalidan cada SSE_LATIDO segundos (ver
+    app_Credito/eventos.py).
+
+    Headers / query params:
+        Authorization: Token <token de la API>, o ?token=<token de stream> (token-eventos)
+        Last-Event-ID (o ?ultimo_evento=): id del último evento recibido, para retomar
+    """
+    if not isinstance(request, ASGIRequest):
+        return JsonResponse({
+            'error': "El stream de eventos necesita un servidor ASGI (uvicorn Raiz_Project.asgi:application)",
+            'alternativa': "GET /api/Creditos/creditos/{id}/estado-actual/ con If-None-Match",
+        }, status=501)
+
+    validar = _credencial(request)
+    usuario, perfil = await sync_to_async(_resolver)(validar)
+    if usuario is None:
+        return JsonResponse({'detail': 'Las credenciales de autenticación no se proveyeron.'}, status=401)
+    if perfil is None:
+        return JsonResponse({"error": "Usuario no tiene perfil asociado"}, status=403)
+
+    ultimo = request.headers.get('Last-Event-ID') or request.GET.get('ultimo_evento')
+    if ultimo is not None:
+        if not ultimo.isdigit():
+            return JsonResponse({'error': 'Last-Event-ID debe ser un número entero'}, status=400)
+        ultimo = int(ultimo)
+
+    empresa_id = perfil.empresa_id
+
+    async def vigente():
+        _, actual = await sync_to_async(_resolver)(validar)
+        return actual is not None and actual.empresa_id == empresa_id
+
+    respuesta = StreamingHttpResponse(
+        stream_eventos(empresa_id, ultimo, vigente=vigente), content_type='text/event-stream',
+    )
+    respuesta['Cache-Control'] = 'no-cache'
+    # nginx no debe acumular el stream
+    respuesta['X-Accel-Buffering'] = 'no'
+    return respuesta
@@ -1,46 +1,192 @@
 """
 Servicios y funciones para manejar el workflow de créditos
 """
+import base64
+import datetime
+import json
+from collections import Counter
+
+from django.db import transaction
+from django.db.models import Q
 from django.utils import timezone
-from .models import Credito, HistoricoCredito, ENUM_FASE_CREDITO
+from .models import Credito, HistoricoCredito, EventoOutbox, ENUM_FASE_CREDITO
+from .outbox import evento_fase, notificar_eventos
+from .pipeline import ajustar_contadores, registrar_cambio
 from app_Cliente.models import Documentacion, Trabajo, Domicilio, Garante
-from rest_framework.exceptions import ValidationError
+from rest_framework import status
+from rest_framework.exceptions import APIException, ValidationError
+
 
+class ConflictoFase(APIException):
+    """El crédito cambió de fase mientras se procesaba la acción (otro usuario ganó la carrera)"""
+    status_code = status.HTTP_409_CONFLICT
+    default_detail = 'El crédito fue modificado por otro usuario. Recargue e intente de nuevo.'
+    default_code = 'conflicto_fase'
 
-def cambiar_fase(credito, fase_nueva, usuario, descripcion="", datos_agregados=None):
+
+def cambiar_fase(credito, fase_nueva, usuario, descripcion="", datos_agregados=None, campos=None):
     """
     Cambia el crédito a una nueva fase y registra en el histórico
     
+    El cambio se aplica como un UPDATE condicional (compare-and-swap) sobre la
+    fase y el estado que tenía el crédito al leerlo, actualizando solo las
+    columnas que cambian; el histórico, el evento del outbox y los contadores del
+    pipeline se escriben en la misma transacción. Si el UPDATE afecta la fila, la
+    (fase, estado) anterior es exactamente la que reemplazó.
+    
     Args:
         credito: Objeto Credito
         fase_nueva: Nueva fase (debe ser una opción válida en ENUM_FASE_CREDITO)
         usuario: Usuario que realiza el cambio
         descripcion: Descripción del cambio
         datos_agregados: Dict con datos agregados en esta fase
+        campos: Dict con otros campos del crédito a actualizar junto con la fase
+                (p. ej. {'enum_estado': 'Aprobado', 'Fecha_Aprobacion': hoy})
     
     Returns:
         HistoricoCredito creado
+    
+    Raises:
+        ConflictoFase si el crédito ya no está en la fase esperada
     """
     if datos_agregados is None:
         datos_agregados = {}
     
-    # Crear registro en histórico
-    historico = HistoricoCredito.objects.create(
-        credito=credito,
-        fase_anterior=credito.fase_actual,
-        fase_nueva=fase_nueva,
-        usuario_cambio=usuario,
-        descripcion=descripcion,
-        datos_agregados=datos_agregados
-    )
+    fase_anterior = credito.fase_actual
+    estado_anterior = credito.enum_estado
+    valores = dict(campos or {})
+    valores['fase_actual'] = fase_nueva
+    valores['fecha_actualizacion'] = timezone.now()
     
-    # Actualizar la fase actual del crédito
-    credito.fase_actual = fase_nueva
-    credito.save()
+    with transaction.atomic():
+        actualizados = Credito.objects.filter(
+            pk=credito.pk,
+            fase_actual=fase_anterior,
+            enum_estado=estado_anterior,
+        ).update(**valores)
+        
+        if not actualizados:
+            raise ConflictoFase()
+        
+        # Crear registro en histórico
+        historico = HistoricoCredito.objects.create(
+            credito=credito,
+            fase_anterior=fase_anterior,
+            fase_nueva=fase_nueva,
+            usuario_cambio=usuario,
+            descripcion=descripcion,
+            datos_agregados=datos_agregados
+        )
+        
+        estado_nuevo = valores.get('enum_estado', estado_anterior)
+        evento_fase(credito, historico, estado_anterior, estado_nuevo).save()
+        ajustar_contadores(registrar_cambio(
+            credito.empresa_id, (fase_anterior, estado_anterior), (fase_nueva, estado_nuevo),
+        ))
+        notificar_eventos([credito.empresa_id])
+    
+    # Reflejar los cambios en la instancia en memoria
+    for campo, valor in valores.items():
+        setattr(credito, campo, valor)
     
     return historico
 
 
+def cambiar_fase_lote(queryset, ids, fase_requerida, fase_nueva, usuario, descripcion="", campos=None, validar=None):
+    """
+    Cambia de fase varios créditos a la vez
+    
+    Bloquea las filas (SELECT ... FOR UPDATE), valida cada crédito contra la
+    secuencia de fases y escribe el lote con un solo bulk_update del crédito y
+    un solo bulk_create del histórico, dentro de una transacción; los contadores
+    del pipeline se ajustan una vez por lote.
+    
+    Args:
+        queryset: QuerySet de créditos visibles para el usuario (multitenancy)
+        ids: Lista de IDs de créditos
+        fase_requerida: Fase en la que debe estar cada crédito
+        fase_nueva: Fase a la que pasa cada crédito
+        usuario: Usuario que realiza el cambio
+        descripcion: Descripción del cambio
+        campos: Dict con otros campos del crédito a actualizar junto con la fase
+        validar: Función opcional validar(credito) que lanza ValidationError
+    
+    Returns:
+        Lista de dict con el resultado por ID, en el orden recibido
+    """
+    valores = dict(campos or {})
+    valores['fase_actual'] = fase_nueva
+    valores['fecha_actualizacion'] = timezone.now()
+    
+    resultados = {}
+    validos = []
+    
+    with transaction.atomic():
+        creditos = queryset.select_for_update().filter(pk__in=ids).in_bulk()
+        
+        for credito_id in ids:
+            credito = creditos.get(credito_id)
+            if credito is None:
+                resultados[credito_id] = {'id': credito_id, 'ok': False, 'error': 'Crédito no encontrado'}
+                continue
+            try:
+                if credito.fase_actual != fase_requerida:
+                    raise ValidationError(f"Debe estar en {fase_requerida}, actualmente está en {credito.fase_actual}")
+                if fase_nueva != fase_requerida:
+                    validar_fase_secuencial(credito.fase_actual, fase_nueva)
+                if validar:
+                    validar(credito)
+            except ValidationError as e:
+                detalle = e.detail[0] if isinstance(e.detail, list) else e.detail
+                resultados[credito_id] = {'id': credito_id, 'ok': False, 'error': str(detalle)}
+                continue
+            validos.append(credito)
+        
+        historicos = []
+        estados_anteriores = []
+        deltas = Counter()
+        for credito in validos:
+            estados_anteriores.append(credito.enum_estado)
+            registrar_cambio(
+                credito.empresa_id,
+                (credito.fase_actual, credito.enum_estado),
+                (fase_nueva, valores.get('enum_estado', credito.enum_estado)),
+                deltas,
+            )
+            historicos.append(HistoricoCredito(
+                credito=credito,
+                fase_anterior=credito.fase_actual,
+                fase_nueva=fase_nueva,
+                usuario_cambio=usuario,
+                descripcion=descripcion,
+            ))
+            for campo, valor in valores.items():
+                setattr(credito, campo, valor)
+        
+        if validos:
+            Credito.objects.bulk_update(validos, list(valores), batch_size=500)
+            HistoricoCredito.objects.bulk_create(historicos, batch_size=500)
+            EventoOutbox.objects.bulk_create(
+                [
+                    evento_fase(credito, historico, estado_anterior, credito.enum_estado)
+                    for credito, historico, estado_anterior in zip(validos, historicos, estados_anteriores)
+                ],
+                batch_size=500,
+            )
+            ajustar_contadores(deltas)
+            notificar_eventos(credito.empresa_id for credito in validos)
+    
+    for credito in validos:
+        resultados[credito.id] = {
+            'id': credito.id,
+            'ok': True,
+            'fase_nueva': credito.fase_actual,
+            'estado': credito.enum_estado,
+        }
+    
+    return [resultados[credito_id] for credito_id in ids]
+
+
 def validar_fase_secuencial(fase_actual, fase_solicitada):
     """
     Valida que la fase solicitada sea la siguiente en la secuencia
@@ -78,54 +224,129 @@ def validar_fase_secuencial(fase_actual, fase_solicitada):
         )
 
 
-def obtener_linea_tiempo(credito):
+# Campos que se pueden pedir en la línea de tiempo (?fields=) → columna a consultar
+CAMPOS_LINEA_TIEMPO = {
+    'id': 'id',
+    'fase_anterior': 'fase_anterior',
+    'fase_nueva': 'fase_nueva',
+    'fecha_cambio': 'fecha_cambio',
+    'usuario': 'usuario_cambio__username',
+    'descripcion': 'descripcion',
+    'datos_agregados': 'datos_agregados',
+}
+CAMPOS_LINEA_TIEMPO_DEFAULT = ('fase_anterior', 'fase_nueva', 'fecha_cambio', 'usuario', 'descripcion', 'datos_agregados')
+
+
+def codificar_cursor(fecha_cambio, evento_id):
+    """Codifica la posición (fecha_cambio, id) de un evento como cursor opaco"""
+    valor = json.dumps([fecha_cambio.isoformat(), evento_id])
+    return base64.urlsafe_b64encode(valor.encode()).decode()
+
+
+def decodificar_cursor(cursor):
+    """
+    Raises:
+        ValidationError si el cursor no es válido
     """
-    Obtiene la línea de tiempo completa de un crédito
+    try:
+        fecha, evento_id = json.loads(base64.urlsafe_b64decode(cursor.encode()))
+        fecha_cambio = datetime.datetime.fromisoformat(fecha)
+        return fecha_cambio, int(evento_id)
+    except (ValueError, TypeError):
+        raise ValidationError("Cursor inválido")
+
+
+def obtener_linea_tiempo(credito, limite=None, cursor=None, campos=None):
+    """
+    Obtiene la línea de tiempo de un crédito, del evento más reciente al más antiguo
+    
+    El usuario se trae en la misma consulta y la paginación es por keyset sobre
+    (fecha_cambio, id), así que cada página cuesta una sola consulta indexada.
     
     Args:
-        credito: Objeto Credito
+        credito: Objeto Credito o CreditoArchivado
+        limite: Máximo de eventos a devolver (None = todos)
+        cursor: Cursor devuelto por la página anterior
+        campos: Iterable con los campos a incluir (ver CAMPOS_LINEA_TIEMPO)
     
     Returns:
-        Lista de dict con el histórico formateado
+        Tupla (lista de dict con el histórico formateado, cursor de la siguiente página o None)
     """
-    historico = HistoricoCredito.objects.filter(credito=credito)
+    campos = tuple(campos) if campos else CAMPOS_LINEA_TIEMPO_DEFAULT
+    invalidos = [c for c in campos if c not in CAMPOS_LINEA_TIEMPO]
+    if invalidos:
+        raise ValidationError(f"Campos inválidos: {', '.join(invalidos)}")
+    
+    # credito.historico es HistoricoCredito o, para un CreditoArchivado, HistoricoCreditoArchivado
+    historico = credito.historico.order_by('-fecha_cambio', '-id')
+    
+    if cursor:
+        fecha_cambio, evento_id = decodificar_cursor(cursor)
+        historico = historico.filter(
+            Q(fecha_cambio__lt=fecha_cambio) | Q(fecha_cambio=fecha_cambio, id__lt=evento_id)
+        )
+    
+    columnas = {'id', 'fecha_cambio'} | {CAMPOS_LINEA_TIEMPO[c] for c in campos}
+    historico = historico.values(*columnas)
+    
+    if limite is not None:
+        # Se pide un evento extra para saber si hay una página siguiente
+        eventos = list(historico[:limite + 1])
+        hay_mas = len(eventos) > limite
+        eventos = eventos[:limite]
+    else:
+        eventos = list(historico)
+        hay_mas = False
     
     linea_tiempo = []
-    for evento in historico:
-        linea_tiempo.append({
-            'fase_anterior': evento.fase_anterior,
-            'fase_nueva': evento.fase_nueva,
-            'fecha_cambio': evento.fecha_cambio,
-            'usuario': evento.usuario_cambio.username if evento.usuario_cambio else 'Sistema',
-            'descripcion': evento.descripcion,
-            'datos_agregados': evento.datos_agregados,
-        })
+    for evento in eventos:
+        item = {campo: evento[CAMPOS_LINEA_TIEMPO[campo]] for campo in campos}
+        if 'usuario' in item and item['usuario'] is None:
+            item['usuario'] = 'Sistema'
+        linea_tiempo.append(item)
+    
+    siguiente_cursor = None
+    if hay_mas:
+        ultimo = eventos[-1]
+        siguiente_cursor = codificar_cursor(ultimo['fecha_cambio'], ultimo['id'])
     
-    return linea_tiempo
+    return linea_tiempo, siguiente_cursor
 
 
 def obtener_estado_actual(credito):
     """
     Obtiene el estado actual del crédito con información detallada
     
+    Carga el agregado completo (cliente → documentación/trabajo/domicilio → garante)
+    en una sola consulta, para reflejar los datos recién guardados por el workflow.
+    
     Args:
-        credito: Objeto Credito
+        credito: Objeto Credito o CreditoArchivado
     
     Returns:
         Dict con el estado actual
     """
+    credito = credito._meta.model.objects.select_related(
+        'cliente',
+        'cliente__documentacion',
+        'cliente__trabajo',
+        'cliente__domicilio',
+        'cliente__domicilio__garante',
+    ).get(pk=credito.pk)
+    cliente = credito.cliente
+    
     # Información del cliente
     cliente_info = {
-        'id': credito.cliente.id,
-        'nombre': credito.cliente.nombre,
-        'apellido': credito.cliente.apellido,
-        'telefono': credito.cliente.telefono,
+        'id': cliente.id,
+        'nombre': cliente.nombre,
+        'apellido': cliente.apellido,
+        'telefono': cliente.telefono,
     }
     
     # Información de documentación
     documentacion_info = {}
     try:
-        doc = Documentacion.objects.get(id_cliente=credito.cliente)
+        doc = cliente.documentacion
         documentacion_info = {
             'ci': doc.ci,
             'documento_url': doc.documento_url,
@@ -136,7 +357,7 @@ def obtener_estado_actual(credito):
     # Información laboral
     laboral_info = {}
     try:
-        trabajo = Trabajo.objects.get(id_cliente=credito.cliente)
+        trabajo = cliente.trabajo
         laboral_info = {
             'cargo': trabajo.cargo,
             'empresa': trabajo.empresa,
@@ -146,30 +367,23 @@ def obtener_estado_actual(credito):
     except Trabajo.DoesNotExist:
         pass
     
-    # Información de domicilio
+    # Información de domicilio y garante
     domicilio_info = {}
+    garante_info = {}
     try:
-        domicilio = Domicilio.objects.get(id_cliente=credito.cliente)
+        domicilio = cliente.domicilio
         domicilio_info = {
             'descripcion': domicilio.descripcion,
             'es_propietario': domicilio.es_propietario,
             'croquis_url': domicilio.croquis_url,
             'numero_ref': domicilio.numero_ref,
         }
-    except Domicilio.DoesNotExist:
-        pass
-    
-    # Información de garante
-    garante_info = {}
-    try:
-        if domicilio_info:
-            domicilio = Domicilio.objects.get(id_cliente=credito.cliente)
-            garante = Garante.objects.get(id_domicilio=domicilio)
-            garante_info = {
-                'nombrecompleto': garante.nombrecompleto,
-                'ci': garante.ci,
-                'telefono': garante.telefono,
-            }
+        garante = domicilio.garante
+        garante_info = {
+            'nombrecompleto': garante.nombrecompleto,
+            'ci': garante.ci,
+            'telefono': garante.telefono,
+        }
     except (Domicilio.DoesNotExist, Garante.DoesNotExist):
         pass
     
@@ -5,6 +5,7 @@ from rest_framework.response import Response
 from rest_framework.parsers import JSONParser, FormParser, MultiPartParser
 from app_Empresa.models import Empresa, Suscripcion , on_premise , Configuracion
 from app_User.models import Perfiluser
+from app_User.tenant import get_perfil
 from .s3_utils import upload_empresa_logo, upload_user_avatar
 import traceback
 
@@ -16,7 +17,7 @@ class ConfiguracionViewSet(viewsets.ModelViewSet):
         """Filtrar configuraciones por empresa del usuario"""
         user = self.request.user
         try:
-            perfil = Perfiluser.objects.get(usuario=user)
+            perfil = get_perfil(self.request)
             return Configuracion.objects.filter(empresa=perfil.empresa)
         except Perfiluser.DoesNotExist:
             return Configuracion.objects.none()
@@ -24,7 +25,7 @@ class ConfiguracionViewSet(viewsets.ModelViewSet):
     def perform_create(self, serializer):
         """Auto-asignar empresa al crear configuración"""
         try:
-            perfil = Perfiluser.objects.get(usuario=self.request.user)
+            perfil = get_perfil(self.request)
             serializer.save(empresa=perfil.empresa)
         except Perfiluser.DoesNotExist:
             pass
@@ -67,7 +68,7 @@ class SuscripcionViewSet(viewsets.ModelViewSet):
         """Filtrar suscripciones por empresa del usuario"""
         user = self.request.user
         try:
-            perfil = Perfiluser.objects.get(usuario=user)
+            perfil = get_perfil(self.request)
             return Suscripcion.objects.filter(empresa=perfil.empresa)
         except Perfiluser.DoesNotExist:
             return Suscripcion.objects.none()
@@ -75,7 +76,7 @@ class SuscripcionViewSet(viewsets.ModelViewSet):
     def perform_create(self, serializer):
         """Auto-asignar empresa al crear suscripción"""
         try:
-            perfil = Perfiluser.objects.get(usuario=self.request.user)
+            perfil = get_perfil(self.request)
             serializer.save(empresa=perfil.empresa)
         except Perfiluser.DoesNotExist:
             pass
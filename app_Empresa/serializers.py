@@ -11,6 +11,10 @@ from datetime import timedelta
 from django.utils import timezone
 from .models import Configuracion
 from .s3_utils import upload_empresa_logo, upload_user_avatar 
+from django.core import signing
+from app_User.signed_tokens import (
+    tokens_firmados_activos, es_token_firmado, emitir_token, verificar_token, revocar_token
+)
 
 class ConfiguracionSerializer(ModelSerializer):
     class Meta:
@@ -158,14 +162,18 @@ class RegisterEmpresaUserSerializer(Serializer):
         
         perfil_user = Perfiluser.objects.create(**perfil_data)
         
-        # Crear token para el usuario
-        token, created = Token.objects.get_or_create(user=user)
+        # Crear token para el usuario (firmado si AUTH_SIGNED_TOKENS está activo)
+        if tokens_firmados_activos():
+            token_key = emitir_token(user, empresa.id)
+        else:
+            token, created = Token.objects.get_or_create(user=user)
+            token_key = token.key
         
         return {
             'empresa': empresa,
             'user': user,
             'perfil_user': perfil_user,
-            'token': token.key
+            'token': token_key
         }
 
 
@@ -203,12 +211,9 @@ class LoginSerializer(Serializer):
     def create(self, validated_data):
         user = validated_data['user']
         
-        # Crear o obtener token
-        token, created = Token.objects.get_or_create(user=user)
-        
         # Obtener perfil de usuario y empresa
         try:
-            perfil_user = Perfiluser.objects.get(usuario=user)
+            perfil_user = Perfiluser.objects.select_related('empresa').get(usuario=user)
             empresa = perfil_user.empresa
             empresa_id = empresa.id
             empresa_nombre = empresa.razon_social
@@ -216,8 +221,15 @@ class LoginSerializer(Serializer):
             empresa_id = None
             empresa_nombre = None
         
+        # Token firmado (sin estado) si AUTH_SIGNED_TOKENS está activo; si no, crear u obtener token
+        if tokens_firmados_activos():
+            token_key = emitir_token(user, empresa_id)
+        else:
+            token, created = Token.objects.get_or_create(user=user)
+            token_key = token.key
+        
         return {
-            'token': token.key,
+            'token': token_key,
             'user_id': user.id,
             'username': user.username,
             'email': user.email,
@@ -233,6 +245,11 @@ class LogoutSerializer(Serializer):
     token = serializers.CharField()
     
     def validate_token(self, value):
+        if es_token_firmado(value):
+            try:
+                return verificar_token(value)
+            except signing.BadSignature:
+                raise serializers.ValidationError("Token inválido")
         try:
             token = Token.objects.get(key=value)
             return token
@@ -241,7 +258,11 @@ class LogoutSerializer(Serializer):
     
     def create(self, validated_data):
         token = validated_data['token']
-        token.delete()
+        if isinstance(token, dict):
+            # Token firmado: no hay fila que borrar, se agrega a la lista de revocación
+            revocar_token(token)
+        else:
+            token.delete()
         return {'message': 'Logout exitoso'}
 
 
@@ -14,6 +14,7 @@ from rest_framework.exceptions import ValidationError
 from app_User.models import Perfiluser
 from app_Empresa.models import Empresa
 from .models import Perfiluser
+from .tenant import get_perfil, tenant_cache
 
 
 # drf-spectacular is optional; if not installed, provide a no-op decorator.
@@ -33,7 +34,7 @@ class UserViewSer(viewsets.ModelViewSet):
     def get_queryset(self):
         """Filtrar usuarios por empresa del usuario autenticado (multitenancy)"""
         try:
-            perfil = Perfiluser.objects.get(usuario=self.request.user)
+            perfil = get_perfil(self.request)
             # Retornar solo los usuarios de la empresa del usuario
             return User.objects.filter(
                 perfiluser__empresa=perfil.empresa
@@ -45,7 +46,7 @@ class UserViewSer(viewsets.ModelViewSet):
     def perform_create(self, serializer):
         """Auto-asignar la empresa al crear usuario"""
         try:
-            perfil = Perfiluser.objects.get(usuario=self.request.user)
+            perfil = get_perfil(self.request)
             serializer.save(empresa=perfil.empresa)
         except Perfiluser.DoesNotExist:
             raise ValidationError("Usuario no tiene perfil asociado")
@@ -58,7 +59,7 @@ class GroupViewSet(viewsets.ModelViewSet):
     def get_queryset(self):
         """Filtrar grupos por empresa del usuario autenticado (multitenancy)"""
         try:
-            perfil = Perfiluser.objects.get(usuario=self.request.user)
+            perfil = get_perfil(self.request)
             # Retornar solo los grupos de la empresa del usuario
             return Group.objects.filter(
                 descripcion_obj__empresa=perfil.empresa
@@ -71,7 +72,7 @@ class GroupViewSet(viewsets.ModelViewSet):
         """Crear grupo asociado a la empresa del usuario autenticado"""
         try:
             # Verificar que el usuario tiene perfil
-            perfil = Perfiluser.objects.get(usuario=request.user)
+            perfil = get_perfil(request)
             
             # Hacer una copia mutable del request.data si es necesario
             if hasattr(request.data, '_mutable'):
@@ -128,7 +129,7 @@ class CreateUserView(APIView):
 
         # Obtener empresa del admin (perfil)
         try:
-            admin_perfil = Perfiluser.objects.get(usuario=request.user)
+            admin_perfil = get_perfil(request)
         except Perfiluser.DoesNotExist:
             return Response({'error': 'Administrador no tiene perfil asociado'}, status=status.HTTP_403_FORBIDDEN)
 
@@ -254,7 +255,7 @@ class MeView(APIView):
         
         # Obtener perfil y empresa
         try:
-            perfil = Perfiluser.objects.get(usuario=user)
+            perfil = get_perfil(request)
             empresa_data = {
                 'id': perfil.empresa.id,
                 'razon_social': perfil.empresa.razon_social,
@@ -320,7 +321,7 @@ class UserGroupView(APIView):
         """Listar todas las relaciones usuario-grupo (filtradas por empresa en multitenancy)"""
         try:
             # Filtrar por empresa del usuario autenticado
-            perfil = Perfiluser.objects.get(usuario=request.user)
+            perfil = get_perfil(request)
             
             # Obtener todos los usuarios de la misma empresa
             usuarios_empresa = User.objects.filter(perfiluser__empresa=perfil.empresa)
@@ -350,7 +351,7 @@ class UserGroupView(APIView):
         if serializer.is_valid():
             try:
                 # Validar que el usuario pertenece a la misma empresa (multitenancy)
-                perfil_request = Perfiluser.objects.get(usuario=request.user)
+                perfil_request = get_perfil(request)
                 user_id = serializer.validated_data['user_id']
                 
                 try:
@@ -394,7 +395,7 @@ class UserGroupView(APIView):
         
         try:
             # Validar que el usuario pertenece a la misma empresa (multitenancy)
-            perfil_request = Perfiluser.objects.get(usuario=request.user)
+            perfil_request = get_perfil(request)
             
             try:
                 perfil_target = Perfiluser.objects.get(usuario_id=user_id)
@@ -439,4 +440,16 @@ class UserGroupView(APIView):
             return Response(
                 {'error': f'Error al remover usuario del grupo: {str(e)}'}, 
                 status=status.HTTP_500_INTERNAL_SERVER_ERROR
-            )
\ No newline at end of file
+            )
+
+
+class TenantCacheStatsView(APIView):
+    """
+    Contadores del caché de tenant del proceso que atiende la petición.
+
+    GET /api/User/tenant-cache/
+    """
+    permission_classes = [permissions.IsAdminUser]
+
+    def get(self, request):
+        return Response(tenant_cache.stats(), status=status.HTTP_200_OK)
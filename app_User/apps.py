@@ -4,3 +4,8 @@ from django.apps import AppConfig
 class AppUserConfig(AppConfig):
     default_auto_field = 'django.db.models.BigAutoField'
     name = 'app_User'
+
+    def ready(self):
+        # Registrar señales de invalidación del caché de tenant
+        from . import signals  # noqa: F401
+        from . import checks  # noqa: F401
@@ -0,0 +1,99 @@
+"""
+Autenticación por token con caché de la resolución token → usuario
+"""
+from django.conf import settings
+from django.contrib.auth.models import User
+from django.core import signing
+from django.utils.translation import gettext_lazy as _
+from rest_framework import exceptions
+from rest_framework.authentication import TokenAuthentication
+
+from app_User.cache import LRUCache
+from app_User.signed_tokens import es_token_firmado, verificar_token
+
+
+token_cache = LRUCache(
+    'auth_token',
+    maxsize=getattr(settings, 'AUTH_TOKEN_CACHE_MAXSIZE', 4096),
+    timeout=getattr(settings, 'AUTH_TOKEN_CACHE_TIMEOUT', 60),
+    use_django_cache=getattr(settings, 'AUTH_TOKEN_CACHE_USE_DJANGO_CACHE', True),
+)
+
+# Usuarios de los tokens firmados, que no pasan por authtoken_token
+user_cache = LRUCache(
+    'auth_user',
+    maxsize=getattr(settings, 'AUTH_TOKEN_CACHE_MAXSIZE', 4096),
+    timeout=getattr(settings, 'AUTH_TOKEN_CACHE_TIMEOUT', 60),
+    use_django_cache=getattr(settings, 'AUTH_TOKEN_CACHE_USE_DJANGO_CACHE', True),
+)
+
+
+class CachedTokenAuthentication(TokenAuthentication):
+    """
+    Reemplazo directo de TokenAuthentication.
+
+    Guarda el token (con su usuario) durante AUTH_TOKEN_CACHE_TIMEOUT segundos
+    para no consultar authtoken_token + auth_user en cada request. Las entradas
+    viven en el caché compartido (CACHES) y se invalidan al borrar el token
+    (logout) y al guardar el usuario (p. ej. desactivación), ver
+    app_User/signals.py: el cambio vale en todos los workers desde la siguiente
+    petición.
+    """
+
+    def authenticate_credentials(self, key):
+        encontrado, token = token_cache.get(key)
+        if not encontrado:
+            model = self.get_model()
+            try:
+                token = model.objects.select_related('user').get(key=key)
+            except model.DoesNotExist:
+                raise exceptions.AuthenticationFailed(_('Invalid token.'))
+            token_cache.set(key, token)
+
+        if not token.user.is_active:
+            raise exceptions.AuthenticationFailed(_('User inactive or deleted.'))
+
+        return (token.user, token)
+
+
+class SignedTokenAuthentication(CachedTokenAuthentication):
+    """
+    Igual que CachedTokenAuthentication, pero además acepta los tokens firmados
+    emitidos con AUTH_SIGNED_TOKENS=True (ver app_User/signed_tokens.py).
+
+    Los tokens firmados se verifican sin consultar la base de datos; request.auth
+    queda con el payload del token (usuario, empresa y expiración).
+    """
+
+    def authenticate_credentials(self, key):
+        if not es_token_firmado(key):
+            return super().authenticate_credentials(key)
+
+        try:
+            payload = verificar_token(key)
+        except signing.BadSignature:
+            raise exceptions.AuthenticationFailed(_('Invalid token.'))
+
+        user = obtener_usuario(payload['u'])
+        if user is None or not user.is_active:
+            raise exceptions.AuthenticationFailed(_('User inactive or deleted.'))
+
+        return (user, payload)
+
+
+def obtener_usuario(user_id):
+    """Obtiene el usuario desde el caché, o lo consulta si no está"""
+    encontrado, user = user_cache.get(user_id)
+    if not encontrado:
+        user = User.objects.filter(pk=user_id).first()
+        user_cache.set(user_id, user)
+    return user
+
+
+def invalidar_tokens_usuario(user_id):
+    """Invalida del caché el usuario y todos sus tokens"""
+    from rest_framework.authtoken.models import Token
+
+    user_cache.invalidate(user_id)
+    keys = Token.objects.filter(user_id=user_id).values_list('key', flat=True)
+    token_cache.invalidate(*keys)
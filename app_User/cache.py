@@ -0,0 +1,119 @@
+"""
+Caché LRU con expiración, local al proceso o delegado en el caché de Django
+"""
+import copy
+import threading
+import time
+from collections import OrderedDict
+
+from django.core.cache import cache as django_cache
+
+
+# Marcador para distinguir "no está en caché" de un valor None guardado
+_MISSING = object()
+
+
+class LRUCache:
+    """
+    Caché LRU con expiración y valores devueltos como copias.
+
+    Con use_django_cache=False las entradas viven solo en el proceso: sirve
+    para datos que no dependen de invalidaciones (resultados calculados con
+    su versión en la clave).
+
+    Con use_django_cache=True las entradas se guardan únicamente en el caché
+    de Django (CACHES['default']), sin copia local: una invalidación hecha por
+    cualquier worker la ven todos en la siguiente lectura. Es el modo para
+    datos de autorización (tenant, tokens).
+    """
+
+    def __init__(self, key_prefix, maxsize=1024, timeout=300, use_django_cache=False):
+        self.maxsize = maxsize
+        self.timeout = timeout
+        self.use_django_cache = use_django_cache
+        self.key_prefix = key_prefix
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+        self.shared_hits = 0
+        self.invalidations = 0
+
+    def _cache_key(self, key):
+        return f"{self.key_prefix}:{key}"
+
+    def get(self, key):
+        """
+        Returns:
+            Tupla (encontrado, valor). valor puede ser None si así se guardó.
+        """
+        if self.maxsize <= 0:
+            return False, None
+
+        if self.use_django_cache:
+            # El caché de Django devuelve siempre una copia deserializada
+            value = django_cache.get(self._cache_key(key), _MISSING)
+            with self._lock:
+                if value is _MISSING:
+                    self.misses += 1
+                    return False, None
+                self.hits += 1
+                self.shared_hits += 1
+            return True, value
+
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None and entry[0] > time.monotonic():
+                self._entries.move_to_end(key)
+                self.hits += 1
+                return True, copy.deepcopy(entry[1])
+            if entry is not None:
+                del self._entries[key]
+            self.misses += 1
+        return False, None
+
+    def set(self, key, value):
+        if self.maxsize <= 0:
+            return
+        if self.use_django_cache:
+            django_cache.set(self._cache_key(key), value, self.timeout)
+        else:
+            self._store_local(key, copy.deepcopy(value))
+
+    def _store_local(self, key, value):
+        with self._lock:
+            self._entries[key] = (time.monotonic() + self.timeout, value)
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.maxsize:
+                self._entries.popitem(last=False)
+
+    def invalidate(self, *keys):
+        """Elimina del caché (local y compartido) las claves indicadas"""
+        if not keys:
+            return
+        with self._lock:
+            for key in keys:
+                self._entries.pop(key, None)
+            self.invalidations += len(keys)
+        if self.use_django_cache:
+            django_cache.delete_many([self._cache_key(key) for key in keys])
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+
+    def stats(self):
+        """Contadores del proceso actual"""
+        with self._lock:
+            total = self.hits + self.misses
+            return {
+                'hits': self.hits,
+                'misses': self.misses,
+                'shared_hits': self.shared_hits,
+                'invalidations': self.invalidations,
+                'hit_ratio': round(self.hits / total, 4) if total else None,
+                'size': len(self._entries),
+                'maxsize': self.maxsize,
+                'timeout': self.timeout,
+                'use_django_cache': self.use_django_cache,
+            }
@@ -0,0 +1,86 @@
+"""
+Checks de configuración: los cachés de autorización necesitan un caché
+compartido que no sea la base de datos
+"""
+from django.conf import settings
+from django.core.checks import Error, Warning, register
+from django.core.cache import caches
+
+
+# Backends de CACHES['default'] que no comparten datos entre workers
+BACKENDS_LOCALES = (
+    'django.core.cache.backends.locmem.LocMemCache',
+    'django.core.cache.backends.dummy.DummyCache',
+)
+
+BACKEND_BASE_DE_DATOS = 'django.core.cache.backends.db.DatabaseCache'
+
+
+def cache_compartido():
+    """True si CACHES['default'] es visible para todos los workers"""
+    return settings.CACHES['default']['BACKEND'] not in BACKENDS_LOCALES
+
+
+@register()
+def revisar_cache_tenant(app_configs, **kwargs):
+    if not getattr(settings, 'TENANT_CACHE_USE_DJANGO_CACHE', True) or cache_compartido():
+        return []
+    return [
+        Warning(
+            "TENANT_CACHE_USE_DJANGO_CACHE está activo pero CACHES['default'] es local al proceso.",
+            hint="Con varios workers, una reasignación de empresa tarda hasta TENANT_CACHE_TIMEOUT "
+                 "en verse. Configure REDIS_URL.",
+            obj=caches['default'],
+            id='app_User.W001',
+        )
+    ]
+
+
+@register()
+def revisar_cache_tokens(app_configs, **kwargs):
+    if not getattr(settings, 'AUTH_TOKEN_CACHE_USE_DJANGO_CACHE', True) or cache_compartido():
+        return []
+    return [
+        Warning(
+            "AUTH_TOKEN_CACHE_USE_DJANGO_CACHE está activo pero CACHES['default'] es local al proceso.",
+            hint="Con varios workers, un logout o una desactivación tarda hasta AUTH_TOKEN_CACHE_TIMEOUT "
+                 "en verse. Configure REDIS_URL.",
+            obj=caches['default'],
+            id='app_User.W002',
+        )
+    ]
+
+
+@register()
+def revisar_cache_revocacion(app_configs, **kwargs):
+    if not getattr(settings, 'AUTH_SIGNED_TOKENS', False) or cache_compartido():
+        return []
+    return [
+        Error(
+            "AUTH_SIGNED_TOKENS requiere que CACHES['default'] sea compartido por todos los workers.",
+            hint="La consulta de revocación se cachea: con un caché local, un token revocado en el "
+                 "logout sigue valiendo en los demás workers. Configure REDIS_URL.",
+            obj=caches['default'],
+            id='app_User.E001',
+        )
+    ]
+
+
+@register()
+def revisar_cache_base_de_datos(app_configs, **kwargs):
+    usa_cache = (
+        getattr(settings, 'TENANT_CACHE_USE_DJANGO_CACHE', True)
+        or getattr(settings, 'AUTH_TOKEN_CACHE_USE_DJANGO_CACHE', True)
+        or getattr(settings, 'AUTH_SIGNED_TOKENS', False)
+    )
+    if not usa_cache or settings.CACHES['default']['BACKEND'] != BACKEND_BASE_DE_DATOS:
+        return []
+    return [
+        Warning(
+            "CACHES['default'] es un DatabaseCache: cada resolución de tenant, token o revocación "
+            "sigue costando una consulta.",
+            hint="Configure REDIS_URL.",
+            obj=caches['default'],
+            id='app_User.W003',
+        )
+    ]
@@ -4,6 +4,7 @@ Mixin para multitenancy: Filtra automáticamente todos los querysets por empresa
 from rest_framework import viewsets, permissions, status
 from rest_framework.response import Response
 from app_User.models import Perfiluser
+from app_User.tenant import get_perfil, get_empresa
 
 
 class TenantFilterMixin:
@@ -21,7 +22,7 @@ class TenantFilterMixin:
             return queryset.none()
         
         try:
-            perfil = Perfiluser.objects.get(usuario=self.request.user)
+            perfil = get_perfil(self.request)
             # Filtrar por empresa del usuario
             return queryset.filter(empresa=perfil.empresa)
         except Perfiluser.DoesNotExist:
@@ -29,12 +30,8 @@ class TenantFilterMixin:
             return queryset.none()
     
     def get_tenant_empresa(self):
-        """Obtener la empresa del usuario actual"""
-        try:
-            perfil = Perfiluser.objects.get(usuario=self.request.user)
-            return perfil.empresa
-        except Perfiluser.DoesNotExist:
-            return None
+        """Obtener la empresa del usuario actual (resuelta una sola vez por request)"""
+        return get_empresa(self.request)
     
     def perform_create(self, serializer):
         """Auto-asignar empresa al crear objetos"""
@@ -23,3 +23,12 @@ class GroupDescripcion(models.Model):
     def __str__(self):
         empresa_name = self.empresa.razon_social if self.empresa else "Sin empresa"
         return f"{self.group.name} - {empresa_name}"
+
+
+class TokenRevocado(models.Model):
+    """Token firmado revocado en el logout; se guarda solo hasta su expiración"""
+    jti = models.CharField(max_length=32, unique=True)
+    vence = models.DateTimeField(db_index=True)
+
+    def __str__(self):
+        return f"{self.jti} (vence {self.vence})"
@@ -0,0 +1,51 @@
+"""
+Señales para invalidar los cachés de tenant y de tokens de autenticación
+"""
+from django.contrib.auth.models import User
+from django.db import transaction
+from django.db.models.signals import post_save, post_delete
+from django.dispatch import receiver
+from rest_framework.authtoken.models import Token
+
+from app_Empresa.models import Empresa
+from .authentication import token_cache, invalidar_tokens_usuario
+from .models import Perfiluser
+from .tenant import tenant_cache
+
+
+def _invalidar(funcion, *args):
+    """
+    Invalida ahora y otra vez al confirmar la transacción: otro worker puede
+    leer la fila vieja y volver a guardarla en el caché antes del commit
+    """
+    funcion(*args)
+    transaction.on_commit(lambda: funcion(*args))
+
+
+@receiver([post_save, post_delete], sender=Perfiluser)
+def invalidar_perfil(sender, instance, **kwargs):
+    """Invalida la entrada del usuario dueño del perfil"""
+    _invalidar(tenant_cache.invalidate, instance.usuario_id)
+
+
+@receiver([post_save, post_delete], sender=Empresa)
+def invalidar_empresa(sender, instance, created=False, **kwargs):
+    """Invalida las entradas de todos los usuarios de la empresa"""
+    if created:
+        return
+    usuarios = Perfiluser.objects.filter(empresa_id=instance.pk).values_list('usuario_id', flat=True)
+    _invalidar(tenant_cache.invalidate, *usuarios)
+
+
+@receiver(post_delete, sender=Token)
+def invalidar_token(sender, instance, **kwargs):
+    """Invalida el token borrado (logout)"""
+    _invalidar(token_cache.invalidate, instance.key)
+
+
+@receiver([post_save, post_delete], sender=User)
+def invalidar_tokens_de_usuario(sender, instance, created=False, **kwargs):
+    """Invalida el usuario y sus tokens cuando cambia (p. ej. al desactivarlo)"""
+    if created:
+        return
+    _invalidar(invalidar_tokens_usuario, instance.pk)
@@ -0,0 +1,95 @@
+"""
+Tokens firmados (sin estado) que embeben usuario, empresa y expiración.
+
+Se activan con AUTH_SIGNED_TOKENS=True. La firma y la expiración se verifican
+sin consultar la base de datos. El logout agrega el token a TokenRevocado solo
+hasta su expiración, por lo que la lista se mantiene compacta; la consulta de
+revocación pasa por un caché compartido (CACHES) y una entrada desalojada del
+caché solo cuesta volver a leer la tabla, nunca reactiva el token.
+"""
+import datetime
+import secrets
+import time
+
+from django.conf import settings
+from django.core import signing
+from django.utils import timezone
+
+from app_User.cache import LRUCache
+from app_User.models import TokenRevocado
+
+
+SALT = 'app_User.signed_tokens'
+
+# jti -> revocado (True/False)
+revocados_cache = LRUCache(
+    'revoked_token',
+    maxsize=getattr(settings, 'AUTH_TOKEN_CACHE_MAXSIZE', 4096),
+    timeout=getattr(settings, 'AUTH_TOKEN_CACHE_TIMEOUT', 60),
+    use_django_cache=True,
+)
+
+
+def tokens_firmados_activos():
+    return getattr(settings, 'AUTH_SIGNED_TOKENS', False)
+
+
+def es_token_firmado(key):
+    """Los tokens de DRF son hexadecimales; los firmados contienen ':'"""
+    return ':' in key
+
+
+def emitir_token(user, empresa_id=None):
+    """
+    Emite un token firmado para el usuario
+
+    Returns:
+        String del token
+    """
+    max_age = getattr(settings, 'AUTH_SIGNED_TOKEN_MAX_AGE', 28800)
+    payload = {
+        'u': user.pk,
+        'e': empresa_id,
+        'x': int(time.time()) + max_age,
+        'j': secrets.token_urlsafe(6),
+    }
+    return signing.dumps(payload, salt=SALT, compress=True)
+
+
+def verificar_token(key):
+    """
+    Verifica firma, expiración y revocación del token
+
+    Returns:
+        Dict con el payload ('u' usuario, 'e' empresa, 'x' expiración, 'j' id del token)
+
+    Raises:
+        signing.BadSignature si el token es inválido, expiró o fue revocado
+    """
+    payload = signing.loads(key, salt=SALT)
+    if payload.get('x', 0) <= time.time():
+        raise signing.BadSignature('Token expirado')
+    if token_revocado(payload['j']):
+        raise signing.BadSignature('Token revocado')
+    return payload
+
+
+def token_revocado(jti):
+    """True si el token fue revocado; consulta la tabla solo si no está en el caché"""
+    encontrado, revocado = revocados_cache.get(jti)
+    if not encontrado:
+        revocado = TokenRevocado.objects.filter(jti=jti).exists()
+        revocados_cache.set(jti, revocado)
+    return revocado
+
+
+def revocar_token(payload):
+    """Agrega el token a la lista de revocación hasta que expire"""
+    ahora = timezone.now()
+    vence = datetime.datetime.fromtimestamp(payload['x'], tz=datetime.timezone.utc)
+    if vence <= ahora:
+        return
+    TokenRevocado.objects.get_or_create(jti=payload['j'], defaults={'vence': vence})
+    revocados_cache.set(payload['j'], True)
+    # Los logouts son poco frecuentes: se aprovechan para purgar los ya vencidos
+    TokenRevocado.objects.filter(vence__lte=ahora).delete()
@@ -0,0 +1,85 @@
+"""
+Resolución del tenant (Perfiluser + Empresa) una sola vez por request,
+con un caché entre requests invalidado por señales (ver app_User/signals.py)
+
+El caché entre requests vive en el caché de Django compartido por todos los
+workers: cuando se reasigna un Perfiluser, la invalidación la ve cualquier
+proceso en la siguiente petición, no recién al vencer el TTL.
+"""
+from django.conf import settings
+
+from app_User.cache import LRUCache
+from app_User.models import Perfiluser
+
+
+# Atributo donde se guarda el perfil resuelto dentro del request
+TENANT_ATTR = '_tenant_perfil'
+
+tenant_cache = LRUCache(
+    'tenant_perfil',
+    maxsize=getattr(settings, 'TENANT_CACHE_MAXSIZE', 1024),
+    timeout=getattr(settings, 'TENANT_CACHE_TIMEOUT', 300),
+    use_django_cache=getattr(settings, 'TENANT_CACHE_USE_DJANGO_CACHE', True),
+)
+
+
+def get_perfil(request):
+    """
+    Obtiene el Perfiluser (con su empresa) del usuario autenticado del request.
+
+    La consulta se hace solo la primera vez; las siguientes llamadas sobre el
+    mismo request (get_queryset, perform_create, etc.) reutilizan el resultado.
+
+    Con un token firmado, el perfil tiene que seguir en la empresa para la que
+    se emitió el token: si el usuario fue reasignado a otra, el token no sirve.
+
+    Raises:
+        Perfiluser.DoesNotExist si el usuario no está autenticado, no tiene
+        perfil o su empresa no es la del token
+    """
+    if not hasattr(request, TENANT_ATTR):
+        perfil = resolver_perfil(request.user)
+        if perfil is not None and not perfil_de_token(perfil, getattr(request, 'auth', None)):
+            perfil = None
+        setattr(request, TENANT_ATTR, perfil)
+
+    perfil = getattr(request, TENANT_ATTR)
+    if perfil is None:
+        raise Perfiluser.DoesNotExist("Usuario no tiene perfil asociado")
+    return perfil
+
+
+def get_empresa(request):
+    """Obtiene la empresa del usuario del request, o None si no tiene perfil"""
+    try:
+        return get_perfil(request).empresa
+    except Perfiluser.DoesNotExist:
+        return None
+
+
+def perfil_de_token(perfil, auth):
+    """
+    True si el perfil corresponde a la empresa embebida en el token ('e' del
+    payload de un token firmado). Los tokens de DRF no llevan empresa.
+    """
+    if not isinstance(auth, dict) or auth.get('e') is None:
+        return True
+    return perfil.empresa_id == auth['e']
+
+
+def resolver_perfil(user):
+    """Obtiene el perfil del usuario desde el caché, o lo consulta junto con su empresa"""
+    if user is None or not user.is_authenticated:
+        return None
+
+    encontrado, perfil = tenant_cache.get(user.pk)
+    if encontrado:
+        return perfil
+
+    perfil = (
+        Perfiluser.objects.select_related('empresa')
+        .filter(usuario=user)
+        .first()
+    )
+    tenant_cache.set(user.pk, perfil)
+    return perfil
@@ -1,3 +1,168 @@
-from django.test import TestCase
+from django.contrib.auth.models import User
+from django.core import signing
+from django.core.cache import cache as django_cache
+from django.test import TestCase, override_settings
+from rest_framework import exceptions
+from rest_framework.authtoken.models import Token
+from rest_framework.test import APIClient
 
-# Create your tests here.
+from app_Cliente.models import Cliente
+from app_Empresa.models import Empresa
+from .authentication import CachedTokenAuthentication, token_cache
+from .cache import LRUCache
+from .checks import (
+    revisar_cache_base_de_datos, revisar_cache_revocacion, revisar_cache_tenant, revisar_cache_tokens,
+)
+from .models import Perfiluser, TokenRevocado
+from .signed_tokens import emitir_token, revocar_token, verificar_token
+from .tenant import resolver_perfil, tenant_cache
+
+
+# En los tests un LocMemCache hace de caché compartido: cuenta solo las consultas a la base
+CACHE_EN_MEMORIA = {'default': {'BACKEND': 'django.core.cache.backends.locmem.LocMemCache'}}
+
+@override_settings(CACHES=CACHE_EN_MEMORIA)
+class LRUCacheTests(TestCase):
+    def test_local_guarda_copias(self):
+        cache = LRUCache('test_local', maxsize=2)
+        valor = {'a': 1}
+        cache.set('k', valor)
+        valor['a'] = 2
+        self.assertEqual(cache.get('k'), (True, {'a': 1}))
+
+    def test_local_descarta_el_menos_usado(self):
+        cache = LRUCache('test_local', maxsize=2)
+        cache.set(1, 'uno')
+        cache.set(2, 'dos')
+        cache.get(1)
+        cache.set(3, 'tres')
+        self.assertEqual(cache.get(2), (False, None))
+        self.assertEqual(cache.get(1), (True, 'uno'))
+
+    def test_compartido_sin_copia_local(self):
+        """Lo que borra otro worker en el caché de Django ya no se sirve"""
+        cache = LRUCache('test_compartido', use_django_cache=True)
+        cache.set('k', None)
+        self.assertEqual(cache.get('k'), (True, None))
+        django_cache.delete('test_compartido:k')
+        self.assertEqual(cache.get('k'), (False, None))
+
+
+@override_settings(CACHES=CACHE_EN_MEMORIA)
+class TenantCacheTests(TestCase):
+    def setUp(self):
+        django_cache.clear()
+        self.empresa = Empresa.objects.create(razon_social='A', email_contacto='a@a.com')
+        self.otra = Empresa.objects.create(razon_social='B', email_contacto='b@b.com')
+        self.usuario = User.objects.create(username='analista')
+        self.perfil = Perfiluser.objects.create(usuario=self.usuario, empresa=self.empresa)
+
+    def test_reasignacion_invalida_en_todos_los_workers(self):
+        self.assertEqual(resolver_perfil(self.usuario).empresa_id, self.empresa.id)
+        self.assertTrue(tenant_cache.use_django_cache)
+
+        # Otro worker reasigna el perfil: su señal borra la entrada compartida
+        Perfiluser.objects.filter(pk=self.perfil.pk).update(empresa=self.otra)
+        django_cache.delete(tenant_cache._cache_key(self.usuario.pk))
+
+        self.assertEqual(resolver_perfil(self.usuario).empresa_id, self.otra.id)
+
+    def test_reasignacion_por_save(self):
+        resolver_perfil(self.usuario)
+        self.perfil.empresa = self.otra
+        with self.captureOnCommitCallbacks(execute=True):
+            self.perfil.save()
+        with self.assertNumQueries(1):
+            self.assertEqual(resolver_perfil(self.usuario).empresa_id, self.otra.id)
+
+    def test_sin_perfil_se_cachea(self):
+        sin_perfil = User.objects.create(username='sin_perfil')
+        self.assertIsNone(resolver_perfil(sin_perfil))
+        with self.assertNumQueries(0):
+            self.assertIsNone(resolver_perfil(sin_perfil))
+
+    def test_check_cache_local(self):
+        self.assertEqual([e.id for e in revisar_cache_tenant(None)], ['app_User.W001'])
+
+    def test_check_cache_de_base_de_datos(self):
+        self.assertEqual(revisar_cache_base_de_datos(None), [])
+        cache_tabla = {'default': {'BACKEND': 'django.core.cache.backends.db.DatabaseCache', 'LOCATION': 'cache'}}
+        with override_settings(CACHES=cache_tabla):
+            self.assertEqual([e.id for e in revisar_cache_base_de_datos(None)], ['app_User.W003'])
+
+
+@override_settings(CACHES=CACHE_EN_MEMORIA)
+class TokenCacheTests(TestCase):
+    def setUp(self):
+        django_cache.clear()
+        self.usuario = User.objects.create(username='cajero')
+        self.token = Token.objects.create(user=self.usuario)
+        self.auth = CachedTokenAuthentication()
+
+    def test_segunda_autenticacion_sin_consultas(self):
+        self.auth.authenticate_credentials(self.token.key)
+        with self.assertNumQueries(0):
+            usuario, _ = self.auth.authenticate_credentials(self.token.key)
+        self.assertEqual(usuario, self.usuario)
+
+    def test_logout_en_otro_worker(self):
+        self.auth.authenticate_credentials(self.token.key)
+        # Otro worker borra el token: su señal limpia la entrada compartida
+        Token.objects.filter(pk=self.token.pk).delete()
+        self.assertEqual(token_cache.get(self.token.key), (False, None))
+        with self.assertRaises(exceptions.AuthenticationFailed):
+            self.auth.authenticate_credentials(self.token.key)
+
+    def test_desactivacion(self):
+        self.auth.authenticate_credentials(self.token.key)
+        self.usuario.is_active = False
+        with self.captureOnCommitCallbacks(execute=True):
+            self.usuario.save()
+        with self.assertRaises(exceptions.AuthenticationFailed):
+            self.auth.authenticate_credentials(self.token.key)
+
+    def test_check_cache_local(self):
+        self.assertEqual([e.id for e in revisar_cache_tokens(None)], ['app_User.W002'])
+
+
+@override_settings(CACHES=CACHE_EN_MEMORIA)
+class TokenFirmadoTests(TestCase):
+    def setUp(self):
+        django_cache.clear()
+        self.empresa = Empresa.objects.create(razon_social='A', email_contacto='a@a.com')
+        self.otra = Empresa.objects.create(razon_social='B', email_contacto='b@b.com')
+        self.usuario = User.objects.create(username='firmado')
+        self.perfil = Perfiluser.objects.create(usuario=self.usuario, empresa=self.empresa)
+        self.token = emitir_token(self.usuario, self.empresa.id)
+
+    def test_revocacion_sobrevive_al_cache(self):
+        """La revocación está en la base: vaciar el caché no reactiva el token"""
+        payload = verificar_token(self.token)
+        revocar_token(payload)
+        self.assertTrue(TokenRevocado.objects.filter(jti=payload['j']).exists())
+
+        django_cache.clear()
+        with self.assertRaises(signing.BadSignature):
+            verificar_token(self.token)
+
+    def test_verificacion_cacheada(self):
+        verificar_token(self.token)
+        with self.assertNumQueries(0):
+            verificar_token(self.token)
+
+    def test_token_de_otra_empresa(self):
+        Cliente.objects.create(nombre='N', apellido='A', telefono='1', empresa=self.empresa)
+        Cliente.objects.create(nombre='M', apellido='B', telefono='2', empresa=self.otra)
+        api = APIClient()
+        api.credentials(HTTP_AUTHORIZATION=f'Token {self.token}')
+        self.assertEqual(len(api.get('/api/Clientes/clientes/').json()), 1)
+
+        # Reasignado a otra empresa: el token emitido para la anterior no ve ninguna
+        self.perfil.empresa = self.otra
+        with self.captureOnCommitCallbacks(execute=True):
+            self.perfil.save()
+        self.assertEqual(api.get('/api/Clientes/clientes/').json(), [])
+
+    @override_settings(AUTH_SIGNED_TOKENS=True)
+    def test_check_cache_local(self):
+        self.assertEqual([e.id for e in revisar_cache_revocacion(None)], ['app_User.E001'])
@@ -1,6 +1,6 @@
 from django.urls import include, path
 from rest_framework import routers
-from .api_user import UserViewSer, GroupViewSet, PermissionViewSer, ContentTypeViewSer, AdminLogViewSet, CreateUserView , PerfilUserViewSet, MeView, UserGroupView
+from .api_user import UserViewSer, GroupViewSet, PermissionViewSer, ContentTypeViewSer, AdminLogViewSet, CreateUserView , PerfilUserViewSet, MeView, UserGroupView, TenantCacheStatsView
 
 
 router = routers.DefaultRouter()
@@ -16,4 +16,5 @@ urlpatterns = [
     path('create-user/', CreateUserView.as_view(), name='create-user'),
     path('me/', MeView.as_view(), name='me'),
     path('user-groups/', UserGroupView.as_view(), name='user-groups'),
+    path('tenant-cache/', TenantCacheStatsView.as_view(), name='tenant-cache'),
 ]
\ No newline at end of file